@@ -1,48 +1,296 @@
-from flask import Flask, request, jsonify
-from flask_mysqldb import MySQL
-from flask_bcrypt import Bcrypt
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify, stream_with_context
+import MySQLdb.cursors
 from dotenv import load_dotenv
-from google import genai
-from google.genai.errors import APIError
+from werkzeug.local import LocalProxy
 from datetime import datetime, timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+import base64
+from functools import wraps
+import csv
+import io
 import os
 
+import compression
+import conversations
+import goal_progress
+import instrumentation
+import json_provider
+import recurring
+import rollups
+import spending_stats
+from auth_tokens import AuthError, hash_refresh, issuer_from_env
+from db_pool import MySQLPool, PoolTimeout
+from ia_cache import UserMemo, cache_from_env
+from ia_executor import IAQueueFull, IATimeout, executor_from_env
+from llm_gateway import LLMUnavailable, gateway_from_env
+from passwords import PasswordQueueFull, hasher_from_env
+from ratelimit import limiter
+
+try:
+    from google.genai.errors import APIError
+except ImportError:  # sin el SDK de Gemini solo está disponible el stub local
+    class APIError(Exception):
+        pass
+
 # -------------------------------
 # Cargar variables de entorno
 # -------------------------------
 load_dotenv()
 
-app = Flask(__name__)
+# Endpoints: se registran en la app que arma create_app()
+bp = Blueprint('api', __name__)
+
+# Cubetas de tokens por IP y por email, revisadas antes de cualquier bcrypt.
+# AUTH_RATE_LIMIT=0 las deshabilita (por ejemplo en pruebas de carga)
+AUTH_RATE_LIMIT = os.getenv('AUTH_RATE_LIMIT', '1') == '1'
 
 # -------------------------------
-# Configuración MySQL
+# Estado del proceso
 # -------------------------------
-app.config['MYSQL_HOST'] = os.getenv('DB_HOST')
-app.config['MYSQL_USER'] = os.getenv('DB_USER')
-app.config['MYSQL_PASSWORD'] = os.getenv('DB_PASSWORD')
-app.config['MYSQL_DB'] = os.getenv('DB_NAME')
+# Pools, hilos, clientes y memos los crea create_app() y los guarda en
+# app.extensions['finanzas']; los endpoints los usan con estos nombres a
+# través de la app activa. Importar el módulo no abre nada.
+def create_services():
+    # Las llamadas a Gemini corren en un ejecutor acotado (ver ia_executor.py)
+    ejecutor = executor_from_env()
+    return {
+        # Pool de conexiones (ver db_pool.py para DB_POOL_MIN/MAX/TIMEOUT/...)
+        "mysql": MySQLPool(),
+        # bcrypt corre en un pool de procesos acotado (ver passwords.py)
+        "passwords": hasher_from_env(),
+        # Access/refresh tokens firmados (ver auth_tokens.py)
+        "tokens": issuer_from_env(),
+        "login_ip_limiter": limiter(
+            int(os.getenv('LOGIN_IP_BURST', 20)), float(os.getenv('LOGIN_IP_PER_MINUTE', 30)), AUTH_RATE_LIMIT
+        ),
+        "login_email_limiter": limiter(
+            int(os.getenv('LOGIN_EMAIL_BURST', 5)), float(os.getenv('LOGIN_EMAIL_PER_MINUTE', 5)), AUTH_RATE_LIMIT
+        ),
+        "register_ip_limiter": limiter(
+            int(os.getenv('REGISTER_IP_BURST', 5)), float(os.getenv('REGISTER_IP_PER_MINUTE', 5)), AUTH_RATE_LIMIT
+        ),
+        # Respuestas de la mascota reutilizables mientras el contexto y la
+        # data_version del usuario no cambien (ver ia_cache.py)
+        "ia_cache": cache_from_env(),
+        # Datos del contexto financiero memoizados por usuario durante una
+        # conversación, válidos mientras no cambie su data_version
+        "context_memo": UserMemo(ttl=float(os.getenv('IA_CONTEXT_TTL', 60))),
+        # Progreso de metas por usuario, válido mientras no cambie su data_version
+        "goals_progress_memo": UserMemo(ttl=float(os.getenv('GOALS_PROGRESS_TTL', 300))),
+        "ia_executor": ejecutor,
+        # Gemini (o el stub local si no hay GEMINI_API_KEY) detrás de la puerta de
+        # enlace: unión de peticiones, circuit breaker, cuotas y respaldo (ver llm_gateway.py)
+        "llm": gateway_from_env(ejecutor),
+    }
 
-mysql = MySQL(app)
-bcrypt = Bcrypt(app)
+def _service(nombre):
+    return LocalProxy(lambda: current_app.extensions['finanzas'][nombre])
 
-# -------------------------------
-# Configuración Gemini AI
-# -------------------------------
-# -------------------- CONFIGURACIÓN DE GEMINI (IA) --------------------
-# 2. Reemplaza 'GEMINI_API_KEY' con el nombre de tu variable de entorno real
-#    que contiene la clave API de Google Gemini.
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-if GEMINI_API_KEY:
-    client = genai.Client(api_key=GEMINI_API_KEY)
-    MODEL = 'gemini-2.5-flash'  # Modelo rápido y eficiente para chat y análisis
-else:
-    print("ADVERTENCIA: GEMINI_API_KEY no está configurada.")
-# ----------------------------------------------------------------------
+mysql = _service('mysql')
+passwords = _service('passwords')
+tokens = _service('tokens')
+login_ip_limiter = _service('login_ip_limiter')
+login_email_limiter = _service('login_email_limiter')
+register_ip_limiter = _service('register_ip_limiter')
+ia_executor = _service('ia_executor')
+ia_cache = _service('ia_cache')
+context_memo = _service('context_memo')
+goals_progress_memo = _service('goals_progress_memo')
+llm = _service('llm')
+
+@bp.app_errorhandler(PoolTimeout)
+def pool_exhausted(e):
+    print(f"Pool de conexiones agotado: {e}")
+    return jsonify({"error": "Servidor ocupado, intenta de nuevo"}), 503, {"Retry-After": "1"}
+
+@bp.app_errorhandler(PasswordQueueFull)
+def passwords_busy(e):
+    print(f"Cola de contraseñas llena: {e}")
+    return jsonify({"error": "Servidor ocupado, intenta de nuevo"}), 503, {"Retry-After": str(e.retry_after)}
+
+@bp.app_errorhandler(AuthError)
+def auth_failed(e):
+    return jsonify({"error": str(e)}), e.status
+
+def rate_limited(retry_after):
+    return jsonify({"error": "Demasiados intentos, espera un momento"}), 429, {"Retry-After": str(retry_after)}
+
+@bp.route('/metrics/db_pool', methods=['GET'])
+def db_pool_metrics():
+    return jsonify(mysql.stats())
+
+@bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Métricas en formato de texto de Prometheus (por proceso)."""
+    gauges = []
+    for nombre, valor in mysql.stats().items():
+        gauges.append((f"db_pool_{nombre}", (), valor))
+    for nombre, valor in ia_executor.stats().items():
+        gauges.append((f"ia_executor_{nombre}", (), valor))
+    for nombre, valor in passwords.stats().items():
+        gauges.append((f"passwords_{nombre}", (), valor))
+    for nombre, valor in ia_cache.stats().items():
+        if isinstance(valor, (int, float)):
+            gauges.append((f"ia_cache_{nombre}", (), float(valor)))
+    texto = instrumentation.registry.render(gauges)
+    return Response(texto, mimetype='text/plain; version=0.0.4')
+
+@bp.route('/metrics/ia', methods=['GET'])
+def ia_metrics():
+    datos = ia_executor.stats()
+    datos["cache"] = ia_cache.stats()
+    datos["context_memo"] = context_memo.stats()
+    datos["goals_progress_memo"] = goals_progress_memo.stats()
+    datos["gateway"] = llm.stats()
+    return jsonify(datos)
+
+@bp.route('/metrics/insights', methods=['GET'])
+def insights_metrics():
+    """Trabajos de la cola de insights por estado (los procesa insights.py)."""
+    cur = mysql.connection.cursor()
+    cur.execute("SELECT estado, COUNT(*) FROM ia_jobs GROUP BY estado")
+    datos = {estado: total for estado, total in cur.fetchall()}
+    cur.close()
+    return jsonify({"jobs": datos})
+
+@bp.route('/metrics/auth', methods=['GET'])
+def auth_metrics():
+    return jsonify({
+        "passwords": passwords.stats(),
+        "login_ip": login_ip_limiter.stats(),
+        "login_email": login_email_limiter.stats(),
+        "register_ip": register_ip_limiter.stats(),
+    })
+
+def on_user_data_changed(id_user):
+    """
+    Se llama después de confirmar cualquier escritura de movimientos o metas
+    de un usuario, para invalidar lo que dependa de sus datos.
+    """
+    context_memo.invalidate(int(id_user))
+    goals_progress_memo.invalidate(int(id_user))
+
+# ===========================
+# SESIÓN (ACCESS TOKEN)
+# ===========================
+def require_auth(f):
+    """
+    Exige 'Authorization: Bearer <access token>' y deja el usuario del token
+    en g.user (id_user, username, perfil_riesgo, meta_actual) sin consultar
+    la base. Si la ruta trae <id_user>, debe ser el del token.
+    """
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        encabezado = request.headers.get('Authorization', '')
+        esquema, _, token = encabezado.partition(' ')
+        if esquema.lower() != 'bearer' or not token:
+            raise AuthError("Falta el token de acceso")
+        g.user = tokens.verify_access(token.strip())
+        if 'id_user' in kwargs and kwargs['id_user'] != g.user['id_user']:
+            raise AuthError("No autorizado para este usuario", 403)
+        return f(*args, **kwargs)
+    return wrapper
+
+def session_user_id(id_enviado=None):
+    """
+    id_user de la sesión. Los clientes viejos aún mandan id_user en el body:
+    se acepta solo si coincide con el del token.
+    """
+    id_user = g.user['id_user']
+    if id_enviado not in (None, '') and str(id_enviado) != str(id_user):
+        raise AuthError("No autorizado para este usuario", 403)
+    return id_user
+
+def issue_session(cur, usuario, familia=None):
+    """Emite access + refresh token (guarda el hash del refresh) y arma la respuesta."""
+    refresh, refresh_hash, expira = tokens.new_refresh()
+    cur.execute(
+        "INSERT INTO refresh_tokens (user_id, token_hash, familia, expira) VALUES (%s, %s, %s, %s)",
+        (usuario['id_user'], refresh_hash, familia or tokens.new_family(), expira)
+    )
+    return {
+        "access_token": tokens.issue_access(usuario),
+        "token_type": "Bearer",
+        "expires_in": tokens.access_ttl,
+        "refresh_token": refresh,
+    }
+
+# ===========================
+# VERSIÓN DE DATOS (ETag / GET condicional)
+# ===========================
+# Cambia si cambia el formato de las respuestas, para no validar ETags viejos
+ETAG_FORMATO = 'v1'
+
+def bump_data_version(cur, id_user):
+    """
+    Incrementa users.data_version y devuelve la versión nueva. Se llama al
+    inicio de la transacción de cada escritura de movimientos o metas: la
+    fila del usuario queda bloqueada hasta el commit, así las versiones
+    siguen el orden de los commits (ningún ETag viejo sobrevive a uno y
+    sirven como watermark de /sync). Las filas escritas guardan esta versión.
+    """
+    cur.execute(
+        "UPDATE users SET data_version = LAST_INSERT_ID(data_version + 1) WHERE id_user=%s",
+        (id_user,)
+    )
+    return cur.lastrowid
+
+def current_data_version(cur, id_user):
+    """users.data_version actual (una lectura por llave primaria)."""
+    cur.execute("SELECT data_version FROM users WHERE id_user=%s", (id_user,))
+    fila = cur.fetchone()
+    return fila[0] if fila else 0
+
+def record_tombstone(cur, id_user, entidad, id_entidad, version):
+    """Lápida para que /sync informe el borrado a los clientes."""
+    cur.execute(
+        "INSERT INTO sync_eliminados (user_id, version, entidad, id_entidad) VALUES (%s, %s, %s, %s)",
+        (id_user, version, entidad, id_entidad)
+    )
+
+def conditional_get(f=None, *, por_dia=False):
+    """
+    Responde con ETag derivado de (usuario, data_version). Si el cliente manda
+    If-None-Match con el mismo valor se devuelve 304 con una sola lectura por
+    llave primaria, sin ejecutar la consulta de la vista. Va debajo de
+    @require_auth (usa g.user).
+
+    @conditional_get(por_dia=True) agrega la fecha al ETag, para vistas que
+    cambian con el día aunque no haya escrituras (proyecciones, ventanas
+    relativas a hoy).
+    """
+    if f is None:
+        return lambda vista: conditional_get(vista, por_dia=por_dia)
+
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        id_user = g.user['id_user']
+        cur = mysql.connection.cursor()
+        cur.execute("SELECT data_version FROM users WHERE id_user=%s", (id_user,))
+        fila = cur.fetchone()
+        cur.close()
+        if fila is None:
+            return f(*args, **kwargs)
+
+        etag = f"{ETAG_FORMATO}-{id_user}-{fila[0]}"
+        if por_dia:
+            etag += f"-{datetime.now():%Y%m%d}"
+        if request.if_none_match.contains_weak(etag):
+            respuesta = Response(status=304)
+        else:
+            respuesta = current_app.make_response(f(*args, **kwargs))
+            if respuesta.status_code != 200:
+                return respuesta
+        respuesta.set_etag(etag, weak=True)
+        # El cliente puede guardar la respuesta pero debe revalidar siempre
+        respuesta.headers['Cache-Control'] = 'private, no-cache'
+        return respuesta
+    return wrapper
 
 # ===========================
 # REGISTRO DE USUARIOS
 # ===========================
-@app.route('/register', methods=['POST'])
+@bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
     username = data.get('username')
@@ -51,8 +299,14 @@ def register():
 
     if not all([username, email, password]):
         return jsonify({"error": "Faltan datos"}), 400
+    if not all(isinstance(v, str) for v in (username, email, password)):
+        return jsonify({"error": "Datos inválidos"}), 400
 
-    hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
+    espera = register_ip_limiter.acquire(request.remote_addr)
+    if espera:
+        return rate_limited(espera)
+
+    hashed_password = passwords.hash(password)
 
     cur = mysql.connection.cursor()
     cur.execute(
@@ -66,7 +320,7 @@ def register():
 # ===========================
 # LOGIN
 # ===========================
-@app.route('/login', methods=['POST'])
+@bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
     email = data.get('email')
@@ -74,315 +328,1334 @@ def login():
 
     if not all([email, password]):
         return jsonify({"error": "Faltan datos"}), 400
+    if not isinstance(email, str) or not isinstance(password, str):
+        return jsonify({"error": "Datos inválidos"}), 400
+
+    # Antes de tocar la base o bcrypt: por IP (ráfagas) y por email (fuerza bruta a una cuenta)
+    espera = login_ip_limiter.acquire(request.remote_addr) or login_email_limiter.acquire(email.strip().lower())
+    if espera:
+        return rate_limited(espera)
 
     cur = mysql.connection.cursor()
-    cur.execute("SELECT id_user, username, password FROM users WHERE email=%s", (email,))
+    cur.execute(
+        "SELECT id_user, username, password, perfil_riesgo, meta_actual FROM users WHERE email=%s",
+        (email,)
+    )
     user = cur.fetchone()
-    cur.close()
 
-    if user and bcrypt.check_password_hash(user[2], password):
-        return jsonify({"message": "Login exitoso", "username": user[1], "id_user": user[0]})
-    else:
+    # Sin usuario se verifica contra un hash de referencia: mismo costo, mismo 401
+    if not passwords.check(user[2] if user else None, password):
+        cur.close()
         return jsonify({"error": "Credenciales inválidas"}), 401
 
-# ===========================
-# MOVIMIENTOS (CRUD)
-# ===========================
-@app.route('/movements', methods=['POST'])
-def add_movement():
-    data = request.get_json()
-    id_user = data.get('id_user')
-    categoria = data.get('categoria')
-    nota = data.get('nota')
-    monto = data.get('monto')
-    tipo = data.get('tipo', 'Egreso')
+    if passwords.needs_rehash(user[2]):
+        # BCRYPT_ROUNDS cambió desde que se guardó este hash
+        cur.execute("UPDATE users SET password=%s WHERE id_user=%s", (passwords.rehash(password), user[0]))
+
+    usuario = {"id_user": user[0], "username": user[1], "perfil_riesgo": user[3], "meta_actual": user[4]}
+    # Limpieza oportunista de refresh tokens vencidos del usuario
+    cur.execute("DELETE FROM refresh_tokens WHERE user_id=%s AND expira < NOW()", (user[0],))
+    sesion = issue_session(cur, usuario)
+    mysql.connection.commit()
+    cur.close()
+    return jsonify(dict(sesion, message="Login exitoso", username=user[1], id_user=user[0]))
+
+@bp.route('/auth/refresh', methods=['POST'])
+def refresh_session():
+    """
+    Rota el refresh token: el recibido queda revocado y se emite un par nuevo.
+    Presentar uno ya revocado se trata como robo y revoca toda la familia.
+    """
+    data = request.get_json(silent=True) or {}
+    refresh = data.get('refresh_token')
+    if not refresh:
+        return jsonify({"error": "Falta refresh_token"}), 400
 
-    if not all([id_user, categoria, monto]):
-        return jsonify({'error': 'Faltan datos'}), 400
+    cur = mysql.connection.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT t.id_token, t.familia, t.expira, t.revocado,
+                   u.id_user, u.username, u.perfil_riesgo, u.meta_actual
+            FROM refresh_tokens t JOIN users u ON u.id_user = t.user_id
+            WHERE t.token_hash=%s FOR UPDATE
+            """,
+            (hash_refresh(refresh),)
+        )
+        fila = cur.fetchone()
+        if fila is None or fila[2] < datetime.now():
+            mysql.connection.rollback()
+            raise AuthError("Refresh token inválido")
+        id_token, familia, _, revocado = fila[:4]
+        if revocado is not None:
+            cur.execute(
+                "UPDATE refresh_tokens SET revocado=NOW() WHERE familia=%s AND revocado IS NULL",
+                (familia,)
+            )
+            mysql.connection.commit()
+            print(f"Reuso de refresh token revocado (usuario {fila[4]}); familia revocada")
+            raise AuthError("Refresh token inválido")
+
+        cur.execute("UPDATE refresh_tokens SET revocado=NOW() WHERE id_token=%s", (id_token,))
+        usuario = {"id_user": fila[4], "username": fila[5], "perfil_riesgo": fila[6], "meta_actual": fila[7]}
+        sesion = issue_session(cur, usuario, familia)
+        mysql.connection.commit()
+    finally:
+        cur.close()
+    return jsonify(sesion)
 
+@bp.route('/logout', methods=['POST'])
+def logout():
+    """Revoca la familia del refresh token (el access token vence solo)."""
+    data = request.get_json(silent=True) or {}
+    refresh = data.get('refresh_token')
+    if not refresh:
+        return jsonify({"error": "Falta refresh_token"}), 400
     cur = mysql.connection.cursor()
     cur.execute(
-        "INSERT INTO movimientos (user_id, categoria, nota, monto, tipo) VALUES (%s, %s, %s, %s, %s)",
-        (id_user, categoria, nota, monto, tipo)
+        """
+        UPDATE refresh_tokens t
+        JOIN refresh_tokens r ON r.familia = t.familia
+        SET t.revocado = NOW()
+        WHERE r.token_hash=%s AND t.revocado IS NULL
+        """,
+        (hash_refresh(refresh),)
     )
     mysql.connection.commit()
     cur.close()
-    return jsonify({'message': 'Movimiento agregado exitosamente'}), 201
+    return jsonify({"message": "Sesión cerrada"})
 
-@app.route('/movements/<int:id_user>', methods=['GET'])
-def get_movements(id_user):
+# ===========================
+# OPERACIONES
+# ===========================
+# Las escrituras y lecturas de movimientos y metas son funciones
+# op_*(cur, id_user, datos) -> (resultado, status) que no hacen commit: los
+# endpoints REST las ejecutan una por transacción (run_operation) y /batch
+# compone varias sobre la misma conexión.
+class OperationError(Exception):
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.status = status
+
+def run_operation(fn, datos):
+    """Ejecuta una operación de escritura en su propia transacción y arma la respuesta."""
+    id_user = g.user['id_user']
     cur = mysql.connection.cursor()
-    cur.execute("SELECT * FROM movimientos WHERE user_id=%s ORDER BY fecha DESC", (id_user,))
-    movimientos = cur.fetchall()
-    cur.close()
+    try:
+        resultado, status = fn(cur, id_user, datos)
+        mysql.connection.commit()
+    except OperationError as e:
+        mysql.connection.rollback()
+        return jsonify({"error": str(e)}), e.status
+    except Exception:
+        mysql.connection.rollback()
+        raise
+    finally:
+        cur.close()
+    on_user_data_changed(id_user)
+    return jsonify(resultado), status
 
-    movimientos_list = [
-        {
-            "id_movimiento": m[0],
-            "user_id": m[1],
-            "fecha": str(m[2]),
-            "monto": float(m[3]),
-            "categoria": m[4],
-            "nota": m[5],
-            "tipo": m[6]
-        }
-        for m in movimientos
-    ]
-    return jsonify(movimientos_list)
+def run_read(fn, id_user, datos=None):
+    """Ejecuta una operación de lectura (sin commit) y arma la respuesta."""
+    cur = mysql.connection.cursor()
+    try:
+        resultado, status = fn(cur, id_user, datos or {})
+    except OperationError as e:
+        return jsonify({"error": str(e)}), e.status
+    finally:
+        cur.close()
+    return jsonify(resultado), status
 
-@app.route('/movements/<int:id_movimiento>', methods=['PUT'])
-def update_movement(id_movimiento):
-    data = request.get_json()
-    categoria = data.get('categoria')
-    nota = data.get('nota')
-    monto = data.get('monto')
-    tipo = data.get('tipo', 'Egreso')
+# ===========================
+# MOVIMIENTOS (CRUD)
+# ===========================
+def op_add_movement(cur, id_user, datos):
+    categoria = datos.get('categoria')
+    nota = datos.get('nota')
+    monto = datos.get('monto')
+    tipo = datos.get('tipo', 'Egreso')
 
     if not all([categoria, monto]):
-        return jsonify({'error': 'Faltan datos'}), 400
+        raise OperationError('Faltan datos')
 
-    cur = mysql.connection.cursor()
+    version = bump_data_version(cur, id_user)
     cur.execute(
-        "UPDATE movimientos SET categoria=%s, nota=%s, monto=%s, tipo=%s WHERE id_movimiento=%s",
-        (categoria, nota, monto, tipo, id_movimiento)
+        "INSERT INTO movimientos (user_id, categoria, nota, monto, tipo, version) VALUES (%s, %s, %s, %s, %s, %s)",
+        (id_user, categoria, nota, monto, tipo, version)
     )
-    mysql.connection.commit()
-    cur.close()
-    return jsonify({'message': 'Movimiento actualizado exitosamente'})
+    id_movimiento = cur.lastrowid
+    rollups.apply_movement(cur, id_movimiento, 1)
+    spending_stats.apply_movement(cur, id_user, id_movimiento, 1)
+    return {'message': 'Movimiento agregado exitosamente', 'id_movimiento': id_movimiento}, 201
+
+def lock_own_movement(cur, id_user, id_movimiento):
+    """
+    Bloquea la fila para que el delta viejo/nuevo del resumen sea consistente
+    y verifica que sea del usuario de la sesión.
+    """
+    cur.execute("SELECT user_id FROM movimientos WHERE id_movimiento=%s FOR UPDATE", (id_movimiento,))
+    fila = cur.fetchone()
+    if fila is None or fila[0] != id_user:
+        raise OperationError('Movimiento no encontrado', 404)
+
+def op_update_movement(cur, id_user, datos):
+    id_movimiento = datos.get('id_movimiento')
+    categoria = datos.get('categoria')
+    nota = datos.get('nota')
+    monto = datos.get('monto')
+    tipo = datos.get('tipo', 'Egreso')
+
+    if not all([id_movimiento, categoria, monto]):
+        raise OperationError('Faltan datos')
+
+    lock_own_movement(cur, id_user, id_movimiento)
+    version = bump_data_version(cur, id_user)
+    rollups.apply_movement(cur, id_movimiento, -1)
+    spending_stats.apply_movement(cur, id_user, id_movimiento, -1)
+    cur.execute(
+        "UPDATE movimientos SET categoria=%s, nota=%s, monto=%s, tipo=%s, version=%s WHERE id_movimiento=%s",
+        (categoria, nota, monto, tipo, version, id_movimiento)
+    )
+    rollups.apply_movement(cur, id_movimiento, 1)
+    spending_stats.apply_movement(cur, id_user, id_movimiento, 1)
+    return {'message': 'Movimiento actualizado exitosamente'}, 200
+
+def op_delete_movement(cur, id_user, datos):
+    id_movimiento = datos.get('id_movimiento')
+    if not id_movimiento:
+        raise OperationError('Faltan datos')
+
+    lock_own_movement(cur, id_user, id_movimiento)
+    version = bump_data_version(cur, id_user)
+    rollups.apply_movement(cur, id_movimiento, -1)
+    spending_stats.apply_movement(cur, id_user, id_movimiento, -1)
+    cur.execute("DELETE FROM movimientos WHERE id_movimiento=%s", (id_movimiento,))
+    record_tombstone(cur, id_user, 'movimiento', id_movimiento, version)
+    return {'message': 'Movimiento eliminado exitosamente'}, 200
+
+@bp.route('/movements', methods=['POST'])
+@require_auth
+def add_movement():
+    data = request.get_json()
+    session_user_id(data.get('id_user'))
+    return run_operation(op_add_movement, data)
 
-@app.route('/movements/<int:id_movimiento>', methods=['DELETE'])
+@bp.route('/movements/<int:id_movimiento>', methods=['PUT'])
+@require_auth
+def update_movement(id_movimiento):
+    return run_operation(op_update_movement, dict(request.get_json(), id_movimiento=id_movimiento))
+
+@bp.route('/movements/<int:id_movimiento>', methods=['DELETE'])
+@require_auth
 def delete_movement(id_movimiento):
+    return run_operation(op_delete_movement, {'id_movimiento': id_movimiento})
+
+# ===========================
+# IMPORTACIÓN MASIVA
+# ===========================
+BULK_CHUNK_SIZE = int(os.getenv('BULK_CHUNK_SIZE', 1000))
+BULK_CHUNK_SIZE_MAX = 5000
+TIPOS_MOVIMIENTO = ('Ingreso', 'Egreso')
+# Tamaños de las columnas de movimientos (migrations/0001_esquema_inicial.sql)
+CATEGORIA_MAX = 100
+NOTA_MAX = 255
+MONTO_MAX = Decimal('9999999999.99')  # DECIMAL(12, 2)
+
+def bulk_text(row, campo, maximo=None):
+    """Texto opcional de la fila sin espacios alrededor; ValueError si no es texto o no cabe."""
+    valor = row.get(campo)
+    if valor is None:
+        return ''
+    if not isinstance(valor, str):
+        raise ValueError(f"{campo} debe ser texto")
+    valor = valor.strip()
+    if maximo is not None and len(valor) > maximo:
+        raise ValueError(f"{campo} excede {maximo} caracteres")
+    return valor
+
+def parse_movement_row(row, default_user):
+    """
+    Valida una fila de importación (dict de JSON o de CSV) y devuelve la tupla
+    (user_id, fecha, monto, tipo, categoria, nota). Lanza ValueError con el motivo,
+    también si un valor no es del tipo esperado o no cabe en su columna (en
+    modo estricto una sola fila así haría fallar el executemany del lote).
+    """
+    user_id = row.get('id_user') or default_user
+    categoria = bulk_text(row, 'categoria', CATEGORIA_MAX)
+    nota = bulk_text(row, 'nota', NOTA_MAX) or None
+    tipo = bulk_text(row, 'tipo') or 'Egreso'
+    if not user_id:
+        raise ValueError("Falta id_user")
+    if isinstance(user_id, bool) or not isinstance(user_id, (int, str)):
+        raise ValueError(f"id_user inválido: {user_id}")
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        raise ValueError(f"id_user inválido: {user_id}")
+    if not categoria:
+        raise ValueError("Falta categoria")
+    if tipo not in TIPOS_MOVIMIENTO:
+        raise ValueError(f"tipo inválido: {tipo}")
+    monto_raw = row.get('monto')
+    if isinstance(monto_raw, bool) or not isinstance(monto_raw, (int, float, str)):
+        raise ValueError(f"monto inválido: {monto_raw}")
+    try:
+        monto = Decimal(str(monto_raw).strip())
+    except InvalidOperation:
+        raise ValueError(f"monto inválido: {monto_raw}")
+    if not monto.is_finite() or monto <= 0:
+        raise ValueError(f"monto inválido: {monto_raw}")
+    # Como lo guarda MySQL en DECIMAL(12, 2)
+    monto = monto.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+    if monto <= 0 or monto > MONTO_MAX:
+        raise ValueError(f"monto fuera de rango: {monto_raw}")
+
+    fecha_raw = bulk_text(row, 'fecha')
+    if fecha_raw:
+        for formato in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+            try:
+                fecha = datetime.strptime(fecha_raw, formato)
+                break
+            except ValueError:
+                continue
+        else:
+            raise ValueError(f"fecha inválida: {fecha_raw}")
+    else:
+        fecha = datetime.now()
+    return (user_id, fecha, monto, tipo, categoria, nota)
+
+def iter_bulk_rows():
+    """
+    Devuelve (id_user por defecto, iterador de filas) según el tipo de petición:
+    un CSV subido como 'file' (multipart) o JSON, ya sea una lista o
+    {"id_user": ..., "movimientos": [...]}.
+    """
+    archivo = request.files.get('file')
+    if archivo is not None:
+        # El CSV se lee en streaming, fila por fila, sin cargarlo completo
+        texto = io.TextIOWrapper(archivo.stream, encoding='utf-8-sig', newline='')
+        return request.form.get('id_user'), csv.DictReader(texto)
+
+    data = request.get_json(silent=True)
+    if isinstance(data, list):
+        return None, iter(data)
+    if isinstance(data, dict) and isinstance(data.get('movimientos'), list):
+        return data.get('id_user'), iter(data['movimientos'])
+    return None, None
+
+def insert_movement_chunk(cur, filas, version):
+    cur.executemany(
+        "INSERT INTO movimientos (user_id, fecha, monto, tipo, categoria, nota, version) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        [f + (version,) for f in filas]
+    )
+    rollups.apply_deltas(cur, [f[:5] for f in filas])
+    spending_stats.apply_rows(cur, [f[:5] for f in filas])
+
+@bp.route('/movements/bulk', methods=['POST'])
+@require_auth
+def bulk_movements():
+    """
+    Importa muchos movimientos en una sola transacción, insertando en lotes
+    con executemany. Las filas inválidas se reportan sin abortar el resto.
+    """
+    default_user, filas_entrada = iter_bulk_rows()
+    if filas_entrada is None:
+        return jsonify({'error': 'Envía un CSV en "file" o una lista JSON de movimientos'}), 400
+    id_user = session_user_id(default_user)
+
+    chunk_size = request.args.get('chunk_size', BULK_CHUNK_SIZE, type=int)
+    chunk_size = max(1, min(chunk_size, BULK_CHUNK_SIZE_MAX))
+
+    errores = []
+    insertados = 0
+    version = None
+    lote = []
     cur = mysql.connection.cursor()
-    cur.execute("DELETE FROM movimientos WHERE id_movimiento=%s", (id_movimiento,))
-    mysql.connection.commit()
-    cur.close()
-    return jsonify({'message': 'Movimiento eliminado exitosamente'})
+    try:
+        for indice, row in enumerate(filas_entrada, start=1):
+            if not isinstance(row, dict):
+                errores.append({'fila': indice, 'error': 'La fila debe ser un objeto'})
+                continue
+            try:
+                fila = parse_movement_row(row, id_user)
+                if fila[0] != id_user:
+                    raise ValueError("id_user no corresponde a la sesión")
+                lote.append(fila)
+            except ValueError as e:
+                errores.append({'fila': indice, 'error': str(e)})
+                continue
+            if len(lote) >= chunk_size:
+                if version is None:
+                    version = bump_data_version(cur, id_user)
+                insert_movement_chunk(cur, lote, version)
+                insertados += len(lote)
+                lote = []
+        if lote:
+            if version is None:
+                version = bump_data_version(cur, id_user)
+            insert_movement_chunk(cur, lote, version)
+            insertados += len(lote)
+        mysql.connection.commit()
+    except (csv.Error, UnicodeDecodeError) as e:
+        mysql.connection.rollback()
+        return jsonify({'error': f'CSV inválido: {e}'}), 400
+    except Exception:
+        mysql.connection.rollback()
+        raise
+    finally:
+        cur.close()
 
-@app.route('/movements/summary/<int:id_user>', methods=['GET'])
-def movements_summary(id_user):
+    if insertados:
+        on_user_data_changed(id_user)
+    status = 201 if insertados or not errores else 400
+    return jsonify({'insertados': insertados, 'errores': errores}), status
+
+# Columnas explícitas (nada de SELECT *) en el orden que espera movement_to_dict
+MOVIMIENTO_CAMPOS = ("id_movimiento", "user_id", "fecha", "monto", "categoria", "nota", "tipo")
+MOVIMIENTO_COLUMNAS = ", ".join(MOVIMIENTO_CAMPOS)
+# Las mismas columnas ya en el formato de la API (fecha como str(datetime),
+# monto como DOUBLE): el streaming de GET /movements arma cada objeto con
+# dict(zip()) sin convertir valor por valor en Python
+MOVIMIENTO_COLUMNAS_JSON = (
+    "id_movimiento, user_id, DATE_FORMAT(fecha, '%%Y-%%m-%%d %%H:%%i:%%s'), "
+    "monto + 0e0, categoria, nota, tipo"
+)
+MOVIMIENTOS_LIMITE_MAX = 500
+# El formato columnar pesa mucho menos por fila y admite páginas más grandes
+MOVIMIENTOS_COLUMNAR_MAX = int(os.getenv('MOVIMIENTOS_COLUMNAR_MAX', 5000))
+MOVIMIENTOS_LOTE = 200  # filas por fetchmany al hacer streaming
+
+def movement_to_dict(m):
+    return {
+        "id_movimiento": m[0],
+        "user_id": m[1],
+        "fecha": str(m[2]),
+        "monto": float(m[3]),
+        "categoria": m[4],
+        "nota": m[5],
+        "tipo": m[6]
+    }
+
+def movements_to_columns(filas):
+    """
+    Formato columnar: un arreglo por columna en lugar de un objeto por fila.
+    Se arma directo desde las tuplas del cursor, sin un dict por movimiento.
+    """
+    if not filas:
+        return {columna: [] for columna in MOVIMIENTO_CAMPOS}
+    ids, usuarios, fechas, montos, categorias, notas, tipos = zip(*filas)
+    return {
+        "id_movimiento": list(ids),
+        "user_id": list(usuarios),
+        "fecha": list(map(str, fechas)),
+        "monto": list(map(float, montos)),
+        "categoria": list(categorias),
+        "nota": list(notas),
+        "tipo": list(tipos),
+    }
+
+def encode_cursor(fecha, id_movimiento):
+    """Cursor opaco para la paginación por llave (fecha, id_movimiento)."""
+    raw = f"{fecha}|{id_movimiento}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor):
+    raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+    fecha, id_movimiento = raw.rsplit('|', 1)
+    return fecha, int(id_movimiento)
+
+def parse_fecha(valor):
+    return datetime.strptime(valor, '%Y-%m-%d')
+
+def build_movements_query(id_user, args, limite_max=MOVIMIENTOS_LIMITE_MAX, columnas=MOVIMIENTO_COLUMNAS):
+    """
+    Arma el SELECT de movimientos a partir de los filtros (from, to, tipo,
+    categoria, cursor, limit). Devuelve (query, params, limit); limit es None
+    si no se pidió paginación. Lanza OperationError si un filtro es inválido.
+    """
+    condiciones = ["user_id=%s"]
+    params = [id_user]
+
+    try:
+        if args.get('from'):
+            condiciones.append("fecha >= %s")
+            params.append(parse_fecha(args['from']).strftime('%Y-%m-%d'))
+        if args.get('to'):
+            condiciones.append("fecha < %s")
+            params.append((parse_fecha(args['to']) + timedelta(days=1)).strftime('%Y-%m-%d'))
+    except ValueError:
+        raise OperationError("Formato de fecha inválido, usa YYYY-MM-DD")
+
+    if args.get('tipo'):
+        condiciones.append("tipo=%s")
+        params.append(args['tipo'])
+    if args.get('categoria'):
+        condiciones.append("categoria=%s")
+        params.append(args['categoria'])
+
+    if args.get('cursor'):
+        try:
+            cursor_fecha, cursor_id = decode_cursor(args['cursor'])
+        except (ValueError, UnicodeDecodeError):
+            raise OperationError("Cursor inválido")
+        condiciones.append("(fecha < %s OR (fecha = %s AND id_movimiento < %s))")
+        params.extend([cursor_fecha, cursor_fecha, cursor_id])
+
+    try:
+        limit = int(args['limit']) if args.get('limit') not in (None, '') else None
+    except (TypeError, ValueError):
+        raise OperationError("limit debe ser un número entero")
+    if limit is not None and limit <= 0:
+        raise OperationError("limit debe ser mayor a 0")
+    paginado = limit is not None
+    if paginado:
+        limit = min(limit, limite_max)
+
+    query = (
+        f"SELECT {columnas} FROM movimientos WHERE {' AND '.join(condiciones)} "
+        "ORDER BY fecha DESC, id_movimiento DESC"
+    )
+    if paginado:
+        # Una fila extra para saber si existe una página siguiente
+        query += " LIMIT %s"
+        params.append(limit + 1)
+    return query, params, limit
+
+@bp.route('/movements/<int:id_user>', methods=['GET'])
+@require_auth
+@conditional_get
+def get_movements(id_user):
+    """
+    Lista los movimientos del usuario, del más reciente al más antiguo.
+
+    Parámetros opcionales (query string):
+      - from / to: rango de fechas YYYY-MM-DD (ambos inclusivos)
+      - tipo, categoria: filtros exactos
+      - limit: tamaño de página; si se envía la respuesta es
+        {"items": [...], "next_cursor": "..."} en vez de una lista
+      - cursor: valor de next_cursor de la página anterior
+      - format=columnar: {"items": {"id_movimiento": [...], "fecha": [...], ...},
+        "next_cursor": "..."}; siempre paginado (limit por defecto y máximo
+        MOVIMIENTOS_COLUMNAR_MAX)
+
+    Sin 'limit' se conserva la respuesta original (una lista JSON), pero se
+    escribe en streaming por lotes para que la memoria no crezca con el historial.
+    """
+    if request.args.get('format') == 'columnar':
+        return get_movements_columnar(id_user)
+    try:
+        query, params, limit = build_movements_query(
+            id_user, request.args, columnas=MOVIMIENTO_COLUMNAS_JSON
+        )
+    except OperationError as e:
+        return jsonify({"error": str(e)}), e.status
+    paginado = limit is not None
+    dumps = current_app.json.dumpb
+
+    def generate():
+        # SSCursor deja las filas en el servidor: fetchmany trae solo un lote a la vez
+        cur = mysql.connection.cursor(MySQLdb.cursors.SSCursor)
+        try:
+            cur.execute(query, params)
+            yield '{"items": [' if paginado else '['
+            enviados = 0
+            ultimo = None
+            siguiente = False
+            while True:
+                lote = cur.fetchmany(MOVIMIENTOS_LOTE)
+                if not lote:
+                    break
+                if paginado and enviados + len(lote) > limit:
+                    lote = lote[:limit - enviados]
+                    siguiente = True
+                if lote:
+                    # Un lote completo por llamada al serializador: se quitan
+                    # los corchetes del arreglo y se pegan los lotes con comas
+                    yield (b',' if enviados else b'') + dumps([dict(zip(MOVIMIENTO_CAMPOS, m)) for m in lote])[1:-1]
+                    enviados += len(lote)
+                    ultimo = lote[-1]
+                if siguiente:
+                    # Vaciar el resultado pendiente antes de cerrar el cursor
+                    while cur.fetchmany(MOVIMIENTOS_LOTE):
+                        pass
+                    break
+            if paginado:
+                next_cursor = encode_cursor(ultimo[2], ultimo[0]) if siguiente else None
+                yield b'], "next_cursor": ' + dumps(next_cursor) + b'}'
+            else:
+                yield b']'
+        finally:
+            cur.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+def get_movements_columnar(id_user):
+    args = request.args.to_dict()
+    if args.get('limit') in (None, ''):
+        # Sin límite se usa el máximo: la respuesta no va en streaming
+        args['limit'] = MOVIMIENTOS_COLUMNAR_MAX
+    try:
+        query, params, limit = build_movements_query(id_user, args, MOVIMIENTOS_COLUMNAR_MAX)
+    except OperationError as e:
+        return jsonify({"error": str(e)}), e.status
     cur = mysql.connection.cursor()
+    cur.execute(query, params)
+    filas = cur.fetchall()
+    cur.close()
+    siguiente = len(filas) > limit
+    filas = filas[:limit]
+    next_cursor = encode_cursor(filas[-1][2], filas[-1][0]) if siguiente else None
+    return jsonify({"items": movements_to_columns(filas), "next_cursor": next_cursor})
+
+def op_list_movements(cur, id_user, datos):
+    """Una página de movimientos con los filtros de GET /movements (limit por defecto 50)."""
+    query, params, limit = build_movements_query(id_user, dict(datos, limit=datos.get('limit') or 50))
+    cur.execute(query, params)
+    filas = cur.fetchall()
+    siguiente = len(filas) > limit
+    filas = filas[:limit]
+    next_cursor = encode_cursor(filas[-1][2], filas[-1][0]) if siguiente else None
+    return {"items": [movement_to_dict(m) for m in filas], "next_cursor": next_cursor}, 200
+
+def op_movements_summary(cur, id_user, datos):
     cur.execute(
-        "SELECT categoria, SUM(monto) as total FROM movimientos WHERE user_id=%s GROUP BY categoria",
+        "SELECT categoria, SUM(total) as total FROM resumen_movimientos WHERE user_id=%s GROUP BY categoria",
         (id_user,)
     )
     resumen = cur.fetchall()
-    cur.close()
+    return [{"categoria": r[0], "total": float(r[1])} for r in resumen], 200
+
+def op_balance(cur, id_user, datos):
+    cur.execute("SELECT tipo, SUM(total) FROM resumen_movimientos WHERE user_id=%s GROUP BY tipo", (id_user,))
+    resultados = cur.fetchall()
+    ingresos = float(next((r[1] for r in resultados if r[0] == 'Ingreso'), 0))
+    egresos = float(next((r[1] for r in resultados if r[0] == 'Egreso'), 0))
+    return {"ingresos": ingresos, "egresos": egresos, "balance": ingresos - egresos}, 200
 
-    resumen_list = [{"categoria": r[0], "total": float(r[1])} for r in resumen]
-    return jsonify(resumen_list)
+@bp.route('/movements/summary/<int:id_user>', methods=['GET'])
+@require_auth
+@conditional_get
+def movements_summary(id_user):
+    return run_read(op_movements_summary, id_user)
 
-@app.route('/balance/<int:id_user>', methods=['GET'])
+@bp.route('/balance/<int:id_user>', methods=['GET'])
+@require_auth
+@conditional_get
 def balance(id_user):
+    return run_read(op_balance, id_user)
+
+# Agrupaciones permitidas para /movements/stats (formato ya escapado para MySQLdb)
+STATS_AGRUPACIONES = {
+    'month': "DATE_FORMAT(fecha, '%%Y-%%m')",
+    'week': "DATE_FORMAT(fecha, '%%x-W%%v')",
+    'day': "DATE_FORMAT(fecha, '%%Y-%%m-%%d')",
+}
+
+def default_stats_inicio(agrupacion, hoy):
+    """Inicio de la ventana por defecto: 12 meses, 12 semanas o 30 días."""
+    if agrupacion == 'month':
+        mes = hoy.month - 11
+        anio = hoy.year
+        if mes <= 0:
+            mes += 12
+            anio -= 1
+        return datetime(anio, mes, 1)
+    if agrupacion == 'week':
+        lunes = hoy - timedelta(days=hoy.weekday())
+        return datetime(lunes.year, lunes.month, lunes.day) - timedelta(weeks=11)
+    return datetime(hoy.year, hoy.month, hoy.day) - timedelta(days=29)
+
+@bp.route('/movements/stats/<int:id_user>', methods=['GET'])
+@require_auth
+def movements_stats(id_user):
+    """
+    Series de ingresos, egresos y balance agrupadas en MySQL, más el desglose
+    por categoría de la misma ventana.
+
+    Parámetros opcionales: group=month|week|day (por defecto month) y
+    from / to en formato YYYY-MM-DD.
+    """
+    agrupacion = request.args.get('group', 'month')
+    if agrupacion not in STATS_AGRUPACIONES:
+        return jsonify({"error": "group debe ser month, week o day"}), 400
+
+    try:
+        if request.args.get('from'):
+            inicio = parse_fecha(request.args['from'])
+        else:
+            inicio = default_stats_inicio(agrupacion, datetime.now())
+        condiciones = ["user_id=%s", "fecha >= %s"]
+        params = [id_user, inicio.strftime('%Y-%m-%d')]
+        if request.args.get('to'):
+            condiciones.append("fecha < %s")
+            params.append((parse_fecha(request.args['to']) + timedelta(days=1)).strftime('%Y-%m-%d'))
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido, usa YYYY-MM-DD"}), 400
+
+    where = ' AND '.join(condiciones)
+    periodo = STATS_AGRUPACIONES[agrupacion]
+
     cur = mysql.connection.cursor()
-    cur.execute("SELECT tipo, SUM(monto) FROM movimientos WHERE user_id=%s GROUP BY tipo", (id_user,))
-    resultados = cur.fetchall()
+    cur.execute(
+        f"""
+        SELECT {periodo} AS periodo,
+               SUM(CASE WHEN tipo='Ingreso' THEN monto ELSE 0 END) AS ingresos,
+               SUM(CASE WHEN tipo='Egreso' THEN monto ELSE 0 END) AS egresos
+        FROM movimientos
+        WHERE {where}
+        GROUP BY periodo
+        ORDER BY periodo
+        """,
+        params
+    )
+    series_rows = cur.fetchall()
+    cur.execute(
+        f"SELECT tipo, categoria, SUM(monto) AS total FROM movimientos WHERE {where} "
+        "GROUP BY tipo, categoria ORDER BY total DESC",
+        params
+    )
+    categorias_rows = cur.fetchall()
     cur.close()
 
-    ingresos = float(next((r[1] for r in resultados if r[0] == 'Ingreso'), 0))
-    egresos = float(next((r[1] for r in resultados if r[0] == 'Egreso'), 0))
-    return jsonify({"ingresos": ingresos, "egresos": egresos, "balance": ingresos - egresos})
+    series = []
+    total_ingresos = 0.0
+    total_egresos = 0.0
+    for r in series_rows:
+        ingresos = float(r[1] or 0)
+        egresos = float(r[2] or 0)
+        total_ingresos += ingresos
+        total_egresos += egresos
+        series.append({
+            "periodo": r[0],
+            "ingresos": ingresos,
+            "egresos": egresos,
+            "balance": ingresos - egresos
+        })
+
+    return jsonify({
+        "agrupacion": agrupacion,
+        "desde": params[1],
+        "series": series,
+        "categorias": [
+            {"tipo": r[0], "categoria": r[1], "total": float(r[2])} for r in categorias_rows
+        ],
+        "totales": {
+            "ingresos": total_ingresos,
+            "egresos": total_egresos,
+            "balance": total_ingresos - total_egresos
+        }
+    })
 
 # ===========================
-# METAS DE AHORRO
+# METAS (AHORRO E INVERSIÓN)
 # ===========================
-@app.route('/goals/ahorro/<int:id_user>', methods=['GET'])
-def get_ahorro_goals(id_user):
-    cur = mysql.connection.cursor()
+# tipo en la URL -> (tabla, llave del id en el JSON, nombre para los mensajes)
+GOAL_TIPOS = {
+    'ahorro': ('metas_ahorro', 'id_ahorro', 'Meta de ahorro'),
+    'inversion': ('metas_inversion', 'id_inversion', 'Meta de inversión'),
+}
+
+META_COLUMNAS = "id_meta, descripcion, monto_objetivo, monto_actual, fecha_objetivo"
+
+def goal_to_dict(m, llave_id):
+    """Fila de META_COLUMNAS -> JSON de la app."""
+    return {
+        llave_id: m[0],
+        "nombre_meta": m[1],
+        "monto_objetivo": float(m[2]),
+        "monto_actual": float(m[3]),
+        "fecha_objetivo": m[4].strftime('%Y-%m-%d') if m[4] else None
+    }
+
+def goal_tipo(datos):
+    tipo = datos.get('tipo')
+    if tipo not in GOAL_TIPOS:
+        raise OperationError("tipo de meta inválido (ahorro o inversion)")
+    return tipo, GOAL_TIPOS[tipo]
+
+def check_own_goal(cur, id_user, tabla, id_meta):
+    """Bloquea la meta si es del usuario y devuelve su monto_actual."""
+    cur.execute(f"SELECT user_id, monto_actual FROM {tabla} WHERE id_meta=%s FOR UPDATE", (id_meta,))
+    meta = cur.fetchone()
+    if meta is None or meta[0] != id_user:
+        raise OperationError("Meta no encontrada", 404)
+    return meta[1]
+
+def goal_fecha_objetivo(datos):
+    """fecha_objetivo opcional ('YYYY-MM-DD' o null)."""
+    valor = datos.get('fecha_objetivo')
+    if valor is None:
+        return None
+    try:
+        return parse_fecha(valor).strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        raise OperationError("fecha_objetivo inválida (YYYY-MM-DD)")
+
+def op_list_goals(cur, id_user, datos):
+    tipo, (tabla, llave_id, _) = goal_tipo(datos)
     cur.execute(
-        "SELECT id_meta, descripcion, monto_objetivo, monto_actual FROM metas_ahorro WHERE user_id=%s",
+        f"SELECT {META_COLUMNAS} FROM {tabla} WHERE user_id=%s",
         (id_user,)
     )
-    metas = cur.fetchall()
-    cur.close()
-    metas_list = [
-        {
-            "id_ahorro": m[0],
-            "nombre_meta": m[1],
-            "monto_objetivo": float(m[2]),
-            "monto_actual": float(m[3])
-        } for m in metas
-    ]
-    return jsonify(metas_list)
-
-@app.route('/goals/ahorro', methods=['POST'])
-def create_ahorro_goal():
-    data = request.get_json()
-    user_id = data.get('id_user')
-    nombre_meta = data.get('nombre_meta')
-    monto_objetivo = data.get('monto_objetivo')
+    return [goal_to_dict(m, llave_id) for m in cur.fetchall()], 200
 
-    if not all([user_id, nombre_meta, monto_objetivo]):
-        return jsonify({"error": "Faltan datos"}), 400
+def op_create_goal(cur, id_user, datos):
+    tipo, (tabla, llave_id, nombre) = goal_tipo(datos)
+    nombre_meta = datos.get('nombre_meta')
+    monto_objetivo = datos.get('monto_objetivo')
 
-    cur = mysql.connection.cursor()
+    if not all([nombre_meta, monto_objetivo]):
+        raise OperationError("Faltan datos")
+    fecha_objetivo = goal_fecha_objetivo(datos)
+
+    version = bump_data_version(cur, id_user)
     cur.execute(
-        "INSERT INTO metas_ahorro (user_id, descripcion, monto_objetivo) VALUES (%s, %s, %s)",
-        (user_id, nombre_meta, monto_objetivo)
+        f"INSERT INTO {tabla} (user_id, descripcion, monto_objetivo, fecha_objetivo, version) "
+        "VALUES (%s, %s, %s, %s, %s)",
+        (id_user, nombre_meta, monto_objetivo, fecha_objetivo, version)
     )
-    mysql.connection.commit()
-    cur.close()
-    return jsonify({"message": "Meta de ahorro creada exitosamente"}), 201
+    return {"message": f"{nombre} creada exitosamente", llave_id: cur.lastrowid}, 201
+
+def op_update_goal(cur, id_user, datos):
+    tipo, (tabla, _, nombre) = goal_tipo(datos)
+    id_meta = datos.get('id_meta')
+    monto_actual = datos.get('monto_actual')
+    monto_objetivo = datos.get('monto_objetivo')
+
+    if not id_meta:
+        raise OperationError("Faltan datos")
+    if monto_actual is None and monto_objetivo is None and 'fecha_objetivo' not in datos:
+        raise OperationError("No hay datos para actualizar")
+    fecha_objetivo = goal_fecha_objetivo(datos)
 
-@app.route('/goals/ahorro/<int:id_meta>', methods=['PUT'])
-def update_ahorro_goal(id_meta):
+    anterior = check_own_goal(cur, id_user, tabla, id_meta)
+    version = bump_data_version(cur, id_user)
+    campos = []
+    params = []
+    if monto_actual is not None:
+        campos.append("monto_actual=%s")
+        params.append(monto_actual)
+    if monto_objetivo is not None:
+        campos.append("monto_objetivo=%s")
+        params.append(monto_objetivo)
+    if 'fecha_objetivo' in datos:
+        campos.append("fecha_objetivo=%s")
+        params.append(fecha_objetivo)
+    cur.execute(
+        f"UPDATE {tabla} SET {', '.join(campos)}, version=%s WHERE id_meta=%s",
+        params + [version, id_meta]
+    )
+    if monto_actual is not None:
+        # Historial de aportes: de aquí sale el ritmo de cada meta
+        try:
+            delta = Decimal(str(monto_actual)) - anterior
+        except InvalidOperation:
+            raise OperationError("monto_actual inválido")
+        if delta:
+            cur.execute(
+                "INSERT INTO metas_aportes (user_id, tipo_meta, id_meta, delta) VALUES (%s, %s, %s, %s)",
+                (id_user, tipo, id_meta, delta)
+            )
+    return {"message": f"{nombre} actualizada exitosamente"}, 200
+
+def op_delete_goal(cur, id_user, datos):
+    tipo, (tabla, _, nombre) = goal_tipo(datos)
+    id_meta = datos.get('id_meta')
+    if not id_meta:
+        raise OperationError("Faltan datos")
+
+    check_own_goal(cur, id_user, tabla, id_meta)
+    version = bump_data_version(cur, id_user)
+    cur.execute(f"DELETE FROM {tabla} WHERE id_meta=%s", (id_meta,))
+    cur.execute(
+        "DELETE FROM metas_aportes WHERE user_id=%s AND tipo_meta=%s AND id_meta=%s",
+        (id_user, tipo, id_meta)
+    )
+    record_tombstone(cur, id_user, f'meta_{tipo}', id_meta, version)
+    return {"message": f"{nombre} eliminada exitosamente"}, 200
+
+def op_goals_progress(cur, id_user, datos):
+    """
+    Ritmo, fecha estimada y estado de todas las metas (ver goal_progress.py).
+    Se memoiza por data_version: cualquier escritura de movimientos o metas
+    cambia la versión, así que otro worker nunca sirve un resultado viejo.
+    Dentro de un /batch transaccional que se revierte, batch() descarta lo
+    memoizado con la versión sin confirmar.
+    """
+    hoy = datetime.now().date()
+    llave = (current_data_version(cur, id_user), hoy)
+    memo = goals_progress_memo.get(id_user, llave)
+    if memo is not None:
+        return memo, 200
+
+    desde = hoy - timedelta(days=goal_progress.VENTANA_DIAS)
+    cur.execute(
+        """
+        SELECT 'ahorro', id_meta, descripcion, monto_objetivo, monto_actual, fecha_objetivo
+        FROM metas_ahorro WHERE user_id=%s
+        UNION ALL
+        SELECT 'inversion', id_meta, descripcion, monto_objetivo, monto_actual, fecha_objetivo
+        FROM metas_inversion WHERE user_id=%s
+        """,
+        (id_user, id_user)
+    )
+    filas = cur.fetchall()
+    cur.execute(
+        "SELECT tipo_meta, id_meta, SUM(delta) FROM metas_aportes "
+        "WHERE user_id=%s AND fecha >= %s GROUP BY tipo_meta, id_meta",
+        (id_user, desde.strftime('%Y-%m-%d'))
+    )
+    aportes = {(tipo, id_meta): float(total) for tipo, id_meta, total in cur.fetchall()}
+
+    # Ahorro neto mensual promedio de los últimos meses completos con datos
+    inicio, fin = goal_progress.savings_window(hoy)
+    cur.execute(
+        """
+        SELECT mes, SUM(CASE WHEN tipo='Ingreso' THEN total WHEN tipo='Egreso' THEN -total ELSE 0 END)
+        FROM resumen_movimientos WHERE user_id=%s AND mes >= %s AND mes < %s
+        GROUP BY mes
+        """,
+        (id_user, inicio.strftime('%Y-%m-%d'), fin.strftime('%Y-%m-%d'))
+    )
+    netos = [float(neto) for _, neto in cur.fetchall()]
+    ahorro_neto = sum(netos) / len(netos) if netos else 0.0
+
+    metas = [{
+        "monto_objetivo": float(objetivo),
+        "monto_actual": float(actual),
+        "aportado": aportes.get((tipo, id_meta), 0.0),
+        "fecha_objetivo": fecha_objetivo,
+    } for tipo, id_meta, _, objetivo, actual, fecha_objetivo in filas]
+    progreso = goal_progress.compute(metas, ahorro_neto, hoy)
+
+    resultado = {
+        "ahorro_neto_mensual": round(ahorro_neto, 2),
+        "ventana_dias": goal_progress.VENTANA_DIAS,
+        "motor": goal_progress.ENGINE,
+        "metas": [
+            dict(
+                goal_to_dict((id_meta, descripcion, objetivo, actual, fecha_objetivo), 'id_meta'),
+                tipo=tipo, **calculo
+            )
+            for (tipo, id_meta, descripcion, objetivo, actual, fecha_objetivo), calculo in zip(filas, progreso)
+        ],
+    }
+    goals_progress_memo.set(id_user, resultado, llave)
+    return resultado, 200
+
+@bp.route('/goals/progress/<int:id_user>', methods=['GET'])
+@require_auth
+@conditional_get(por_dia=True)
+def get_goals_progress(id_user):
+    return run_read(op_goals_progress, id_user)
+
+@bp.route('/goals/<any(ahorro, inversion):tipo>/<int:id_user>', methods=['GET'])
+@require_auth
+@conditional_get
+def get_goals(tipo, id_user):
+    return run_read(op_list_goals, id_user, {'tipo': tipo})
+
+@bp.route('/goals/<any(ahorro, inversion):tipo>', methods=['POST'])
+@require_auth
+def create_goal(tipo):
     data = request.get_json()
-    monto_actual = data.get('monto_actual')
-    monto_objetivo = data.get('monto_objetivo')
+    session_user_id(data.get('id_user'))
+    return run_operation(op_create_goal, dict(data, tipo=tipo))
 
-    if monto_actual is None and monto_objetivo is None:
-        return jsonify({"error": "No hay datos para actualizar"}), 400
+@bp.route('/goals/<any(ahorro, inversion):tipo>/<int:id_meta>', methods=['PUT'])
+@require_auth
+def update_goal(tipo, id_meta):
+    return run_operation(op_update_goal, dict(request.get_json(), tipo=tipo, id_meta=id_meta))
 
-    cur = mysql.connection.cursor()
-    if monto_actual is not None and monto_objetivo is not None:
-        cur.execute(
-            "UPDATE metas_ahorro SET monto_actual=%s, monto_objetivo=%s WHERE id_meta=%s",
-            (monto_actual, monto_objetivo, id_meta)
-        )
-    elif monto_actual is not None:
-        cur.execute(
-            "UPDATE metas_ahorro SET monto_actual=%s WHERE id_meta=%s",
-            (monto_actual, id_meta)
-        )
-    elif monto_objetivo is not None:
-        cur.execute(
-            "UPDATE metas_ahorro SET monto_objetivo=%s WHERE id_meta=%s",
-            (monto_objetivo, id_meta)
-        )
-    mysql.connection.commit()
-    cur.close()
-    return jsonify({"message": "Meta de ahorro actualizada exitosamente"})
+@bp.route('/goals/<any(ahorro, inversion):tipo>/<int:id_meta>', methods=['DELETE'])
+@require_auth
+def delete_goal(tipo, id_meta):
+    return run_operation(op_delete_goal, {'tipo': tipo, 'id_meta': id_meta})
 
-@app.route('/goals/ahorro/<int:id_meta>', methods=['DELETE'])
-def delete_ahorro_goal(id_meta):
+# ===========================
+# PRONÓSTICO (MOVIMIENTOS RECURRENTES)
+# ===========================
+def load_recurring(id_user, cur):
+    """
+    Reglas recurrentes del usuario (ver recurring.py), recalculadas si sus
+    datos cambiaron. Devuelve (reglas, completo). Si se recalcularon quedan
+    sin confirmar: el llamador hace el commit.
+    """
+    version = current_data_version(cur, id_user)
+    return recurring.load(mysql.connection, id_user, version)
+
+@bp.route('/forecast/<int:id_user>', methods=['GET'])
+@require_auth
+def get_forecast(id_user):
+    """
+    Movimientos recurrentes detectados y el flujo esperado de los próximos
+    'days' días (default RECURRING_HORIZON_DAYS). Sin ETag: las reglas se
+    recalculan aparte de data_version (ver RECURRING_REFRESH_SECONDS).
+    """
+    dias = request.args.get('days', recurring.HORIZONTE_DIAS, type=int)
+    if not 1 <= dias <= 366:
+        return jsonify({"error": "days debe estar entre 1 y 366"}), 400
     cur = mysql.connection.cursor()
-    cur.execute("DELETE FROM metas_ahorro WHERE id_meta=%s", (id_meta,))
-    mysql.connection.commit()
-    cur.close()
-    return jsonify({"message": "Meta de ahorro eliminada exitosamente"})
+    try:
+        reglas, completo = load_recurring(id_user, cur)
+        mysql.connection.commit()
+    finally:
+        cur.close()
+    pronostico = recurring.forecast(reglas, dias=dias)
+    return jsonify(dict(
+        pronostico,
+        completo=completo,
+        reglas=[recurring.rule_to_dict(r) for r in reglas],
+    ))
 
 # ===========================
-# METAS DE INVERSIÓN
+# ANOMALÍAS DE GASTO
 # ===========================
-@app.route('/goals/inversion/<int:id_user>', methods=['GET'])
-def get_inversion_goals(id_user):
-    cur = mysql.connection.cursor()
+ANOMALIAS_DIAS_MAX = 365
+
+def anomaly_to_dict(a):
+    """Fila (tipo_anomalia, categoria, semana, id_movimiento, valor, esperado, veces, z) -> JSON."""
+    return {
+        "tipo": a[0],
+        "categoria": a[1],
+        "semana": a[2].strftime('%Y-%m-%d'),
+        "id_movimiento": a[3] or None,
+        "valor": float(a[4]),
+        "esperado": float(a[5]),
+        "veces": a[6],
+        "z": a[7],
+    }
+
+def fetch_anomalies(cur, id_user, dias):
+    """Anomalías de las semanas que tocan los últimos 'dias' días, la más reciente primero."""
+    desde = spending_stats.week_start(datetime.now() - timedelta(days=dias))
     cur.execute(
-        "SELECT id_meta, descripcion, monto_objetivo, monto_actual FROM metas_inversion WHERE user_id=%s",
-        (id_user,)
+        "SELECT tipo_anomalia, categoria, semana, id_movimiento, valor, esperado, veces, z "
+        "FROM anomalias WHERE user_id=%s AND semana >= %s ORDER BY semana DESC, veces DESC",
+        (id_user, desde.strftime('%Y-%m-%d'))
     )
-    metas = cur.fetchall()
-    cur.close()
-    metas_list = [
-        {
-            "id_inversion": m[0],
-            "nombre_meta": m[1],
-            "monto_objetivo": float(m[2]),
-            "monto_actual": float(m[3])
-        } for m in metas
-    ]
-    return jsonify(metas_list)
-
-@app.route('/goals/inversion', methods=['POST'])
-def create_inversion_goal():
-    data = request.get_json()
-    user_id = data.get('id_user')
-    nombre_meta = data.get('nombre_meta')
-    monto_objetivo = data.get('monto_objetivo')
+    return [anomaly_to_dict(a) for a in cur.fetchall()]
 
-    if not all([user_id, nombre_meta, monto_objetivo]):
-        return jsonify({"error": "Faltan datos"}), 400
+def op_list_anomalies(cur, id_user, datos):
+    """
+    Anomalías guardadas al escribir (ver spending_stats.py) y la estadística
+    de cada categoría; no recorre movimientos.
+    """
+    try:
+        dias = int(datos.get('days', 30))
+    except (TypeError, ValueError):
+        raise OperationError("days inválido")
+    if not 1 <= dias <= ANOMALIAS_DIAS_MAX:
+        raise OperationError(f"days debe estar entre 1 y {ANOMALIAS_DIAS_MAX}")
 
-    cur = mysql.connection.cursor()
+    anomalias = fetch_anomalies(cur, id_user, dias)
     cur.execute(
-        "INSERT INTO metas_inversion (user_id, descripcion, monto_objetivo) VALUES (%s, %s, %s)",
-        (user_id, nombre_meta, monto_objetivo)
+        "SELECT categoria, n, media, m2, semanas, media_semanal, m2_semanal "
+        "FROM estadisticas_categoria WHERE user_id=%s AND n > 0 ORDER BY categoria",
+        (id_user,)
     )
-    mysql.connection.commit()
-    cur.close()
-    return jsonify({"message": "Meta de inversión creada exitosamente"}), 201
+    categorias = [{
+        "categoria": c[0],
+        "movimientos": c[1],
+        "promedio": round(c[2], 2),
+        "desviacion": round(spending_stats.std(c[1:4]), 2),
+        "semanas": c[4],
+        "promedio_semanal": round(c[5], 2),
+        "desviacion_semanal": round(spending_stats.std(c[4:7]), 2),
+    } for c in cur.fetchall()]
+    return {"anomalias": anomalias, "categorias": categorias}, 200
 
-@app.route('/goals/inversion/<int:id_meta>', methods=['PUT'])
-def update_inversion_goal(id_meta):
-    data = request.get_json()
-    monto_actual = data.get('monto_actual')
-    monto_objetivo = data.get('monto_objetivo')
+@bp.route('/anomalies/<int:id_user>', methods=['GET'])
+@require_auth
+@conditional_get(por_dia=True)
+def get_anomalies(id_user):
+    return run_read(op_list_anomalies, id_user, request.args.to_dict())
 
-    if monto_actual is None and monto_objetivo is None:
-        return jsonify({"error": "No hay datos para actualizar"}), 400
+# ===========================
+# SINCRONIZACIÓN INCREMENTAL
+# ===========================
+# entidad en sync_eliminados -> llave en la respuesta de /sync
+SYNC_ENTIDADES = {
+    'movimiento': 'movimientos',
+    'meta_ahorro': 'metas_ahorro',
+    'meta_inversion': 'metas_inversion',
+}
 
+@bp.route('/sync/<int:id_user>', methods=['GET'])
+@require_auth
+def sync_changes(id_user):
+    """
+    Cambios desde el watermark 'since' (el "watermark" de la sincronización
+    anterior): movimientos y metas insertados o modificados, más los ids
+    borrados. Sin 'since', o con uno que el servidor no reconoce, devuelve
+    todo con "completo": true y el cliente reemplaza su copia local.
+    """
+    since = request.args.get('since', 0, type=int)
     cur = mysql.connection.cursor()
-    if monto_actual is not None and monto_objetivo is not None:
-        cur.execute(
-            "UPDATE metas_inversion SET monto_actual=%s, monto_objetivo=%s WHERE id_meta=%s",
-            (monto_actual, monto_objetivo, id_meta)
-        )
-    elif monto_actual is not None:
-        cur.execute(
-            "UPDATE metas_inversion SET monto_actual=%s WHERE id_meta=%s",
-            (monto_actual, id_meta)
-        )
-    elif monto_objetivo is not None:
-        cur.execute(
-            "UPDATE metas_inversion SET monto_objetivo=%s WHERE id_meta=%s",
-            (monto_objetivo, id_meta)
-        )
-    mysql.connection.commit()
-    cur.close()
-    return jsonify({"message": "Meta de inversión actualizada exitosamente"})
+    try:
+        # Todas las lecturas ven la misma instantánea: lo que se confirme
+        # después del watermark llega en la siguiente sincronización
+        cur.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+        cur.execute("SELECT data_version FROM users WHERE id_user=%s", (id_user,))
+        fila = cur.fetchone()
+        watermark = fila[0] if fila else 0
+        completo = since <= 0 or since > watermark
+
+        filtro = "" if completo else " AND version > %s"
+        params = (id_user,) if completo else (id_user, since)
+        cur.execute(f"SELECT {MOVIMIENTO_COLUMNAS} FROM movimientos WHERE user_id=%s{filtro}", params)
+        movimientos = [movement_to_dict(m) for m in cur.fetchall()]
+        metas = {}
+        for tipo in ('ahorro', 'inversion'):
+            cur.execute(
+                f"SELECT {META_COLUMNAS} FROM metas_{tipo} WHERE user_id=%s{filtro}",
+                params
+            )
+            metas[tipo] = [goal_to_dict(m, f'id_{tipo}') for m in cur.fetchall()]
+
+        eliminados = {llave: [] for llave in SYNC_ENTIDADES.values()}
+        if not completo:
+            cur.execute(
+                "SELECT entidad, id_entidad FROM sync_eliminados WHERE user_id=%s AND version > %s",
+                (id_user, since)
+            )
+            for entidad, id_entidad in cur.fetchall():
+                eliminados[SYNC_ENTIDADES[entidad]].append(id_entidad)
+        mysql.connection.commit()
+    finally:
+        cur.close()
+
+    return jsonify({
+        "watermark": watermark,
+        "completo": completo,
+        "movimientos": movimientos,
+        "metas_ahorro": metas['ahorro'],
+        "metas_inversion": metas['inversion'],
+        "eliminados": eliminados,
+    })
+
+# ===========================
+# BATCH
+# ===========================
+BATCH_MAX_OPERACIONES = int(os.getenv('BATCH_MAX_OPERACIONES', 50))
+
+# op -> (función, escribe)
+BATCH_OPERACIONES = {
+    'movements.list': (op_list_movements, False),
+    'movements.summary': (op_movements_summary, False),
+    'movements.add': (op_add_movement, True),
+    'movements.update': (op_update_movement, True),
+    'movements.delete': (op_delete_movement, True),
+    'balance': (op_balance, False),
+    'goals.list': (op_list_goals, False),
+    'goals.create': (op_create_goal, True),
+    'goals.update': (op_update_goal, True),
+    'goals.delete': (op_delete_goal, True),
+    'goals.progress': (op_goals_progress, False),
+    'anomalies.list': (op_list_anomalies, False),
+}
 
-@app.route('/goals/inversion/<int:id_meta>', methods=['DELETE'])
-def delete_inversion_goal(id_meta):
+@bp.route('/batch', methods=['POST'])
+@require_auth
+def batch():
+    """
+    Varias operaciones en un solo viaje y sobre una sola conexión del pool:
+
+        {"transaction": true,
+         "operations": [{"op": "goals.list", "tipo": "ahorro"},
+                        {"op": "movements.add", "categoria": "Comida", "monto": 50}]}
+
+    Devuelve {"results": [...]} en el mismo orden, cada uno con "status" y
+    "data" o "error". Con "transaction": true todo va en una transacción: si
+    una operación falla se revierte el lote completo y la respuesta es 409.
+    Sin ella cada escritura se confirma por separado y un error no detiene
+    las demás.
+    """
+    data = request.get_json(silent=True) or {}
+    operaciones = data.get('operations')
+    if not isinstance(operaciones, list) or not operaciones:
+        return jsonify({"error": "Envía una lista en 'operations'"}), 400
+    if len(operaciones) > BATCH_MAX_OPERACIONES:
+        return jsonify({"error": f"Máximo {BATCH_MAX_OPERACIONES} operaciones por lote"}), 400
+    transaccional = bool(data.get('transaction'))
+
+    id_user = g.user['id_user']
+    resultados = []
+    hubo_escritura = False
     cur = mysql.connection.cursor()
-    cur.execute("DELETE FROM metas_inversion WHERE id_meta=%s", (id_meta,))
-    mysql.connection.commit()
-    cur.close()
-    return jsonify({"message": "Meta de inversión eliminada exitosamente"})
+    try:
+        for indice, operacion in enumerate(operaciones):
+            nombre = operacion.get('op') if isinstance(operacion, dict) else None
+            fn, escribe = BATCH_OPERACIONES.get(nombre, (None, False))
+            try:
+                if fn is None:
+                    raise OperationError(f"Operación desconocida: {nombre}")
+                resultado, status = fn(cur, id_user, operacion)
+            except OperationError as e:
+                mysql.connection.rollback()
+                if transaccional:
+                    forget_rolled_back(id_user, hubo_escritura)
+                    return jsonify({"results": rolled_back_results(resultados, indice, e, len(operaciones))}), 409
+                resultados.append({"status": e.status, "error": str(e)})
+                continue
+            if escribe and not transaccional:
+                mysql.connection.commit()
+            hubo_escritura = hubo_escritura or escribe
+            resultados.append({"status": status, "data": resultado})
+        mysql.connection.commit()
+    except Exception:
+        mysql.connection.rollback()
+        forget_rolled_back(id_user, hubo_escritura and transaccional)
+        raise
+    finally:
+        cur.close()
+
+    if hubo_escritura:
+        on_user_data_changed(id_user)
+    return jsonify({"results": resultados})
+
+def forget_rolled_back(id_user, hubo_escritura):
+    """
+    Un lote transaccional que se revierte después de escribir pudo memoizar
+    lecturas (goals.progress) bajo la data_version sin confirmar. Otro worker
+    vuelve a usar esa versión en su siguiente escritura, así que se descartan.
+    """
+    if hubo_escritura:
+        on_user_data_changed(id_user)
+
+def rolled_back_results(resultados, indice, error, total):
+    """Resultados de un lote transaccional que falló en la operación 'indice'."""
+    return (
+        [{"status": 409, "error": f"Revertida: falló la operación {indice}"} for _ in resultados]
+        + [{"status": error.status, "error": str(error)}]
+        + [{"status": 424, "error": "No ejecutada"} for _ in range(total - indice - 1)]
+    )
 
 # ===========================
 # IA - MASCOTA FINNY
 # ===========================
-def get_user_financial_context(id_user, username, cur):
+def fetch_financial_snapshot(id_user, cur):
     """
-    Función auxiliar para recopilar datos clave de MySQL que la IA necesita.
-    Esto minimiza el 'token' de entrada y mantiene la privacidad.
+    Trae en una sola consulta los totales de los últimos 30 días por
+    (tipo, categoría). Los datos del perfil (meta, riesgo) vienen del token
+    de sesión, así que aquí no se lee la tabla users.
     """
-    
-    # 3.1. Obtener la Meta (si la tienes en la tabla 'users' o en otra tabla de metas)
-    # COMENTARIO: Asegúrate de tener campos como 'meta_actual' y 'perfil_riesgo' en tu tabla 'users'
-    # o una tabla separada de 'metas'.
-    cur.execute("SELECT username, meta_actual, perfil_riesgo FROM users WHERE id_user=%s", (id_user,))
-    user_info = cur.fetchone()
-    user_context = {
-        "nombre": username,
-        "meta_actual": user_info[1] if user_info and len(user_info) > 1 else "Ninguna establecida",
-        "perfil_riesgo": user_info[2] if user_info and len(user_info) > 2 else "Moderado"
-    }
+    inicio = datetime.now() - timedelta(days=30)
+    fecha_inicio = inicio.strftime('%Y-%m-%d')
+    # Los meses completos salen de resumen_movimientos; solo el mes parcial
+    # del inicio de la ventana se lee fila por fila de movimientos.
+    corte = rollups.month_cutoff(inicio).strftime('%Y-%m-%d')
 
-    # 3.2. Obtener Resumen de Ingresos y Egresos (últimos 30 días)
-    fecha_inicio = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-    
-    # Balance General (Ingresos vs. Egresos en los últimos 30 días)
-    cur.execute(
-        "SELECT tipo, SUM(monto) FROM movimientos WHERE user_id=%s AND fecha >= %s GROUP BY tipo",
-        (id_user, fecha_inicio)
-    )
-    balance_data = dict(cur.fetchall())
-    ingresos = float(balance_data.get('Ingreso', 0))
-    egresos = float(balance_data.get('Egreso', 0))
-    
-    # Egresos por Categoría (los 3 principales)
+    # Una fila por (tipo, categoría) de la ventana
     cur.execute(
         """
-        SELECT categoria, SUM(monto) as total 
-        FROM movimientos 
-        WHERE user_id=%s AND tipo='Egreso' AND fecha >= %s
-        GROUP BY categoria
-        ORDER BY total DESC 
-        LIMIT 3
+        SELECT tipo, categoria, SUM(total) AS total FROM (
+            SELECT tipo, categoria, SUM(monto) AS total FROM movimientos
+            WHERE user_id=%s AND fecha >= %s AND fecha < %s
+            GROUP BY tipo, categoria
+            UNION ALL
+            SELECT tipo, categoria, SUM(total) AS total FROM resumen_movimientos
+            WHERE user_id=%s AND mes >= %s
+            GROUP BY tipo, categoria
+        ) t
+        GROUP BY tipo, categoria
         """,
-        (id_user, fecha_inicio)
+        (id_user, fecha_inicio, corte, id_user, corte)
     )
-    top_egresos = cur.fetchall()
+    filas = cur.fetchall()
+
+    ingresos = 0.0
+    egresos = 0.0
+    egresos_por_categoria = []
+    for tipo, categoria, total in filas:
+        if tipo == 'Ingreso':
+            ingresos += float(total)
+        elif tipo == 'Egreso':
+            egresos += float(total)
+            egresos_por_categoria.append((categoria, float(total)))
+    egresos_por_categoria.sort(key=lambda c: c[1], reverse=True)
+
+    return {
+        "fecha_inicio": fecha_inicio,
+        "ingresos": ingresos,
+        "egresos": egresos,
+        "top_egresos": egresos_por_categoria[:3],
+    }
+
+def fetch_recurring_outlook(id_user, cur):
+    """Pronóstico compacto de los movimientos recurrentes para el contexto."""
+    reglas, _ = load_recurring(id_user, cur)
+    pronostico = recurring.forecast(reglas)
+    # La siguiente ocurrencia de cada serie, no tres de la misma
+    proximos = {}
+    for e in pronostico["eventos"]:
+        llave = (e["nota"] or e["categoria"], e["tipo"])
+        if llave not in proximos and len(proximos) < 3:
+            proximos[llave] = (*llave, e["monto"], e["fecha"])
+    return {
+        "dias": pronostico["dias"],
+        "ingresos": pronostico["ingresos"],
+        "egresos": pronostico["egresos"],
+        "proximos": list(proximos.values()),
+    }
+
+# Las alertas de gasto de estas semanas van en el contexto de la mascota
+IA_ALERTAS_DIAS = 7
+
+def describe_anomaly(a):
+    if a["tipo"] == spending_stats.ANOMALIA_SEMANA:
+        return f"{a['categoria']}: {a['veces']:.1f} veces su gasto semanal habitual (semana del {a['semana']})"
+    return f"{a['categoria']}: un movimiento de ${a['valor']:,.2f}, lo normal es ${a['esperado']:,.2f}"
+
+def load_financial_context(usuario, cur=None):
+    """
+    Función auxiliar para recopilar datos clave de MySQL que la IA necesita.
+    Esto minimiza el 'token' de entrada y mantiene la privacidad.
+    'usuario' es el de la sesión (g.user): nombre, meta y perfil ya vienen ahí.
+    Devuelve (data_version, contexto); la versión va en la llave de ia_cache.
+    Si se pasa 'cur', el llamador confirma lo que se haya recalculado (reglas
+    recurrentes); si no, se confirma aquí.
+
+    El resultado de MySQL se memoiza por (data_version, día) durante
+    IA_CONTEXT_TTL segundos: una conversación seguida solo lee la versión
+    (llave primaria) y ningún worker reutiliza datos de antes de una escritura.
+    """
+    id_user = usuario['id_user']
+    propio = cur is None
+    if propio:
+        cur = mysql.connection.cursor()
+    try:
+        version = current_data_version(cur, id_user)
+        # Las ventanas (30 días, pronóstico, alertas) son relativas a hoy
+        llave = (version, datetime.now().date())
+        datos = context_memo.get(int(id_user), llave)
+        if datos is None:
+            datos = fetch_financial_snapshot(id_user, cur)
+            datos["recurrentes"] = fetch_recurring_outlook(id_user, cur)
+            datos["alertas"] = fetch_anomalies(cur, id_user, IA_ALERTAS_DIAS)[:3]
+            if propio:
+                mysql.connection.commit()
+            context_memo.set(int(id_user), datos, llave)
+    finally:
+        if propio:
+            cur.close()
+
+    ingresos = datos["ingresos"]
+    egresos = datos["egresos"]
+    top_egresos = datos["top_egresos"]
+    recurrentes = datos["recurrentes"]
+    if recurrentes["proximos"]:
+        proximos = ', '.join(
+            f"{nombre} ({tipo}) ${monto:,.2f} el {fecha}" for nombre, tipo, monto, fecha in recurrentes["proximos"]
+        )
+        flujo_recurrente = (
+            f"ingresos ${recurrentes['ingresos']:,.2f}, egresos ${recurrentes['egresos']:,.2f}. "
+            f"Próximos: {proximos}"
+        )
+    else:
+        flujo_recurrente = "No se detectaron movimientos recurrentes."
+    alertas = '; '.join(describe_anomaly(a) for a in datos["alertas"]) or "Ninguna."
 
     financial_summary = f"""
     - Período de análisis: Últimos 30 días.
@@ -390,77 +1663,195 @@ def get_user_financial_context(id_user, username, cur):
     - Egresos totales: ${egresos:,.2f}
     - Balance (Ingresos - Egresos): ${ingresos - egresos:,.2f}
     - 3 Categorías de Mayor Gasto: {', '.join([f'{cat}: ${monto:,.2f}' for cat, monto in top_egresos]) if top_egresos else 'No hay egresos recientes.'}
+    - Movimientos recurrentes esperados en los próximos {recurrentes['dias']} días: {flujo_recurrente}
+    - Alertas de gasto inusual recientes: {alertas}
     """
     
     # Combinar todo en un contexto para la IA
     full_context = f"""
     Contexto del Usuario:
-    Nombre: {user_context['nombre']}
-    Meta Actual: {user_context['meta_actual']}
-    Perfil de Riesgo (para consejos de inversión): {user_context['perfil_riesgo']}
+    Nombre: {usuario['username']}
+    Meta Actual: {usuario.get('meta_actual') or "Ninguna establecida"}
+    Perfil de Riesgo (para consejos de inversión): {usuario.get('perfil_riesgo') or "Moderado"}
     
-    Resumen Financiero ({fecha_inicio} a hoy):
+    Resumen Financiero ({datos['fecha_inicio']} a hoy):
     {financial_summary}
     """
-    return full_context
+    return version, full_context
+
+def get_user_financial_context(usuario, cur=None):
+    """Solo el texto del contexto (lo usa insights.py)."""
+    return load_financial_context(usuario, cur)[1]
+
+# COMENTARIO: Aquí define el rol, tono y estilo de la mascota.
+MASCOTA_NOMBRE = "Finny, la ardilla"
+
+# Personalidad y reglas: texto fijo que va como system_instruction, igual
+# para todos los usuarios (Gemini reutiliza el prefijo entre llamadas)
+PERSONA_MASCOTA = f"""
+Eres {MASCOTA_NOMBRE}, el asesor financiero personal y la mascota de la app.
+Tu personalidad es: optimista, enérgica, un poco juguetona, y muy experta en finanzas.
+Tu tono es informal y motivador. **Usa emojis (💰, 📈, ✨) en tus respuestas para hacerlo más divertido.**
+Dirígete siempre al usuario por el nombre que aparece en su contexto.
+
+Tu consejo debe basarse **estrictamente** en el contexto financiero proporcionado
+y en lo que ya se habló en la conversación.
+NO compartas datos sensibles como montos exactos, solo usa el resumen para el consejo.
+"""
+
+def build_mascot_prompt(username, financial_context, user_prompt):
+    """Contexto y pregunta en un solo contenido (sin historial); la personalidad va aparte."""
+    return f"""
+        Contexto Financiero para el análisis:
+        {financial_context}
+        
+        Pregunta de {username}: {user_prompt}
+        """
+
+def build_mascot_contents(username, financial_context, turnos, user_prompt):
+    """
+    Contenidos multi-turno (rol, texto): el contexto financiero (con el
+    resumen de lo hablado antes, si lo hay), los turnos guardados y la
+    pregunta nueva.
+    """
+    contexto = f"Contexto Financiero para el análisis:\n{financial_context}"
+    for turno in turnos:
+        if turno["rol"] == conversations.ROL_RESUMEN:
+            contexto += f"\nResumen de la conversación anterior:\n{turno['texto']}"
+    contents = [('user', contexto)]
+    contents += [(t["rol"], t["texto"]) for t in turnos if t["rol"] != conversations.ROL_RESUMEN]
+    contents.append(('user', f"Pregunta de {username}: {user_prompt}"))
+    return contents
+
+def generate_text(prompt, persona=True):
+    """
+    Una llamada a la IA por la puerta de enlace; devuelve el texto (lo usa
+    también insights.py). persona=False para tareas internas como resumir.
+    """
+    return llm.generate(PERSONA_MASCOTA if persona else None, [('user', prompt)]).text
+
+def load_conversation(data, usuario):
+    """
+    Carga (y compacta si pasa del presupuesto) la conversación indicada en
+    'conversation_id', o empieza una nueva. Devuelve (conversacion, turnos).
+    La conexión vuelve al pool antes de llamar a la IA, también para resumir.
+    """
+    id_user = usuario['id_user']
+    conversacion = data.get('conversation_id')
+    if conversacion is not None and not conversations.valid_conversation_id(conversacion):
+        raise OperationError("conversation_id inválido")
+    cur = mysql.connection.cursor()
+    try:
+        if conversacion is None:
+            conversacion = conversations.new_conversation_id()
+            conversations.purge_old(cur, id_user)
+            mysql.connection.commit()
+            turnos = []
+        else:
+            turnos = conversations.load_turns(cur, id_user, conversacion)
+    finally:
+        cur.close()
+    mysql.release_current()
+
+    # Resumir usa la IA pero es raro: una vez cada varios turnos
+    viejos, turnos, resumen = conversations.summarize_old(
+        turnos, usuario['username'], lambda prompt: generate_text(prompt, persona=False)
+    )
+    if viejos:
+        cur = mysql.connection.cursor()
+        try:
+            turnos = conversations.replace_old(cur, id_user, conversacion, viejos, turnos, resumen)
+            mysql.connection.commit()
+        finally:
+            cur.close()
+        mysql.release_current()
+    return conversacion, turnos
+
+def save_conversation(id_user, conversacion, pregunta, respuesta, usage):
+    cur = mysql.connection.cursor()
+    try:
+        conversations.save_turns(
+            cur, id_user, conversacion, pregunta, respuesta,
+            getattr(usage, 'candidates_token_count', None)
+        )
+        mysql.connection.commit()
+    finally:
+        cur.close()
+
+def usage_to_dict(usage, turnos):
+    """Tokens de la llamada (0 si la respuesta salió del caché) y del historial enviado."""
+    return {
+        "input_tokens": getattr(usage, 'prompt_token_count', None) or 0,
+        "output_tokens": getattr(usage, 'candidates_token_count', None) or 0,
+        "cached_tokens": getattr(usage, 'cached_content_token_count', None) or 0,
+        "history_tokens": conversations.history_tokens(turnos),
+    }
 
 # 4. ENDPOINT PARA CHAT CON LA MASCOTA
-@app.route('/ia/ask_mascot', methods=['POST'])
+@bp.route('/ia/ask_mascot', methods=['POST'])
+@require_auth
 def ask_mascot_advisor():
     """
     Endpoint que recibe la pregunta del usuario, construye el prompt y llama a la IA.
+
+    Body: {"prompt": "...", "conversation_id": "..."}; sin conversation_id
+    empieza una conversación nueva. La respuesta incluye el conversation_id
+    para la siguiente pregunta y los tokens usados.
     """
     data = request.get_json()
-    id_user = data.get('id_user')
-    username = data.get('username') # Debería venir del login
+    # Usuario y nombre salen del token de sesión, no del body
+    id_user = session_user_id(data.get('id_user'))
+    username = g.user['username']
     user_prompt = data.get('prompt')
     
-    if not all([id_user, username, user_prompt]):
-        return jsonify({"error": "Faltan id_user, username o prompt"}), 400
+    if not user_prompt:
+        return jsonify({"error": "Falta prompt"}), 400
 
     try:
-        cur = mysql.connection.cursor()
-        
-        # 4.1. Recopilar datos financieros
-        financial_context = get_user_financial_context(id_user, username, cur)
-        cur.close()
+        # 4.1. Recopilar datos financieros e historial de la conversación
+        version, financial_context = load_financial_context(g.user)
+        conversacion, turnos = load_conversation(data, g.user)
 
-        # 4.2. Crear el Prompt Maestro con la Personalidad de la Mascota
-        # COMENTARIO: Aquí define el rol, tono y estilo de la mascota.
-        MASCOTA_NOMBRE = "Finny, la ardilla" 
-        
-        system_instruction = f"""
-        Eres {MASCOTA_NOMBRE}, el asesor financiero personal y la mascota de la app.
-        Tu personalidad es: optimista, enérgica, un poco juguetona, y muy experta en finanzas.
-        Tu tono es informal y motivador. **Usa emojis (💰, 📈, ✨) en tus respuestas para hacerlo más divertido.**
-        Dirígete siempre al usuario por su nombre, {username}.
-        
-        Tu consejo debe basarse **estrictamente** en el contexto financiero proporcionado.
-        NO compartas datos sensibles como montos exactos, solo usa el resumen para el consejo.
-        
-        Contexto Financiero para el análisis:
-        {financial_context}
-        
-        Pregunta de {username}: {user_prompt}
-        """
+        # 4.2. Respuesta en caché si el contexto y la pregunta (normalizada) no
+        # cambiaron; solo en la primera pregunta, después depende del historial
+        cache_key = ia_cache.key(id_user, version, financial_context, user_prompt) if not turnos else None
+        ia_advice = ia_cache.get(cache_key) if cache_key else None
+        usage = None
+        if ia_advice is None:
+            # 4.3. Llamada a la IA (en el pool de IA para no acaparar los hilos de Flask)
+            response = llm.generate(
+                PERSONA_MASCOTA, build_mascot_contents(username, financial_context, turnos, user_prompt)
+            )
+            ia_advice = response.text
+            usage = response.usage_metadata
+            if ia_advice and cache_key:
+                ia_cache.set(cache_key, ia_advice)
 
-        # 4.3. Llamada a la API de Gemini
-        # COMENTARIO: Asegúrate que el cliente y el modelo estén bien definidos
-        
-        response = client.models.generate_content(
-            model=MODEL,
-            contents=[system_instruction]
-        )
-        
-        ia_advice = response.text
+        if ia_advice:
+            save_conversation(id_user, conversacion, user_prompt, ia_advice, usage)
 
         # 4.4. Devolver la respuesta a Flutter
         return jsonify({
             "status": "success",
             "mascot_name": MASCOTA_NOMBRE,
-            "advice": ia_advice
+            "advice": ia_advice,
+            "conversation_id": conversacion,
+            "usage": usage_to_dict(usage, turnos),
         })
 
+    except OperationError as e:
+        return jsonify({"error": str(e)}), e.status
+    except IAQueueFull as e:
+        return jsonify({"error": "Finny está atendiendo muchas preguntas, intenta en un momento"}), 429, {
+            "Retry-After": str(e.retry_after)
+        }
+    except LLMUnavailable as e:
+        return jsonify({"error": "Finny no está disponible por ahora, intenta más tarde"}), 503, {
+            "Retry-After": str(e.retry_after)
+        }
+    except IATimeout as e:
+        print(f"Timeout de IA: {e}")
+        return jsonify({"error": "La IA tardó demasiado en responder"}), 504
     except APIError as e:
         # Esto captura errores si la clave API es incorrecta, hay límites excedidos, etc.
         print(f"Error de API de Gemini: {e}")
@@ -471,8 +1862,226 @@ def ask_mascot_advisor():
         return jsonify({"error": f"Error interno del servidor: {e}"}), 500
 
 
+def sse_event(data, event=None):
+    """Formatea un evento Server-Sent Events con datos JSON."""
+    prefijo = f"event: {event}\n" if event else ""
+    return f"{prefijo}data: {current_app.json.dumps(data)}\n\n"
+
+# 5. VARIANTE EN STREAMING (SSE)
+@bp.route('/ia/ask_mascot/stream', methods=['POST'])
+@require_auth
+def ask_mascot_advisor_stream():
+    """
+    Igual que /ia/ask_mascot pero responde con text/event-stream: un evento
+    'data: {"text": ...}' por cada fragmento que genera Gemini y un evento
+    final 'done' con conversation_id y tokens (o 'error'). /ia/ask_mascot
+    sigue devolviendo el JSON completo.
+    """
+    data = request.get_json()
+    id_user = session_user_id(data.get('id_user'))
+    username = g.user['username']
+    user_prompt = data.get('prompt')
+
+    if not user_prompt:
+        return jsonify({"error": "Falta prompt"}), 400
+
+    try:
+        version, financial_context = load_financial_context(g.user)
+        conversacion, turnos = load_conversation(data, g.user)
+
+        cache_key = ia_cache.key(id_user, version, financial_context, user_prompt) if not turnos else None
+        en_cache = ia_cache.get(cache_key) if cache_key else None
+        if en_cache is not None:
+            fragmentos = None
+        else:
+            # La admisión (429) se decide aquí, antes de empezar el stream
+            fragmentos = llm.stream(
+                PERSONA_MASCOTA, build_mascot_contents(username, financial_context, turnos, user_prompt)
+            )
+    except OperationError as e:
+        return jsonify({"error": str(e)}), e.status
+    except IAQueueFull as e:
+        return jsonify({"error": "Finny está atendiendo muchas preguntas, intenta en un momento"}), 429, {
+            "Retry-After": str(e.retry_after)
+        }
+    except LLMUnavailable as e:
+        return jsonify({"error": "Finny no está disponible por ahora, intenta más tarde"}), 503, {
+            "Retry-After": str(e.retry_after)
+        }
+    except Exception as e:
+        print(f"Error interno: {e}")
+        return jsonify({"error": f"Error interno del servidor: {e}"}), 500
+
+    def generate():
+        yield sse_event({"mascot_name": MASCOTA_NOMBRE, "conversation_id": conversacion}, event="start")
+        if en_cache is not None:
+            yield sse_event({"text": en_cache})
+            save_conversation(id_user, conversacion, user_prompt, en_cache, None)
+            yield sse_event({"status": "success", "conversation_id": conversacion,
+                             "usage": usage_to_dict(None, turnos)}, event="done")
+            return
+        try:
+            partes = []
+            usage = None
+            for fragmento in fragmentos:
+                usage = getattr(fragmento, 'usage_metadata', None) or usage
+                if fragmento.text:
+                    partes.append(fragmento.text)
+                    yield sse_event({"text": fragmento.text})
+            if partes:
+                respuesta = ''.join(partes)
+                if cache_key:
+                    ia_cache.set(cache_key, respuesta)
+                save_conversation(id_user, conversacion, user_prompt, respuesta, usage)
+            yield sse_event({"status": "success", "conversation_id": conversacion,
+                             "usage": usage_to_dict(usage, turnos)}, event="done")
+        except IATimeout as e:
+            print(f"Timeout de IA: {e}")
+            yield sse_event({"error": "La IA tardó demasiado en responder"}, event="error")
+        except APIError as e:
+            print(f"Error de API de Gemini: {e}")
+            yield sse_event({"error": f"Error del servicio de IA: {e}"}, event="error")
+        except Exception as e:
+            print(f"Error interno: {e}")
+            yield sse_event({"error": f"Error interno del servidor: {e}"}, event="error")
+
+    # stream_with_context: los turnos se guardan al terminar, con la conexión de la petición
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # que nginx no acumule el stream
+    })
+
+
+# 6. INSIGHTS PRECALCULADOS (digest semanal y alertas, ver insights.py)
+INSIGHTS_LIMITE_MAX = 50
+
+def op_list_insights(cur, id_user, datos):
+    """Los insights más recientes que dejó el worker; no llama a la IA."""
+    try:
+        limit = int(datos.get('limit') or 10)
+    except (TypeError, ValueError):
+        raise OperationError("limit inválido")
+    if limit <= 0:
+        raise OperationError("limit debe ser mayor a 0")
+    condiciones = ["user_id=%s"]
+    params = [id_user]
+    if datos.get('tipo'):
+        condiciones.append("tipo=%s")
+        params.append(datos['tipo'])
+    params.append(min(limit, INSIGHTS_LIMITE_MAX))
+    cur.execute(
+        "SELECT id_insight, tipo, titulo, contenido, datos, creado FROM ia_insights "
+        f"WHERE {' AND '.join(condiciones)} ORDER BY creado DESC, id_insight DESC LIMIT %s",
+        params
+    )
+    return {"insights": [{
+        "id_insight": r[0],
+        "tipo": r[1],
+        "titulo": r[2],
+        "contenido": r[3],
+        "datos": current_app.json.loads(r[4]) if r[4] else None,
+        "creado": str(r[5]),
+    } for r in cur.fetchall()]}, 200
+
+@bp.route('/ia/insights/<int:id_user>', methods=['GET'])
+@require_auth
+def get_insights(id_user):
+    """
+    Parámetros opcionales: tipo (digest o alerta) y limit (default 10, máximo 50).
+    Los genera el worker de insights.py; aquí solo se leen.
+    """
+    return run_read(op_list_insights, id_user, request.args)
+
+
+# ===========================
+# ARRANQUE Y SALUD
+# ===========================
+# /readyz da por buena la base si alguna petición la usó hace menos de esto
+READYZ_DB_MAX_AGE = float(os.getenv('READYZ_DB_MAX_AGE', 10))
+# '1' para sacar al worker del balanceador si ningún proveedor de IA responde
+READYZ_REQUIRE_LLM = os.getenv('READYZ_REQUIRE_LLM', '0') == '1'
+# '0' para no consultar al proveedor de IA al arrancar cada worker
+LLM_WARM = os.getenv('LLM_WARM', '1') == '1'
+
+def warm_worker():
+    """
+    Deja listo el proceso antes de la primera petición: DB_POOL_MIN
+    conexiones abiertas y el cliente de la IA conectado (el pool de bcrypt
+    ya arranca en hasher_from_env). Un error se reporta y no detiene el
+    arranque: /readyz responde 503 hasta que la base esté disponible.
+    """
+    try:
+        mysql.warm()
+    except MySQLdb.Error as e:
+        print(f"ADVERTENCIA: no se pudo abrir el pool de MySQL al arrancar: {e}")
+    if LLM_WARM:
+        llm.warm()
+
+@bp.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: el proceso atiende peticiones. No toca la base ni la IA."""
+    return jsonify({"status": "ok", "pid": os.getpid()})
+
+@bp.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness: la base respondió hace poco (ver MySQLPool.check, sin
+    consultas mientras haya tráfico) y, si READYZ_REQUIRE_LLM, algún
+    proveedor de IA tiene el circuito cerrado. Con la IA caída el resto de la
+    app sigue funcionando, por eso por defecto solo se reporta.
+    """
+    db = mysql.check(READYZ_DB_MAX_AGE)
+    ia = 'ok' if llm.ready() else 'degradado'
+    listo = db == 'ok' and (ia == 'ok' or not READYZ_REQUIRE_LLM)
+    return jsonify({
+        "status": "ok" if listo else "no_disponible",
+        "db": db,
+        "llm": ia,
+        "pid": os.getpid(),
+    }), 200 if listo else 503
+
+def create_app(config=None, precalentar=False):
+    """
+    Arma la app: configuración (MYSQL_* desde DB_*, más config si se pasa),
+    JSON, el estado del proceso (create_services), instrumentación,
+    compresión y los endpoints de bp. gunicorn no usa preload, así que cada
+    worker llama a create_app() una vez (wsgi.py) y nada abierto se comparte
+    a través del fork. Con precalentar además deja listos el pool y la IA
+    antes de aceptar tráfico.
+    """
+    app = Flask(__name__)
+
+    # jsonify con orjson cuando está instalado (ver json_provider.py)
+    json_provider.init_app(app)
+
+    app.config['MYSQL_HOST'] = os.getenv('DB_HOST')
+    app.config['MYSQL_USER'] = os.getenv('DB_USER')
+    app.config['MYSQL_PASSWORD'] = os.getenv('DB_PASSWORD')
+    app.config['MYSQL_DB'] = os.getenv('DB_NAME')
+    app.config['MYSQL_PORT'] = os.getenv('DB_PORT', 3306)
+    app.config.update(config or {})
+
+    servicios = create_services()
+    servicios["mysql"].init_app(app)
+    app.extensions['finanzas'] = servicios
+
+    # SQL y Gemini medidos por petición: Server-Timing + /metrics (ver instrumentation.py)
+    instrumentation.init_app(app, servicios["mysql"])
+
+    # gzip/brotli negociado para respuestas grandes (ver compression.py)
+    compression.init_app(app)
+
+    app.register_blueprint(bp)
+
+    if precalentar:
+        with app.app_context():
+            warm_worker()
+    return app
+
 # ===========================
 # RUN
 # ===========================
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Servidor de desarrollo (FLASK_DEBUG=1 para el reloader y el depurador).
+    # En producción: gunicorn -c gunicorn.conf.py wsgi:app
+    create_app().run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)), debug=os.getenv('FLASK_DEBUG') == '1')
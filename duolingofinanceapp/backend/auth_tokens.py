@@ -0,0 +1,85 @@
+"""
+Tokens de sesión.
+
+El access token es un payload firmado con HMAC (itsdangerous) que lleva el
+id, el nombre y el perfil del usuario: verificarlo no toca la base y la
+comparación de la firma es en tiempo constante. El refresh token es un valor
+aleatorio opaco; en la base (tabla refresh_tokens) solo se guarda su
+SHA-256 y se rota en cada uso.
+
+    AUTH_SECRET_KEY      llave de firma (obligatoria en producción)
+    ACCESS_TOKEN_TTL     segundos de vida del access token (default 900)
+    REFRESH_TOKEN_TTL    segundos de vida del refresh token (default 30 días)
+
+Los datos del perfil viajan en el token, así que un cambio en la tabla
+users se refleja al siguiente refresh (a lo más ACCESS_TOKEN_TTL después).
+"""
+from datetime import datetime, timedelta
+import hashlib
+import os
+import secrets
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+
+class AuthError(Exception):
+    def __init__(self, mensaje, status=401):
+        super().__init__(mensaje)
+        self.status = status
+
+
+def hash_refresh(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+class TokenIssuer:
+    def __init__(self, secret, access_ttl, refresh_ttl):
+        self.access_ttl = access_ttl
+        self.refresh_ttl = refresh_ttl
+        self._serializer = URLSafeTimedSerializer(secret, salt='access')
+
+    def issue_access(self, usuario):
+        """usuario: dict con id_user, username, perfil_riesgo y meta_actual."""
+        return self._serializer.dumps({
+            "uid": usuario["id_user"],
+            "usr": usuario["username"],
+            "rsk": usuario.get("perfil_riesgo"),
+            "meta": usuario.get("meta_actual"),
+        })
+
+    def verify_access(self, token):
+        """Devuelve el dict del usuario o lanza AuthError."""
+        try:
+            datos = self._serializer.loads(token, max_age=self.access_ttl)
+        except SignatureExpired:
+            raise AuthError("Token expirado")
+        except BadSignature:
+            raise AuthError("Token inválido")
+        return {
+            "id_user": datos["uid"],
+            "username": datos["usr"],
+            "perfil_riesgo": datos.get("rsk"),
+            "meta_actual": datos.get("meta"),
+        }
+
+    def new_refresh(self):
+        """Devuelve (token, hash, expira) de un refresh token nuevo."""
+        token = secrets.token_urlsafe(32)
+        return token, hash_refresh(token), datetime.now() + timedelta(seconds=self.refresh_ttl)
+
+    @staticmethod
+    def new_family():
+        return secrets.token_hex(16)
+
+
+def issuer_from_env():
+    secret = os.getenv('AUTH_SECRET_KEY')
+    if not secret:
+        print("ADVERTENCIA: AUTH_SECRET_KEY no está configurada; "
+              "los tokens no sobreviven reinicios ni se comparten entre workers.")
+        secret = secrets.token_hex(32)
+    return TokenIssuer(
+        secret,
+        access_ttl=int(os.getenv('ACCESS_TOKEN_TTL', 900)),
+        refresh_ttl=int(os.getenv('REFRESH_TOKEN_TTL', 30 * 24 * 3600)),
+    )
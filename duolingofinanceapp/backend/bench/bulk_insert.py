@@ -0,0 +1,109 @@
+"""
+Benchmark de importación: un INSERT + commit por fila (como POST /movements)
+contra executemany por lotes en una sola transacción (como POST /movements/bulk).
+
+Usa las variables DB_* del .env y un usuario existente. Las filas de prueba
+se marcan con la nota 'bench-bulk' y se borran al terminar.
+
+    python bench/bulk_insert.py --user 1 --rows 20000 --chunk-size 1000
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+import argparse
+import json
+import os
+import random
+import time
+
+import MySQLdb
+from dotenv import load_dotenv
+
+NOTA = 'bench-bulk'
+CATEGORIAS = ['Comida', 'Transporte', 'Renta', 'Ocio', 'Salud', 'Servicios']
+
+
+def synthetic_rows(user_id, n, seed=42):
+    rnd = random.Random(seed)
+    inicio = datetime.now() - timedelta(days=365)
+    for _ in range(n):
+        yield (
+            user_id,
+            inicio + timedelta(minutes=rnd.randrange(365 * 24 * 60)),
+            Decimal(rnd.randrange(100, 500000)) / 100,
+            rnd.choice(['Ingreso', 'Egreso', 'Egreso']),
+            rnd.choice(CATEGORIAS),
+            NOTA,
+        )
+
+
+INSERT_SQL = (
+    "INSERT INTO movimientos (user_id, fecha, monto, tipo, categoria, nota) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+
+
+def run_row_by_row(conn, filas):
+    cur = conn.cursor()
+    for fila in filas:
+        cur.execute(INSERT_SQL, fila)
+        conn.commit()
+    cur.close()
+
+
+def run_bulk(conn, filas, chunk_size):
+    cur = conn.cursor()
+    for i in range(0, len(filas), chunk_size):
+        cur.executemany(INSERT_SQL, filas[i:i + chunk_size])
+    conn.commit()
+    cur.close()
+
+
+def cleanup(conn, user_id):
+    cur = conn.cursor()
+    cur.execute("DELETE FROM movimientos WHERE user_id=%s AND nota=%s", (user_id, NOTA))
+    conn.commit()
+    cur.close()
+
+
+def timed(fn, *args):
+    inicio = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - inicio
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--user', type=int, required=True)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--row-by-row-rows', type=int, default=2000,
+                        help="filas para el modo fila por fila (es mucho más lento)")
+    parser.add_argument('--chunk-size', type=int, nargs='+', default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = MySQLdb.connect(
+        host=os.getenv('DB_HOST'),
+        user=os.getenv('DB_USER'),
+        passwd=os.getenv('DB_PASSWORD'),
+        db=os.getenv('DB_NAME'),
+    )
+
+    resultados = []
+    try:
+        filas = list(synthetic_rows(args.user, args.row_by_row_rows))
+        segundos = timed(run_row_by_row, conn, filas)
+        resultados.append({"modo": "fila_por_fila", "filas": len(filas),
+                           "segundos": segundos, "filas_por_segundo": len(filas) / segundos})
+        cleanup(conn, args.user)
+
+        filas = list(synthetic_rows(args.user, args.rows))
+        for chunk_size in args.chunk_size:
+            segundos = timed(run_bulk, conn, filas, chunk_size)
+            resultados.append({"modo": "executemany", "chunk_size": chunk_size, "filas": len(filas),
+                               "segundos": segundos, "filas_por_segundo": len(filas) / segundos})
+            cleanup(conn, args.user)
+    finally:
+        cleanup(conn, args.user)
+        conn.close()
+
+    print(json.dumps(resultados, indent=2))
@@ -0,0 +1,379 @@
+"""
+Prueba de carga reproducible de todas las rutas de app.py.
+
+Siembra (o reutiliza) usuarios sintéticos, ejecuta una mezcla fija de
+escenarios a concurrencia fija y escribe un JSON con latencias p50/p95/p99
+por ruta, throughput y memoria (RSS) para comparar entre commits.
+
+Modo en proceso (por defecto): usa app.test_client() con el proveedor stub
+de llm_gateway.py (latencia fija, sin red); mide el RSS del propio proceso.
+Modo HTTP (--url): golpea un servidor ya levantado; con --server-pid se
+mide el RSS del proceso maestro y de cada worker hijo. Levanta ese
+servidor con AUTH_RATE_LIMIT=0 o el escenario auth terminará en 429.
+
+    python bench/loadtest.py --movements 100000 --users 50 --concurrency 8 --iterations 2000 \\
+        --output resultados.json
+    python bench/loadtest.py --skip-seed --compare resultados.json
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from db_pool import connect_from_env
+import seed as seeding
+
+
+# ---------------------------
+# Clientes
+# ---------------------------
+class InProcessClient:
+    def __init__(self, app):
+        self._local = threading.local()
+        self._app = app
+
+    def request(self, method, path, body=None, headers=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        respuesta = client.open(path, method=method, json=body, headers=headers)
+        datos = respuesta.get_data()
+        return respuesta.status_code, datos
+
+
+class HTTPClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, body=None, headers=None):
+        datos = json.dumps(body).encode('utf-8') if body is not None else None
+        encabezados = dict(headers or {})
+        if datos:
+            encabezados['Content-Type'] = 'application/json'
+        peticion = urllib.request.Request(
+            self.base_url + path, data=datos, method=method, headers=encabezados
+        )
+        try:
+            with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+                return respuesta.status, respuesta.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+class SessionClient:
+    """Agrega el access token del usuario a cada petición."""
+
+    def __init__(self, client, token):
+        self._client = client
+        self._headers = {'Authorization': f'Bearer {token}'}
+
+    def request(self, method, path, body=None):
+        return self._client.request(method, path, body, self._headers)
+
+
+def login(client, usuario):
+    status, datos = client.request('POST', '/login', {
+        'email': usuario['email'], 'password': seeding.BENCH_PASSWORD
+    })
+    if status != 200:
+        sys.exit(f"No se pudo iniciar sesión con {usuario['email']}: {status}")
+    return json.loads(datos)
+
+
+# ---------------------------
+# Escenarios
+# ---------------------------
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.errores = {}
+
+    def call(self, client, ruta, method, path, body=None):
+        inicio = time.perf_counter()
+        status, datos = client.request(method, path, body)
+        duracion = time.perf_counter() - inicio
+        with self._lock:
+            self.latencias.setdefault(ruta, []).append(duracion)
+            if status >= 400:
+                self.errores[ruta] = self.errores.get(ruta, 0) + 1
+        return status, datos
+
+
+def escenario_auth(rec, client, usuario):
+    rec.call(client, 'POST /register', 'POST', '/register', {
+        'username': 'loadtest', 'email': f'loadtest-{uuid.uuid4().hex}@local.test', 'password': 'x' * 12
+    })
+    status, datos = rec.call(client, 'POST /login', 'POST', '/login', {
+        'email': usuario['email'], 'password': seeding.BENCH_PASSWORD
+    })
+    if status == 200:
+        rec.call(client, 'POST /auth/refresh', 'POST', '/auth/refresh', {
+            'refresh_token': json.loads(datos)['refresh_token']
+        })
+
+
+def escenario_lecturas(rec, client, usuario):
+    id_user = usuario['id']
+    rec.call(client, 'GET /movements (página)', 'GET', f'/movements/{id_user}?limit=50')
+    rec.call(client, 'GET /movements/summary', 'GET', f'/movements/summary/{id_user}')
+    rec.call(client, 'GET /balance', 'GET', f'/balance/{id_user}')
+    rec.call(client, 'GET /movements/stats', 'GET', f'/movements/stats/{id_user}')
+
+
+def escenario_historial_completo(rec, client, usuario):
+    rec.call(client, 'GET /movements (completo)', 'GET', f"/movements/{usuario['id']}")
+
+
+def escenario_crud_movimiento(rec, client, usuario):
+    id_user = usuario['id']
+    rec.call(client, 'POST /movements', 'POST', '/movements', {
+        'id_user': id_user, 'categoria': 'Comida', 'monto': 123.45, 'tipo': 'Egreso', 'nota': 'loadtest'
+    })
+    status, datos = client.request('GET', f'/movements/{id_user}?limit=1&categoria=Comida')
+    if status != 200:
+        return
+    items = json.loads(datos)['items']
+    if not items or items[0]['nota'] != 'loadtest':
+        return
+    id_mov = items[0]['id_movimiento']
+    rec.call(client, 'PUT /movements', 'PUT', f'/movements/{id_mov}', {
+        'categoria': 'Comida', 'monto': 99.5, 'tipo': 'Egreso', 'nota': 'loadtest'
+    })
+    rec.call(client, 'DELETE /movements', 'DELETE', f'/movements/{id_mov}')
+
+
+def escenario_metas(rec, client, usuario):
+    id_user = usuario['id']
+    for tipo in ('ahorro', 'inversion'):
+        rec.call(client, f'POST /goals/{tipo}', 'POST', f'/goals/{tipo}', {
+            'id_user': id_user, 'nombre_meta': 'loadtest', 'monto_objetivo': 1000
+        })
+        status, datos = rec.call(client, f'GET /goals/{tipo}', 'GET', f'/goals/{tipo}/{id_user}')
+        if status != 200:
+            continue
+        metas = [m for m in json.loads(datos) if m['nombre_meta'] == 'loadtest']
+        if not metas:
+            continue
+        id_meta = metas[-1][f'id_{tipo}']
+        rec.call(client, f'PUT /goals/{tipo}', 'PUT', f'/goals/{tipo}/{id_meta}', {'monto_actual': 10})
+        rec.call(client, f'DELETE /goals/{tipo}', 'DELETE', f'/goals/{tipo}/{id_meta}')
+
+
+def escenario_mascota(rec, client, usuario):
+    rec.call(client, 'POST /ia/ask_mascot', 'POST', '/ia/ask_mascot', {
+        'prompt': f'¿Cómo ahorro más? {random.random()}'
+    })
+
+
+ESCENARIOS = {
+    'auth': escenario_auth,
+    'lecturas': escenario_lecturas,
+    'historial_completo': escenario_historial_completo,
+    'crud_movimiento': escenario_crud_movimiento,
+    'metas': escenario_metas,
+    'mascota': escenario_mascota,
+}
+
+
+# ---------------------------
+# Métricas
+# ---------------------------
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[max(math.ceil(p * len(ordenados)) - 1, 0)]
+
+
+def rss_kb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for linea in f:
+                if linea.startswith('VmRSS:'):
+                    return int(linea.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def process_tree(pid):
+    pids = [pid]
+    try:
+        for tarea in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{tarea}/children') as f:
+                pids.extend(int(h) for h in f.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+class RSSSampler(threading.Thread):
+    def __init__(self, pid, intervalo=0.5):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.intervalo = intervalo
+        self.pico = {}
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.is_set():
+            for pid in process_tree(self.pid):
+                valor = rss_kb(pid)
+                if valor is not None:
+                    self.pico[pid] = max(self.pico.get(pid, 0), valor)
+            self._parar.wait(self.intervalo)
+
+    def stop(self):
+        self._parar.set()
+        self.join()
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       cwd=Path(__file__).resolve().parent).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(actual, base_path, max_regresion):
+    with open(base_path) as f:
+        base = json.load(f)
+    regresiones = []
+    for ruta, datos in actual['routes'].items():
+        previo = base['routes'].get(ruta)
+        if not previo:
+            continue
+        cambio = (datos['p95_ms'] - previo['p95_ms']) / previo['p95_ms'] if previo['p95_ms'] else 0
+        marca = '❌' if cambio > max_regresion else ''
+        print(f"{ruta:32} p95 {previo['p95_ms']:8.2f} -> {datos['p95_ms']:8.2f} ms ({cambio:+.0%}) {marca}")
+        if cambio > max_regresion:
+            regresiones.append(ruta)
+    return regresiones
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Prueba de carga del backend")
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--movements', type=int, default=1000,
+                        help="movimientos sintéticos a sembrar (1k a 10M)")
+    parser.add_argument('--skip-seed', action='store_true', help="reutiliza los usuarios bench-* existentes")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=500, help="escenarios a ejecutar en total")
+    parser.add_argument('--scenarios', nargs='+', default=list(ESCENARIOS), choices=list(ESCENARIOS))
+    parser.add_argument('--llm-latency', type=float, default=0.5, help="latencia del stub de Gemini (s)")
+    parser.add_argument('--url', help="URL de un servidor ya levantado (modo HTTP)")
+    parser.add_argument('--server-pid', type=int, help="PID del servidor para medir RSS (modo HTTP)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="archivo JSON de resultados")
+    parser.add_argument('--compare', help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    conn = connect_from_env()
+    if not args.skip_seed:
+        seeding.clean(conn)
+        seeding.seed(conn, args.users, args.movements, args.seed)
+    usuarios = [{'id': r[0], 'email': r[1]} for r in seeding.bench_user_ids(conn)]
+    conn.close()
+    if not usuarios:
+        sys.exit("No hay usuarios bench-*: corre sin --skip-seed")
+
+    if args.url:
+        client = HTTPClient(args.url)
+        pid_medido = args.server_pid
+    else:
+        # Todos los escenarios salen de la misma IP: sin límites de login/registro
+        os.environ.setdefault('AUTH_RATE_LIMIT', '0')
+        # La IA es el proveedor stub de llm_gateway.py con latencia fija
+        os.environ['LLM_PROVIDER'] = 'stub'
+        os.environ['LLM_STUB_LATENCY_MS'] = str(int(args.llm_latency * 1000))
+        import app as app_module
+        client = InProcessClient(app_module.create_app())
+        pid_medido = os.getpid()
+
+    # Una sesión por usuario antes de medir (los access tokens duran ACCESS_TOKEN_TTL)
+    sesiones = {u['id']: SessionClient(client, login(client, u)['access_token']) for u in usuarios}
+
+    rnd = random.Random(args.seed)
+    plan = [
+        (ESCENARIOS[nombre], rnd.choice(usuarios))
+        for nombre in itertools.islice(itertools.cycle(args.scenarios), args.iterations)
+    ]
+
+    rec = Recorder()
+    muestreo = RSSSampler(pid_medido) if pid_medido else None
+    if muestreo:
+        muestreo.start()
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for futuro in [pool.submit(fn, rec, sesiones[usuario['id']], usuario) for fn, usuario in plan]:
+            futuro.result()
+    duracion = time.perf_counter() - inicio
+    if muestreo:
+        muestreo.stop()
+
+    # Usuarios creados por el escenario de registro
+    conn = connect_from_env()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM users WHERE email LIKE %s", ('loadtest-%@local.test',))
+    conn.commit()
+    conn.close()
+
+    total = sum(len(v) for v in rec.latencias.values())
+    resultado = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "config": {
+            "mode": "http" if args.url else "in-process",
+            "users": len(usuarios),
+            "movements": None if args.skip_seed else args.movements,
+            "concurrency": args.concurrency,
+            "iterations": args.iterations,
+            "scenarios": args.scenarios,
+            "llm_latency_s": args.llm_latency,
+        },
+        "duration_s": duracion,
+        "requests": total,
+        "throughput_rps": total / duracion if duracion else 0,
+        "routes": {
+            ruta: {
+                "count": len(valores),
+                "errors": rec.errores.get(ruta, 0),
+                "mean_ms": 1000 * sum(valores) / len(valores),
+                "p50_ms": 1000 * percentil(valores, 0.50),
+                "p95_ms": 1000 * percentil(valores, 0.95),
+                "p99_ms": 1000 * percentil(valores, 0.99),
+                "throughput_rps": len(valores) / duracion,
+            }
+            for ruta, valores in sorted(rec.latencias.items())
+        },
+        "rss_peak_kb": {str(pid): kb for pid, kb in muestreo.pico.items()} if muestreo else {},
+    }
+
+    salida = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(salida)
+    print(salida)
+
+    if args.compare:
+        if compare(resultado, args.compare, args.max_regression):
+            sys.exit(1)
@@ -0,0 +1,65 @@
+"""
+Benchmark del costo de login: verificaciones bcrypt por segundo a distintos
+factores de costo, en línea (como antes, en el hilo de la petición) y a
+través del pool de procesos de passwords.py con N hilos concurrentes
+(como los hilos de Flask atendiendo /login a la vez).
+
+No necesita base de datos.
+
+    python bench/login_cost.py --rounds 10 11 12 13 --concurrency 8 --checks 64
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import passwords
+
+PASSWORD = 'bench-password'
+
+
+def run_inline(hashed, checks, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: passwords._check(hashed, PASSWORD), range(checks)))
+
+
+def run_pool(hasher, hashed, checks, concurrency):
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: hasher.check(hashed, PASSWORD), range(checks)))
+
+
+def timed(fn, *args):
+    inicio = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - inicio
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Throughput de login por factor de costo bcrypt")
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 11, 12, 13])
+    parser.add_argument('--checks', type=int, default=64, help="verificaciones por medición")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    resultados = []
+    for rounds in args.rounds:
+        hasher = passwords.PasswordHasher(rounds, args.workers, max_queue=args.concurrency)
+        hasher.warm()
+        hashed = passwords._hash(PASSWORD, rounds)
+        for modo, fn, extra in (('en_linea', run_inline, ()), ('pool', run_pool, (hasher,))):
+            segundos = timed(fn, *extra, hashed, args.checks, args.concurrency)
+            resultados.append({
+                "modo": modo, "rounds": rounds, "concurrency": args.concurrency,
+                "checks": args.checks, "segundos": segundos,
+                "logins_por_segundo": args.checks / segundos,
+                "ms_por_login": segundos / args.checks * 1000,
+            })
+        hasher._pool.shutdown()
+
+    print(json.dumps(resultados, indent=2))
@@ -0,0 +1,117 @@
+"""
+Benchmark de la detección de movimientos recurrentes (recurring.py): tiempo
+de detect() sobre el historial de un usuario con muchos movimientos, contra
+una detección por pares (cada movimiento contra todos los de su grupo, como
+se haría sin ordenar) que solo se corre hasta --pairwise-rows filas.
+
+Usa filas sintéticas en el orden de la consulta (categoria, fecha) con series
+plantadas (renta, sueldo quincenal, suscripciones, gimnasio) y ruido; no
+necesita base de datos.
+
+    python bench/recurring.py --rows 10000 100000 250000 --pairwise-rows 2000 5000
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+import argparse
+import json
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import recurring
+
+HOY = date(2026, 10, 18)
+RUIDO = ['Comida', 'Transporte', 'Ocio', 'Salud', 'Compras', 'Servicios']
+NOTAS = [None, 'super', 'cafe', 'uber', 'farmacia', 'regalo', 'cine']
+
+# (tipo, categoria, nota, monto, primer día, periodo)
+SERIES = [
+    ('Egreso', 'Vivienda', 'Renta', 5000, date(2025, 9, 1), 'mensual'),
+    ('Ingreso', 'Sueldo', 'quincena', 9000, date(2025, 9, 15), 'quincenal'),
+    ('Egreso', 'Ocio', 'Netflix', 199, date(2025, 9, 5), 'mensual'),
+    ('Egreso', 'Servicios', 'Internet', 649, date(2025, 9, 12), 'mensual'),
+    ('Egreso', 'Salud', 'gym', 150, date(2026, 3, 2), 'semanal'),
+    ('Egreso', 'Servicios', 'Seguro auto', 2400, date(2025, 10, 20), 'trimestral'),
+]
+
+
+def synthetic_rows(n, seed=42):
+    rnd = random.Random(seed)
+    filas = []
+    for tipo, categoria, nota, monto, fecha, periodo in SERIES:
+        while fecha <= HOY:
+            variacion = rnd.uniform(-0.03, 0.03) * monto
+            filas.append((tipo, categoria, f"{nota} {fecha:%m/%Y}", Decimal(f"{monto + variacion:.2f}"),
+                          datetime.combine(fecha, datetime.min.time())))
+            fecha = recurring.next_date(fecha, periodo, fecha.day)
+    inicio = HOY - timedelta(days=recurring.LOOKBACK_DIAS)
+    for _ in range(max(n - len(filas), 0)):
+        fecha = inicio + timedelta(days=rnd.randint(0, recurring.LOOKBACK_DIAS))
+        filas.append(('Egreso', rnd.choice(RUIDO), rnd.choice(NOTAS), Decimal(rnd.randint(20, 3000)),
+                      datetime.combine(fecha, datetime.min.time()) + timedelta(minutes=rnd.randint(0, 1439))))
+    filas.sort(key=lambda f: (f[1], f[4]))
+    return filas
+
+
+def detect_pairwise(filas):
+    """Referencia O(n²) por grupo: cada par de movimientos con monto parecido y separación de un periodo."""
+    grupos = {}
+    for tipo, categoria, nota, monto, fecha in filas:
+        grupos.setdefault((tipo, categoria, recurring.normalize_note(nota)), []).append((float(monto), fecha.date()))
+    series = set()
+    for llave, ocurrencias in grupos.items():
+        for periodo, (dias, tolerancia, _) in recurring.PERIODOS.items():
+            for i, (monto_a, fecha_a) in enumerate(ocurrencias):
+                enlazados = 0
+                for monto_b, fecha_b in ocurrencias[i + 1:]:
+                    if (abs(monto_b - monto_a) <= monto_a * recurring.TOLERANCIA_MONTO
+                            and abs((fecha_b - fecha_a).days % dias) <= tolerancia):
+                        enlazados += 1
+                if enlazados + 1 >= recurring.MIN_OCURRENCIAS:
+                    series.add((llave[1], periodo))
+    return series
+
+
+def timed(fn, *args):
+    inicio = time.perf_counter()
+    resultado = fn(*args)
+    return time.perf_counter() - inicio, resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Detección de movimientos recurrentes")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000, 250000])
+    parser.add_argument('--pairwise-rows', type=int, nargs='+', default=[2000, 5000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    plantadas = {(s[1], s[5]) for s in SERIES}
+    resultados = []
+    for n in sorted(set(args.rows) | set(args.pairwise_rows)):
+        filas = synthetic_rows(n)
+        mejor = None
+        for _ in range(args.repeat):
+            segundos, (reglas, _) = timed(recurring.detect, iter(filas), HOY)
+            mejor = segundos if mejor is None else min(mejor, segundos)
+        encontradas = {(r["categoria"], r["periodo"]) for r in reglas}
+        resultados.append({
+            "modo": "ventanas_ordenadas", "filas": len(filas), "segundos": mejor,
+            "filas_por_segundo": len(filas) / mejor,
+            "dentro_del_presupuesto": mejor * 1000 <= recurring.PRESUPUESTO_MS,
+            "series_plantadas": len(plantadas),
+            "encontradas": len(encontradas & plantadas),
+            "falsos_positivos": len(encontradas - plantadas),
+        })
+        if n in args.pairwise_rows:
+            segundos, series = timed(detect_pairwise, filas)
+            resultados.append({
+                "modo": "por_pares", "filas": len(filas), "segundos": segundos,
+                "filas_por_segundo": len(filas) / segundos,
+                "encontradas": len(series & plantadas),
+                "falsos_positivos": len(series - plantadas),
+            })
+
+    print(json.dumps(resultados, indent=2))
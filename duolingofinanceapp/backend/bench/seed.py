@@ -0,0 +1,128 @@
+"""
+Siembra una base local (MySQL/MariaDB ya migrada) con usuarios y movimientos
+sintéticos reproducibles, para los benchmarks.
+
+Los usuarios se crean con el email bench-<n>@local.test y la contraseña
+BENCH_PASSWORD; los movimientos se reparten entre ellos con una
+distribución sesgada (pocos usuarios con mucho historial).
+
+    python bench/seed.py --users 100 --movements 1000000
+    python bench/seed.py --clean
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+import argparse
+import itertools
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+
+from db_pool import connect_from_env
+import rollups
+
+BENCH_PASSWORD = 'bench-password'
+EMAIL_PATRON = 'bench-{}@local.test'
+CATEGORIAS_EGRESO = ['Comida', 'Transporte', 'Renta', 'Ocio', 'Salud', 'Servicios', 'Suscripciones']
+CHUNK = 5000
+
+
+def bench_password_hash():
+    import bcrypt
+    return bcrypt.hashpw(BENCH_PASSWORD.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+
+
+def bench_user_ids(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT id_user, email FROM users WHERE email LIKE %s ORDER BY id_user", ('bench-%@local.test',))
+    usuarios = cur.fetchall()
+    cur.close()
+    return usuarios
+
+
+def clean(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT id_user FROM users WHERE email LIKE %s", ('bench-%@local.test',))
+    ids = [r[0] for r in cur.fetchall()]
+    for id_user in ids:
+        cur.execute("DELETE FROM resumen_movimientos WHERE user_id=%s", (id_user,))
+        cur.execute("DELETE FROM movimientos WHERE user_id=%s", (id_user,))
+        cur.execute("DELETE FROM users WHERE id_user=%s", (id_user,))
+        conn.commit()
+    cur.close()
+    return len(ids)
+
+
+def seed(conn, usuarios, movimientos, semilla=42, dias=3 * 365):
+    """Crea los usuarios y movimientos; devuelve la lista de id_user creados."""
+    rnd = random.Random(semilla)
+    cur = conn.cursor()
+    password = bench_password_hash()
+    ids = []
+    for n in range(usuarios):
+        cur.execute(
+            "INSERT INTO users (username, email, password) VALUES (%s, %s, %s)",
+            (f'bench{n}', EMAIL_PATRON.format(n), password)
+        )
+        ids.append(cur.lastrowid)
+    conn.commit()
+
+    # Pareto: unos cuantos usuarios concentran la mayor parte del historial
+    acumulados = list(itertools.accumulate(1 / (i + 1) for i in range(usuarios)))
+    ahora = datetime.now()
+    lote = []
+    for _ in range(movimientos):
+        id_user = rnd.choices(ids, cum_weights=acumulados)[0]
+        tipo = 'Ingreso' if rnd.random() < 0.2 else 'Egreso'
+        lote.append((
+            id_user,
+            ahora - timedelta(minutes=rnd.randrange(dias * 24 * 60)),
+            rnd.randrange(100, 500000) / 100,
+            tipo,
+            'Sueldo' if tipo == 'Ingreso' else rnd.choice(CATEGORIAS_EGRESO),
+            None,
+        ))
+        if len(lote) >= CHUNK:
+            _insert(cur, lote)
+            conn.commit()
+            lote = []
+    if lote:
+        _insert(cur, lote)
+        conn.commit()
+    cur.close()
+
+    for id_user in ids:
+        rollups.rebuild(conn, id_user)
+    return ids
+
+
+def _insert(cur, lote):
+    cur.executemany(
+        "INSERT INTO movimientos (user_id, fecha, monto, tipo, categoria, nota) VALUES (%s, %s, %s, %s, %s, %s)",
+        lote
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Datos sintéticos para benchmarks")
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--movements', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--clean', action='store_true', help="solo borra los datos de benchmark")
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = connect_from_env()
+    try:
+        borrados = clean(conn)
+        print(f"Usuarios de benchmark previos borrados: {borrados}")
+        if not args.clean:
+            inicio = time.perf_counter()
+            ids = seed(conn, args.users, args.movements, args.seed)
+            print(f"{len(ids)} usuarios y {args.movements} movimientos en "
+                  f"{time.perf_counter() - inicio:.1f}s ✅")
+    finally:
+        conn.close()
@@ -0,0 +1,169 @@
+"""
+Benchmark de la serialización de GET /movements: el camino anterior
+(json.dumps de un dict por fila), el proveedor orjson de json_provider.py
+por lotes, el streaming actual (fecha y monto ya convertidos en el SELECT,
+un dict(zip()) por fila) y el formato columnar, más el tamaño y el tiempo de comprimir
+cada resultado con gzip y brotli (si está instalado).
+
+Usa filas sintéticas con los mismos tipos que devuelve MySQLdb (Decimal,
+datetime); no necesita base de datos.
+
+    python bench/serialization.py --rows 1000 10000 --repeat 20
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+import argparse
+import json
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask
+
+import compression
+import json_provider
+
+CATEGORIAS = ['Comida', 'Transporte', 'Renta', 'Ocio', 'Salud', 'Sueldo', 'Servicios']
+LOTE = 200  # igual que MOVIMIENTOS_LOTE en app.py
+CAMPOS = ("id_movimiento", "user_id", "fecha", "monto", "categoria", "nota", "tipo")
+
+
+# Copias de app.py: importarlo exige MySQL y Gemini configurados
+def movement_to_dict(m):
+    return {
+        "id_movimiento": m[0],
+        "user_id": m[1],
+        "fecha": str(m[2]),
+        "monto": float(m[3]),
+        "categoria": m[4],
+        "nota": m[5],
+        "tipo": m[6]
+    }
+
+
+def movements_to_columns(filas):
+    ids, usuarios, fechas, montos, categorias, notas, tipos = zip(*filas)
+    return {
+        "id_movimiento": list(ids),
+        "user_id": list(usuarios),
+        "fecha": list(map(str, fechas)),
+        "monto": list(map(float, montos)),
+        "categoria": list(categorias),
+        "nota": list(notas),
+        "tipo": list(tipos),
+    }
+
+
+def synthetic_rows(n):
+    rnd = random.Random(42)
+    inicio = datetime(2024, 1, 1)
+    return [
+        (
+            n - i, 1,
+            inicio + timedelta(minutes=rnd.randrange(500000)),
+            Decimal(rnd.randrange(100, 500000)) / 100,
+            rnd.choice(CATEGORIAS),
+            rnd.choice([None, 'pago', 'compra en línea', 'transferencia']),
+            rnd.choice(['Ingreso', 'Egreso']),
+        )
+        for i in range(n)
+    ]
+
+
+def path_anterior(filas):
+    # Un json.dumps por fila, como el streaming original
+    partes = ['[']
+    for i, m in enumerate(filas):
+        partes.append((',' if i else '') + json.dumps(movement_to_dict(m)))
+    partes.append(']')
+    return ''.join(partes).encode('utf-8')
+
+
+def path_lotes(provider):
+    def serializar(filas):
+        partes = [b'[']
+        for i in range(0, len(filas), LOTE):
+            lote = filas[i:i + LOTE]
+            partes.append((b',' if i else b'') + provider.dumpb([movement_to_dict(m) for m in lote])[1:-1])
+        partes.append(b']')
+        return b''.join(partes)
+    return serializar
+
+
+def sql_rows(filas):
+    # Lo que devuelve MOVIMIENTO_COLUMNAS_JSON: DATE_FORMAT y monto + 0e0
+    return [(m[0], m[1], str(m[2]), float(m[3]), m[4], m[5], m[6]) for m in filas]
+
+
+def path_lotes_sql(provider):
+    # Las filas llegan convertidas desde MySQL (ver sql_rows, fuera del tiempo medido)
+    def serializar(filas):
+        partes = [b'[']
+        for i in range(0, len(filas), LOTE):
+            lote = filas[i:i + LOTE]
+            partes.append((b',' if i else b'') + provider.dumpb([dict(zip(CAMPOS, m)) for m in lote])[1:-1])
+        partes.append(b']')
+        return b''.join(partes)
+    return serializar
+
+
+def path_columnar(provider):
+    return lambda filas: provider.dumpb({"items": movements_to_columns(filas), "next_cursor": None})
+
+
+def medir(fn, *args, repeat):
+    mejor = float('inf')
+    for _ in range(repeat):
+        inicio = time.perf_counter()
+        resultado = fn(*args)
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor, resultado
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serialización y compresión de la lista de movimientos")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=20, help="repeticiones (se reporta la mejor)")
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    proveedores = [('std', json_provider.StdProvider(app))]
+    if json_provider.orjson is not None:
+        proveedores.append(('orjson', json_provider.OrjsonProvider(app)))
+    else:
+        print("orjson no está instalado: solo se mide el proveedor estándar", file=sys.stderr)
+
+    codificaciones = ['gzip'] + (['br'] if compression.brotli is not None else [])
+
+    caminos = [('anterior_json_por_fila', path_anterior)]
+    for nombre, provider in proveedores:
+        caminos += [
+            (f'{nombre}_por_lote', path_lotes(provider)),
+            (f'{nombre}_por_lote_sql', path_lotes_sql(provider)),
+            (f'{nombre}_columnar', path_columnar(provider)),
+        ]
+
+    resultados = []
+    for n in args.rows:
+        filas = synthetic_rows(n)
+        convertidas = sql_rows(filas)
+        for nombre, fn in caminos:
+            entrada = convertidas if nombre.endswith('_sql') else filas
+            segundos, cuerpo = medir(fn, entrada, repeat=args.repeat)
+            fila = {
+                "camino": nombre, "filas": n, "segundos": segundos,
+                "filas_por_segundo": n / segundos, "bytes": len(cuerpo),
+            }
+            for encoding in codificaciones:
+                t_comp, comprimido = medir(compression.compress, cuerpo, encoding, repeat=max(1, args.repeat // 4))
+                fila[f"bytes_{encoding}"] = len(comprimido)
+                fila[f"segundos_{encoding}"] = t_comp
+            resultados.append(fila)
+
+    for fila in resultados:
+        base = next(r for r in resultados if r["filas"] == fila["filas"] and r["camino"] == 'anterior_json_por_fila')
+        fila["aceleracion_vs_anterior"] = base["segundos"] / fila["segundos"]
+    print(json.dumps(resultados, indent=2))
@@ -0,0 +1,113 @@
+"""
+Compresión negociada de las respuestas JSON.
+
+Según Accept-Encoding se comprime con brotli (si la librería está instalada)
+o gzip. Las respuestas armadas en memoria solo se comprimen por encima de
+un umbral; las que van en streaming (GET /movements sin límite) se
+comprimen trozo a trozo sin juntarlas, porque su tamaño no se conoce antes.
+
+    COMPRESS_MIN_BYTES   tamaño mínimo para comprimir (default 1024)
+    COMPRESS_LEVEL       nivel de gzip, 1-9 (default 6)
+    BROTLI_QUALITY       calidad de brotli, 0-11 (default 4)
+    COMPRESSION          1 (default) | 0 para deshabilitar
+
+Los eventos SSE (text/event-stream) no se comprimen: el cliente debe
+recibir cada evento en cuanto se genera.
+"""
+import gzip
+import os
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 4))
+
+COMPRIMIBLES = ('application/json', 'text/csv', 'text/plain')
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' o None según lo que acepta el cliente (respeta q=0)."""
+    aceptadas = {}
+    for parte in (accept_encoding or '').split(','):
+        nombre, _, params = parte.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if nombre:
+            aceptadas[nombre.lower()] = q
+    comodin = aceptadas.get('*', 0.0)
+    if brotli is not None and aceptadas.get('br', comodin) > 0:
+        return 'br'
+    if aceptadas.get('gzip', comodin) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(datos, encoding):
+    if encoding == 'br':
+        return brotli.compress(datos, quality=BROTLI_QUALITY)
+    return gzip.compress(datos, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def compress_stream(trozos, encoding):
+    """Comprime un iterable de str/bytes; cada trozo se vacía al cliente (flush)."""
+    if encoding == 'br':
+        compresor = brotli.Compressor(quality=BROTLI_QUALITY)
+        vaciar, terminar = compresor.flush, compresor.finish
+        procesar = compresor.process
+    else:
+        # wbits=31: formato gzip (cabecera + CRC) en vez de zlib crudo
+        compresor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        procesar = compresor.compress
+        vaciar = lambda: compresor.flush(zlib.Z_SYNC_FLUSH)
+        terminar = compresor.flush
+    try:
+        for trozo in trozos:
+            if isinstance(trozo, str):
+                trozo = trozo.encode('utf-8')
+            salida = procesar(trozo) + vaciar()
+            if salida:
+                yield salida
+        yield terminar()
+    finally:
+        if hasattr(trozos, 'close'):
+            trozos.close()
+
+
+def init_app(app):
+    if os.getenv('COMPRESSION', '1') != '1':
+        return
+
+    @app.after_request
+    def _compress(response):
+        if (request.method == 'HEAD' or response.status_code in (204, 304)
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRIMIBLES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            datos = response.get_data()
+            if len(datos) < MIN_BYTES:
+                return response
+            response.set_data(compress(datos, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
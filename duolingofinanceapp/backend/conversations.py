@@ -0,0 +1,136 @@
+"""
+Memoria de conversación con la mascota.
+
+Cada pregunta y su respuesta se guardan como turnos de una conversación en
+la tabla ia_turnos (migrations/0008_ia_conversaciones.sql), así una
+pregunta de seguimiento ("¿y en comida?") llega a Gemini con lo que se
+habló antes. Para que el historial no crezca sin límite se lleva la cuenta
+de sus tokens; al pasar el presupuesto los turnos viejos se resumen en uno
+solo (o se descartan) y los más recientes se conservan tal cual:
+
+    IA_HISTORY_TOKENS        presupuesto de tokens del historial (default 2000)
+    IA_HISTORY_KEEP_TURNS    turnos recientes que nunca se compactan (default 4)
+    IA_HISTORY_MODE          summarize (default) | trim
+    IA_CONVERSATION_DAYS     días que se conservan los turnos (default 30)
+
+Los tokens de las respuestas son los que reporta Gemini; los de las
+preguntas y resúmenes se estiman (~4 caracteres por token), suficiente
+para decidir cuándo compactar.
+"""
+from datetime import datetime, timedelta
+import os
+import re
+import secrets
+
+PRESUPUESTO = int(os.getenv('IA_HISTORY_TOKENS', 2000))
+# Par: una pregunta y su respuesta
+CONSERVAR = max(2, int(os.getenv('IA_HISTORY_KEEP_TURNS', 4)) // 2 * 2)
+MODO = os.getenv('IA_HISTORY_MODE', 'summarize')
+RETENCION_DIAS = int(os.getenv('IA_CONVERSATION_DAYS', 30))
+
+ROL_USUARIO = 'user'
+ROL_MODELO = 'model'
+ROL_RESUMEN = 'resumen'
+
+_ID_VALIDO = re.compile(r'^[0-9a-f]{32}$')
+
+RESUMEN_PREGUNTA = (
+    "Resume en máximo 100 palabras esta conversación entre {username} y su "
+    "asesor financiero. Conserva las metas, cifras y decisiones que se "
+    "mencionaron; omite saludos.\n\n{conversacion}"
+)
+
+
+def estimate_tokens(texto):
+    return max(1, len(texto) // 4)
+
+
+def new_conversation_id():
+    return secrets.token_hex(16)
+
+
+def valid_conversation_id(conversacion):
+    return isinstance(conversacion, str) and bool(_ID_VALIDO.match(conversacion))
+
+
+def load_turns(cur, id_user, conversacion):
+    """Turnos de la conversación en orden; el resumen (si hay) va primero."""
+    cur.execute(
+        "SELECT id_turno, rol, texto, tokens FROM ia_turnos "
+        "WHERE user_id=%s AND conversacion=%s ORDER BY rol <> 'resumen', id_turno",
+        (id_user, conversacion)
+    )
+    return [{"id_turno": r[0], "rol": r[1], "texto": r[2], "tokens": r[3]} for r in cur.fetchall()]
+
+
+def history_tokens(turnos):
+    return sum(t["tokens"] for t in turnos)
+
+
+def save_turns(cur, id_user, conversacion, pregunta, respuesta, tokens_respuesta=None):
+    """Guarda la pregunta y la respuesta como dos turnos. No hace commit."""
+    cur.executemany(
+        "INSERT INTO ia_turnos (user_id, conversacion, rol, texto, tokens) VALUES (%s, %s, %s, %s, %s)",
+        [
+            (id_user, conversacion, ROL_USUARIO, pregunta, estimate_tokens(pregunta)),
+            (id_user, conversacion, ROL_MODELO, respuesta, tokens_respuesta or estimate_tokens(respuesta)),
+        ]
+    )
+
+
+def purge_old(cur, id_user):
+    """Borra los turnos del usuario con más de IA_CONVERSATION_DAYS días."""
+    cur.execute(
+        "DELETE FROM ia_turnos WHERE user_id=%s AND creado < %s",
+        (id_user, datetime.now() - timedelta(days=RETENCION_DIAS))
+    )
+
+
+def render_turns(turnos, username):
+    nombres = {ROL_USUARIO: username, ROL_MODELO: "Asesor", ROL_RESUMEN: "Resumen previo"}
+    return '\n'.join(f"{nombres[t['rol']]}: {t['texto']}" for t in turnos)
+
+
+def summarize_old(turnos, username, resumir):
+    """
+    Si el historial pasa de IA_HISTORY_TOKENS, separa los turnos viejos de
+    los recientes y (en modo summarize) los resume con resumir(prompt) ->
+    texto. No toca la base, así que se puede llamar sin tener una conexión
+    tomada mientras la IA responde. Devuelve (viejos, recientes, resumen);
+    viejos vacío si no hace falta compactar, resumen None en modo trim o si
+    el resumen falla.
+    """
+    if history_tokens(turnos) <= PRESUPUESTO or len(turnos) <= CONSERVAR:
+        return [], turnos, None
+    viejos, recientes = turnos[:-CONSERVAR], turnos[-CONSERVAR:]
+
+    resumen = None
+    if MODO == 'summarize':
+        try:
+            resumen = resumir(RESUMEN_PREGUNTA.format(
+                username=username, conversacion=render_turns(viejos, username)
+            ))
+        except Exception as e:
+            print(f"No se pudo resumir la conversación, se recortan los turnos viejos: {e}")
+    return viejos, recientes, resumen
+
+
+def replace_old(cur, id_user, conversacion, viejos, recientes, resumen):
+    """
+    Borra los turnos viejos y guarda el resumen (si hay) en su lugar.
+    Devuelve los turnos que quedan. Si otra petición ya los compactó
+    mientras se resumía no se agrega un segundo resumen. No hace commit.
+    """
+    ids = [t["id_turno"] for t in viejos]
+    cur.execute(
+        f"DELETE FROM ia_turnos WHERE user_id=%s AND id_turno IN ({', '.join(['%s'] * len(ids))})",
+        [id_user] + ids
+    )
+    if resumen and cur.rowcount == len(ids):
+        tokens = estimate_tokens(resumen)
+        cur.execute(
+            "INSERT INTO ia_turnos (user_id, conversacion, rol, texto, tokens) VALUES (%s, %s, %s, %s, %s)",
+            (id_user, conversacion, ROL_RESUMEN, resumen, tokens)
+        )
+        recientes = [{"id_turno": cur.lastrowid, "rol": ROL_RESUMEN, "texto": resumen, "tokens": tokens}] + recientes
+    return recientes
@@ -0,0 +1,272 @@
+"""
+Pool de conexiones MySQL acotado y seguro entre hilos.
+
+Sustituye a flask_mysqldb.MySQL manteniendo la misma interfaz para los
+endpoints (mysql.connection.cursor(), mysql.connection.commit()): cada
+contexto de aplicación toma una conexión del pool la primera vez que la
+necesita y la devuelve en el teardown.
+
+Configuración (variables de entorno, además de DB_HOST/DB_USER/...):
+    DB_POOL_MIN           conexiones que se mantienen abiertas (default 1)
+    DB_POOL_MAX           máximo de conexiones simultáneas (default 10)
+    DB_POOL_TIMEOUT       segundos máximos esperando una conexión (default 5)
+    DB_POOL_IDLE_TIMEOUT  segundos antes de cerrar una conexión ociosa (default 300)
+    DB_POOL_PRE_PING      '1' para hacer ping antes de entregar una conexión (default 1)
+"""
+from collections import deque
+import os
+import threading
+import time
+
+import MySQLdb
+from flask import g
+
+
+class PoolTimeout(Exception):
+    """No se liberó ninguna conexión dentro de DB_POOL_TIMEOUT."""
+
+
+class MySQLPool:
+    def __init__(self, app=None):
+        self._lock = threading.Condition()
+        self._idle = deque()  # (conexion, instante en que quedó libre)
+        self._size = 0
+        self._pid = os.getpid()
+        # Última vez (monotonic) que la base respondió; lo usa check()
+        self._ultimo_ok = 0.0
+        # Envoltorio opcional para cada conexión entregada a un endpoint
+        # (por ejemplo instrumentation.InstrumentedConnection)
+        self.wrap_connection = None
+        self._metrics = {
+            "checkouts": 0,
+            "checkout_wait_seconds_total": 0.0,
+            "checkout_wait_seconds_max": 0.0,
+            "saturated_checkouts": 0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_discarded": 0,
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.connect_args = {
+            "host": app.config.get('MYSQL_HOST') or 'localhost',
+            "user": app.config.get('MYSQL_USER'),
+            "passwd": app.config.get('MYSQL_PASSWORD'),
+            "db": app.config.get('MYSQL_DB'),
+            "port": int(app.config.get('MYSQL_PORT') or 3306),
+            # utf8mb4: las respuestas de la IA traen emojis (utf8 es utf8mb3)
+            "charset": app.config.get('MYSQL_CHARSET', 'utf8mb4'),
+            "connect_timeout": int(app.config.get('MYSQL_CONNECT_TIMEOUT', 10)),
+        }
+        self.min_size = int(os.getenv('DB_POOL_MIN', 1))
+        self.max_size = max(int(os.getenv('DB_POOL_MAX', 10)), self.min_size, 1)
+        self.timeout = float(os.getenv('DB_POOL_TIMEOUT', 5))
+        self.idle_timeout = float(os.getenv('DB_POOL_IDLE_TIMEOUT', 300))
+        self.pre_ping = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+        app.teardown_appcontext(self._teardown)
+
+    # ---------------------------
+    # Interfaz usada por los endpoints
+    # ---------------------------
+    @property
+    def connection(self):
+        conn = g.get('_db_conn_wrapped')
+        if conn is None:
+            inicio = time.perf_counter()
+            crudo = self.checkout()
+            g._db_conn = crudo
+            g.db_checkout_wait = time.perf_counter() - inicio
+            conn = self.wrap_connection(crudo) if self.wrap_connection else crudo
+            g._db_conn_wrapped = conn
+        return conn
+
+    def _teardown(self, exception):
+        self.release_current()
+
+    def release_current(self):
+        """
+        Devuelve al pool la conexión de la petición antes del teardown (por
+        ejemplo antes de esperar segundos a la IA). Si después se vuelve a
+        usar mysql.connection se toma otra.
+        """
+        g.pop('_db_conn_wrapped', None)
+        conn = g.pop('_db_conn', None)
+        if conn is None:
+            return
+        try:
+            # Deshace cualquier transacción que el endpoint no haya confirmado
+            conn.rollback()
+        except MySQLdb.Error:
+            self.release(conn, discard=True)
+            return
+        self._ultimo_ok = time.monotonic()
+        self.release(conn)
+
+    # ---------------------------
+    # Pool
+    # ---------------------------
+    def _new_connection(self):
+        conn = MySQLdb.connect(**self.connect_args)
+        with self._lock:
+            self._metrics["connections_created"] += 1
+        return conn
+
+    def _check_fork(self):
+        # Tras un fork las conexiones del padre no se pueden compartir
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._size = 0
+
+    def _reap_idle(self, ahora):
+        while len(self._idle) and self._size > self.min_size:
+            conn, libre_desde = self._idle[0]
+            if ahora - libre_desde < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            self._metrics["connections_discarded"] += 1
+            _close_quietly(conn)
+
+    def checkout(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        with self._lock:
+            self._check_fork()
+            self._reap_idle(inicio)
+            saturado = False
+            while True:
+                if self._idle:
+                    # LIFO: la conexión más reciente es la que menos probablemente expiró
+                    conn, _ = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn = None
+                    break
+                saturado = True
+                restante = timeout - (time.monotonic() - inicio)
+                if restante <= 0:
+                    self._metrics["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"Sin conexiones libres tras {timeout}s (max={self.max_size})"
+                    )
+                self._lock.wait(restante)
+
+            espera = time.monotonic() - inicio
+            self._metrics["checkouts"] += 1
+            self._metrics["checkout_wait_seconds_total"] += espera
+            self._metrics["checkout_wait_seconds_max"] = max(
+                self._metrics["checkout_wait_seconds_max"], espera
+            )
+            if saturado:
+                self._metrics["saturated_checkouts"] += 1
+
+        # Conectar y hacer ping fuera del lock
+        try:
+            if conn is None:
+                conn = self._new_connection()
+            elif self.pre_ping:
+                try:
+                    conn.ping()
+                except MySQLdb.Error:
+                    _close_quietly(conn)
+                    with self._lock:
+                        self._metrics["connections_discarded"] += 1
+                    conn = self._new_connection()
+        except Exception:
+            with self._lock:
+                self._size -= 1
+                self._lock.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard=False):
+        with self._lock:
+            if os.getpid() != self._pid:
+                return
+            if discard:
+                self._size -= 1
+                self._metrics["connections_discarded"] += 1
+                _close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def warm(self):
+        """Abre conexiones hasta DB_POOL_MIN (por ejemplo al arrancar un worker)."""
+        while True:
+            with self._lock:
+                self._check_fork()
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._new_connection()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+            self._ultimo_ok = time.monotonic()
+            self.release(conn)
+
+    def check(self, max_age, timeout=0.5):
+        """
+        Disponibilidad de la base para /readyz sin una consulta por sondeo:
+        si alguna petición devolvió su conexión sana hace menos de max_age
+        segundos es 'ok'; si no, hace un ping (COM_PING, sin consulta) con
+        una conexión del pool. Devuelve 'ok', 'saturado' o 'error'.
+        """
+        if time.monotonic() - self._ultimo_ok < max_age:
+            return 'ok'
+        try:
+            conn = self.checkout(timeout)
+        except PoolTimeout:
+            return 'saturado'
+        except MySQLdb.Error as e:
+            print(f"Base de datos no disponible: {e}")
+            return 'error'
+        try:
+            conn.ping()
+        except MySQLdb.Error as e:
+            print(f"Base de datos no disponible: {e}")
+            self.release(conn, discard=True)
+            return 'error'
+        self._ultimo_ok = time.monotonic()
+        self.release(conn)
+        return 'ok'
+
+    def stats(self):
+        with self._lock:
+            en_uso = self._size - len(self._idle)
+            datos = dict(self._metrics)
+            datos.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": en_uso,
+                "max_size": self.max_size,
+                "min_size": self.min_size,
+                "saturation": en_uso / self.max_size,
+            })
+        return datos
+
+
+def connect_from_env():
+    """Conexión suelta con las variables DB_* (para scripts fuera de Flask)."""
+    return MySQLdb.connect(
+        host=os.getenv('DB_HOST') or 'localhost',
+        user=os.getenv('DB_USER'),
+        passwd=os.getenv('DB_PASSWORD'),
+        db=os.getenv('DB_NAME'),
+        port=int(os.getenv('DB_PORT', 3306)),
+        charset='utf8mb4',
+    )
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except MySQLdb.Error:
+        pass
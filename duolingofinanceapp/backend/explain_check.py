@@ -0,0 +1,213 @@
+"""
+Prueba de índices: recorre los endpoints de lectura de app.py contra la base
+configurada en .env, captura cada SELECT que ejecutan y corre EXPLAIN sobre
+él. Falla (exit 1) si alguna consulta hace un full table scan (type=ALL)
+sobre una tabla real.
+
+Necesita la base migrada (python migrate.py). Crea un usuario temporal con
+movimientos sintéticos para que el optimizador tenga estadísticas reales y
+lo borra al terminar.
+
+    python explain_check.py [--rows 5000]
+
+La misma revisión corre en la suite (tests/test_explain.py) cuando hay una
+base configurada.
+"""
+from datetime import datetime, timedelta
+import argparse
+import random
+import sys
+
+from app import create_app, mysql, fetch_financial_snapshot, load_conversation, passwords
+import conversations
+import rollups
+import spending_stats
+
+EMAIL_PRUEBA = 'explain-check@local.test'
+PASSWORD_PRUEBA = 'explain-check'
+CONVERSACION_PRUEBA = 'e' * 32
+CATEGORIAS = ['Comida', 'Transporte', 'Renta', 'Ocio', 'Salud', 'Servicios']
+
+
+class RecordingCursor:
+    def __init__(self, cursor, consultas):
+        self._cursor = cursor
+        self._consultas = consultas
+
+    def execute(self, query, params=None):
+        if query.lstrip().upper().startswith('SELECT'):
+            self._consultas.append((query, params))
+        return self._cursor.execute(query, params)
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class RecordingConnection:
+    def __init__(self, conn, consultas):
+        self._conn = conn
+        self._consultas = consultas
+
+    def cursor(self, *args):
+        return RecordingCursor(self._conn.cursor(*args), self._consultas)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+
+def seed(conn, filas):
+    cur = conn.cursor()
+    cur.execute("DELETE FROM users WHERE email=%s", (EMAIL_PRUEBA,))
+    cur.execute(
+        "INSERT INTO users (username, email, password) VALUES (%s, %s, %s)",
+        ('explain', EMAIL_PRUEBA, passwords.hash(PASSWORD_PRUEBA))
+    )
+    id_user = cur.lastrowid
+    rnd = random.Random(7)
+    inicio = datetime.now() - timedelta(days=730)
+    cur.executemany(
+        "INSERT INTO movimientos (user_id, fecha, monto, tipo, categoria) VALUES (%s, %s, %s, %s, %s)",
+        [
+            (id_user, inicio + timedelta(minutes=rnd.randrange(730 * 24 * 60)),
+             rnd.randrange(100, 100000) / 100, rnd.choice(['Ingreso', 'Egreso']), rnd.choice(CATEGORIAS))
+            for _ in range(filas)
+        ]
+    )
+    cur.execute(
+        "INSERT INTO metas_ahorro (user_id, descripcion, monto_objetivo) VALUES (%s, %s, %s)",
+        (id_user, 'Meta', 1000)
+    )
+    id_meta = cur.lastrowid
+    cur.execute(
+        "INSERT INTO metas_inversion (user_id, descripcion, monto_objetivo) VALUES (%s, %s, %s)",
+        (id_user, 'Meta', 1000)
+    )
+    cur.executemany(
+        "INSERT INTO metas_aportes (user_id, tipo_meta, id_meta, delta, fecha) VALUES (%s, %s, %s, %s, %s)",
+        [(id_user, 'ahorro', id_meta, 50, datetime.now() - timedelta(days=d)) for d in range(0, 120, 10)]
+    )
+    cur.executemany(
+        "INSERT INTO ia_insights (user_id, tipo, titulo, contenido) VALUES (%s, %s, %s, %s)",
+        [(id_user, tipo, 'Insight', 'Texto 💰') for tipo in ('digest', 'alerta') for _ in range(5)]
+    )
+    for _ in range(3):
+        conversations.save_turns(cur, id_user, CONVERSACION_PRUEBA, "¿Cómo voy?", "¡Muy bien! 💰")
+    conn.commit()
+    rollups.rebuild(conn, id_user)
+    spending_stats.rebuild(conn, id_user)
+    for tabla in ('users', 'movimientos', 'metas_ahorro', 'metas_inversion', 'resumen_movimientos',
+                  'refresh_tokens', 'ia_insights', 'ia_turnos', 'metas_aportes',
+                  'recurrentes_estado', 'estadisticas_categoria', 'anomalias'):
+        cur.execute(f"ANALYZE TABLE {tabla}")
+        cur.fetchall()
+    cur.close()
+    return id_user
+
+
+def exercise_endpoints(app, id_user):
+    client = app.test_client()
+    # Sesión real: login y rotación del refresh token también consultan la base
+    sesion = client.post('/login', json={'email': EMAIL_PRUEBA, 'password': PASSWORD_PRUEBA}).get_json()
+    sesion = client.post('/auth/refresh', json={'refresh_token': sesion['refresh_token']}).get_json()
+    client.environ_base['HTTP_AUTHORIZATION'] = f"Bearer {sesion['access_token']}"
+    desde = (datetime.now() - timedelta(days=90)).strftime('%Y-%m-%d')
+    hasta = datetime.now().strftime('%Y-%m-%d')
+    for query in ('', '?limit=20', '?limit=20&tipo=Egreso', '?limit=20&categoria=Comida',
+                  f'?from={desde}&to={hasta}'):
+        client.get(f'/movements/{id_user}{query}').get_data()
+    pagina = client.get(f'/movements/{id_user}?limit=20').get_json()
+    client.get(f"/movements/{id_user}?limit=20&cursor={pagina['next_cursor']}").get_data()
+    client.get(f'/movements/{id_user}?format=columnar&limit=20')
+    client.get(f'/movements/summary/{id_user}')
+    client.get(f'/balance/{id_user}')
+    for agrupacion in ('month', 'week', 'day'):
+        client.get(f'/movements/stats/{id_user}?group={agrupacion}')
+    client.get(f'/goals/ahorro/{id_user}')
+    client.get(f'/goals/inversion/{id_user}')
+    client.get(f'/goals/progress/{id_user}')
+    # Dos veces: la primera detecta y guarda las reglas, la segunda las lee
+    client.get(f'/forecast/{id_user}')
+    client.get(f'/forecast/{id_user}')
+    client.get(f'/anomalies/{id_user}')
+    client.get(f'/anomalies/{id_user}?days=365')
+    client.get(f'/sync/{id_user}?since=1')
+    client.post('/batch', json={'operations': [
+        {'op': 'movements.list', 'limit': 20},
+        {'op': 'movements.summary'},
+        {'op': 'balance'},
+        {'op': 'goals.list', 'tipo': 'ahorro'},
+        {'op': 'goals.progress'},
+        {'op': 'anomalies.list', 'days': 90},
+    ]})
+    client.get(f'/ia/insights/{id_user}')
+    client.get(f'/ia/insights/{id_user}?tipo=alerta&limit=5')
+    with app.app_context():
+        cur = mysql.connection.cursor()
+        fetch_financial_snapshot(id_user, cur)
+        cur.close()
+    # Historial de la mascota (lo que /ia/ask_mascot lee antes de llamar a la IA)
+    with app.test_request_context():
+        load_conversation({'conversation_id': CONVERSACION_PRUEBA}, {'id_user': id_user, 'username': 'explain'})
+
+
+def explain_all(conn, consultas):
+    fallas = []
+    vistas = set()
+    cur = conn.cursor()
+    for query, params in consultas:
+        if query in vistas:
+            continue
+        vistas.add(query)
+        cur.execute("EXPLAIN " + query, params)
+        columnas = [d[0] for d in cur.description]
+        for fila in cur.fetchall():
+            plan = dict(zip(columnas, fila))
+            tabla = plan.get('table') or ''
+            # Las tablas derivadas (<derivedN>, <union...>) ya vienen agregadas
+            if plan.get('type') == 'ALL' and not tabla.startswith('<'):
+                fallas.append((tabla, ' '.join(query.split())))
+    cur.close()
+    return fallas, len(vistas)
+
+
+def check_indexes(app, filas):
+    """
+    Siembra el usuario temporal, recorre los endpoints y corre EXPLAIN sobre
+    cada SELECT capturado. Devuelve (fallas, consultas revisadas); fallas es
+    una lista de (tabla, query) con full scan. Borra el usuario al terminar.
+    """
+    consultas = []
+    pool = app.extensions['finanzas']['mysql']
+    checkout_original = pool.checkout
+    pool.checkout = lambda timeout=None: RecordingConnection(checkout_original(timeout), consultas)
+
+    with app.app_context():
+        conn = mysql.connection
+        id_user = seed(conn, filas)
+    try:
+        exercise_endpoints(app, id_user)
+        with app.app_context():
+            return explain_all(mysql.connection, consultas)
+    finally:
+        pool.checkout = checkout_original
+        with app.app_context():
+            cur = mysql.connection.cursor()
+            cur.execute("DELETE FROM resumen_movimientos WHERE user_id=%s", (id_user,))
+            cur.execute("DELETE FROM users WHERE id_user=%s", (id_user,))
+            mysql.connection.commit()
+            cur.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="EXPLAIN de las consultas de los endpoints")
+    parser.add_argument('--rows', type=int, default=5000)
+    args = parser.parse_args()
+
+    fallas, total = check_indexes(create_app(), args.rows)
+
+    for tabla, query in fallas:
+        print(f"Full scan en {tabla}: {query}")
+    if fallas:
+        print(f"{len(fallas)} consultas sin índice ❌")
+        sys.exit(1)
+    print(f"{total} consultas revisadas, todas usan índice ✅")
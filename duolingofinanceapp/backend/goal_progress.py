@@ -0,0 +1,124 @@
+"""
+Progreso de las metas de ahorro e inversión.
+
+Para todas las metas de un usuario a la vez calcula el ritmo de aporte
+mensual, la fecha estimada en que se completan y si van a tiempo:
+
+  - Ritmo propio: lo que subió monto_actual en los últimos
+    GOALS_WINDOW_DAYS días (tabla metas_aportes), llevado a 30 días.
+  - Metas sin aportes recientes: se les reparte el ahorro neto mensual del
+    usuario (ingresos - egresos de resumen_movimientos en los últimos
+    GOALS_SAVINGS_MONTHS meses completos) que no explican las otras metas,
+    en proporción a lo que les falta.
+  - Estado: completada, estancada (sin ritmo), a_tiempo / atrasada si la
+    meta tiene fecha_objetivo, o en_progreso si no la tiene.
+
+Con numpy instalado el cálculo es vectorial; sin numpy se hace meta por meta
+con el mismo resultado.
+
+    GOALS_WINDOW_DAYS     ventana del ritmo de aportes (default 90)
+    GOALS_SAVINGS_MONTHS  meses completos del ahorro neto (default 6)
+"""
+from datetime import date, timedelta
+import math
+import os
+
+try:
+    import numpy as np
+except ImportError:  # dependencia opcional
+    np = None
+
+VENTANA_DIAS = int(os.getenv('GOALS_WINDOW_DAYS', 90))
+MESES_AHORRO = int(os.getenv('GOALS_SAVINGS_MONTHS', 6))
+
+DIAS_MES = 30.4375
+# Más allá de esto la fecha estimada no significa nada
+MAX_MESES = 1200
+
+ENGINE = 'numpy' if np is not None else 'python'
+
+
+def savings_window(hoy=None):
+    """(inicio, fin) de los MESES_AHORRO meses completos anteriores al actual."""
+    hoy = hoy or date.today()
+    fin = date(hoy.year, hoy.month, 1)
+    meses = fin.year * 12 + fin.month - 1 - MESES_AHORRO
+    return date(meses // 12, meses % 12 + 1, 1), fin
+
+
+def _rates_numpy(objetivos, actuales, aportados, ahorro_neto):
+    objetivo = np.asarray(objetivos, dtype=float)
+    actual = np.asarray(actuales, dtype=float)
+    restante = np.maximum(objetivo - actual, 0.0)
+    propio = np.asarray(aportados, dtype=float) / VENTANA_DIAS * DIAS_MES
+    con_ritmo = propio > 0
+    sin_ritmo = ~con_ritmo & (restante > 0)
+    libre = max(ahorro_neto - propio[con_ritmo].sum(), 0.0)
+    total_sin = restante[sin_ritmo].sum()
+    reparto = np.where(sin_ritmo, restante / total_sin if total_sin > 0 else 0.0, 0.0) * libre
+    ritmo = np.where(con_ritmo, propio, reparto)
+    meses = np.divide(restante, ritmo, out=np.full_like(restante, np.inf), where=ritmo > 0)
+    meses[restante <= 0] = 0.0
+    progreso = np.clip(np.divide(actual, objetivo, out=np.ones_like(actual), where=objetivo > 0), 0.0, 1.0)
+    return restante.tolist(), ritmo.tolist(), con_ritmo.tolist(), meses.tolist(), progreso.tolist()
+
+
+def _rates_python(objetivos, actuales, aportados, ahorro_neto):
+    restante = [max(o - a, 0.0) for o, a in zip(objetivos, actuales)]
+    propio = [x / VENTANA_DIAS * DIAS_MES for x in aportados]
+    con_ritmo = [p > 0 for p in propio]
+    libre = max(ahorro_neto - sum(p for p, c in zip(propio, con_ritmo) if c), 0.0)
+    total_sin = sum(r for r, c in zip(restante, con_ritmo) if not c and r > 0)
+    ritmo = [
+        p if c else (r / total_sin * libre if total_sin > 0 and r > 0 else 0.0)
+        for p, c, r in zip(propio, con_ritmo, restante)
+    ]
+    meses = [0.0 if r <= 0 else (r / v if v > 0 else math.inf) for r, v in zip(restante, ritmo)]
+    progreso = [min(max(a / o, 0.0), 1.0) if o > 0 else 1.0 for o, a in zip(objetivos, actuales)]
+    return restante, ritmo, con_ritmo, meses, progreso
+
+
+def compute(metas, ahorro_neto, hoy=None):
+    """
+    metas: lista de dicts con monto_objetivo, monto_actual, aportado
+    (suma de aportes en la ventana) y fecha_objetivo (date o None).
+    Devuelve una lista paralela con el progreso de cada meta.
+    """
+    if not metas:
+        return []
+    hoy = hoy or date.today()
+    calcular = _rates_numpy if np is not None else _rates_python
+    restante, ritmo, con_ritmo, meses, progreso = calcular(
+        [m["monto_objetivo"] for m in metas],
+        [m["monto_actual"] for m in metas],
+        [m["aportado"] for m in metas],
+        ahorro_neto,
+    )
+
+    resultado = []
+    for i, meta in enumerate(metas):
+        estimada = None
+        if meses[i] <= MAX_MESES:
+            estimada = hoy + timedelta(days=math.ceil(meses[i] * DIAS_MES))
+        fecha_objetivo = meta.get("fecha_objetivo")
+        requerido = None
+        if restante[i] <= 0:
+            estado = 'completada'
+        elif fecha_objetivo is not None:
+            meses_disponibles = (fecha_objetivo - hoy).days / DIAS_MES
+            requerido = restante[i] / meses_disponibles if meses_disponibles > 0 else None
+            estado = 'a_tiempo' if estimada is not None and estimada <= fecha_objetivo else 'atrasada'
+        elif ritmo[i] <= 0:
+            estado = 'estancada'
+        else:
+            estado = 'en_progreso'
+        resultado.append({
+            "progreso": round(progreso[i], 4),
+            "restante": round(restante[i], 2),
+            "ritmo_mensual": round(ritmo[i], 2),
+            "fuente_ritmo": 'aportes' if con_ritmo[i] else 'ahorro_neto',
+            "fecha_estimada": estimada.isoformat() if estimada else None,
+            "ritmo_requerido": round(requerido, 2) if requerido is not None else None,
+            "estado": estado,
+        })
+    return resultado
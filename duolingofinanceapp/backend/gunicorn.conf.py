@@ -0,0 +1,68 @@
+"""
+Configuración de gunicorn para producción:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Workers pre-fork con hilos (gthread): los hilos cubren la espera de MySQL y
+de la IA, y los procesos usan varios núcleos. Sin preload_app: cada worker
+importa wsgi.py por su cuenta y create_app() le crea sus propios pools y
+cliente de la IA (nada abierto se comparte a través del fork) y los
+precalienta antes de aceptar tráfico.
+
+Recarga sin cortar peticiones: `kill -HUP $(cat gunicorn.pid)` arranca
+workers nuevos con el código actual y apaga los viejos cuando terminan lo
+que están atendiendo (hasta GUNICORN_GRACEFUL_TIMEOUT). Para cambiar también
+la versión de gunicorn o de Python: USR2 y luego TERM al master anterior.
+
+    BIND / PORT                 dirección de escucha (default 0.0.0.0:$PORT, PORT=5000)
+    WEB_CONCURRENCY             workers (default 2 * núcleos + 1)
+    GUNICORN_THREADS            hilos por worker (default 8)
+    GUNICORN_TIMEOUT            segundos sin señal antes de reiniciar un worker (default 60)
+    GUNICORN_GRACEFUL_TIMEOUT   espera al apagar o recargar (default IA_TIMEOUT + 5)
+    GUNICORN_MAX_REQUESTS       peticiones antes de reciclar un worker (default 5000, 0 = nunca)
+    GUNICORN_PIDFILE            archivo con el PID del master (default gunicorn.pid)
+
+Si no están definidas, también se ajustan por worker DB_POOL_MAX (= hilos,
+una conexión por petición simultánea), PASSWORD_WORKERS (núcleos repartidos
+entre los workers, para no tener workers * núcleos procesos de bcrypt) e
+IA_REQUEST_THREADS (= hilos: la IA admite como mucho hilos menos
+IA_RESERVED_THREADS llamadas, ver ia_executor.py).
+"""
+import os
+
+nucleos = os.cpu_count() or 1
+
+bind = os.getenv('BIND') or f"0.0.0.0:{os.getenv('PORT', 5000)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 0)) or 2 * nucleos + 1
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 0)) or int(float(os.getenv('IA_TIMEOUT', 30))) + 5
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+preload_app = False
+pidfile = os.getenv('GUNICORN_PIDFILE', 'gunicorn.pid')
+accesslog = '-'
+
+# Los workers heredan el entorno del master
+os.environ.setdefault('DB_POOL_MAX', str(threads))
+os.environ.setdefault('PASSWORD_WORKERS', str(max(1, nucleos // workers)))
+os.environ.setdefault('IA_REQUEST_THREADS', str(threads))
+
+
+def when_ready(server):
+    server.log.info(
+        f"Listo: {workers} workers x {threads} hilos en {bind} "
+        f"(DB_POOL_MAX={os.environ['DB_POOL_MAX']}, PASSWORD_WORKERS={os.environ['PASSWORD_WORKERS']})"
+    )
+
+
+def post_worker_init(worker):
+    worker.log.info(f"Worker {worker.pid} precalentado")
+
+
+def worker_abort(worker):
+    worker.log.warning(f"Worker {worker.pid} excedió GUNICORN_TIMEOUT y se reinicia")
@@ -0,0 +1,191 @@
+"""
+Caché de respuestas de la mascota.
+
+La llave combina un hash del contexto financiero ya renderizado y de la
+pregunta normalizada ("¿Cómo ahorro más?" == "como ahorro mas"), así que
+dos preguntas equivalentes con el mismo contexto reutilizan la respuesta
+de Gemini. La llave incluye además la data_version del usuario: cualquier
+escritura de movimientos o metas la incrementa en la base y deja
+inalcanzables sus entradas en todos los workers, sin avisarles.
+
+Configuración:
+    IA_CACHE_BACKEND      memory (default) | redis | none
+    IA_CACHE_TTL          segundos de vida de una respuesta (default 600)
+    IA_CACHE_MAX_ENTRIES  entradas máximas en memoria, LRU (default 1024)
+    IA_CACHE_REDIS_URL    servidor compatible con Redis (default redis://localhost:6379/0)
+
+El backend en memoria es por proceso (cada worker calienta el suyo); el
+backend redis comparte las respuestas entre workers.
+"""
+from collections import OrderedDict
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+
+
+def normalize_prompt(prompt):
+    """Minúsculas, sin acentos, sin signos de puntuación y espacios colapsados."""
+    texto = unicodedata.normalize('NFKD', prompt.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r'[^\w\s]', ' ', texto)
+    return ' '.join(texto.split())
+
+
+class MemoryBackend:
+    """LRU con TTL en memoria del proceso."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._datos = OrderedDict()  # llave -> (expira, valor)
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, llave):
+        with self._lock:
+            entrada = self._datos.get(llave)
+            if entrada is None:
+                return None
+            expira, valor = entrada
+            if expira < time.monotonic():
+                del self._datos[llave]
+                return None
+            self._datos.move_to_end(llave)
+            return valor
+
+    def set(self, llave, valor, ttl):
+        with self._lock:
+            self._datos[llave] = (time.monotonic() + ttl, valor)
+            self._datos.move_to_end(llave)
+            while len(self._datos) > self.max_entries:
+                self._datos.popitem(last=False)
+                self.evictions += 1
+
+
+class RedisBackend:
+    """Cualquier servidor que hable el protocolo de Redis (Redis, Valkey, KeyDB...)."""
+
+    def __init__(self, url):
+        import redis  # dependencia opcional, solo si se elige este backend
+        self._redis = redis.Redis.from_url(url)
+        self.evictions = 0  # la política LRU la aplica el servidor (maxmemory-policy)
+
+    def get(self, llave):
+        valor = self._redis.get(llave)
+        return valor.decode('utf-8') if valor is not None else None
+
+    def set(self, llave, valor, ttl):
+        self._redis.set(llave, valor.encode('utf-8'), ex=int(ttl))
+
+
+class AdviceCache:
+    def __init__(self, backend, ttl):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "sets": 0}
+
+    def _count(self, nombre):
+        with self._lock:
+            self._metrics[nombre] += 1
+
+    def key(self, id_user, version, financial_context, user_prompt):
+        """'version' es la data_version del usuario con la que se armó el contexto."""
+        huella = hashlib.sha256(
+            f"{financial_context}\x00{normalize_prompt(user_prompt)}".encode('utf-8')
+        ).hexdigest()
+        return f"ia:{int(id_user)}:{version}:{huella}"
+
+    def get(self, llave):
+        valor = self.backend.get(llave)
+        self._count("hits" if valor is not None else "misses")
+        return valor
+
+    def set(self, llave, valor):
+        self.backend.set(llave, valor, self.ttl)
+        self._count("sets")
+
+    def stats(self):
+        with self._lock:
+            datos = dict(self._metrics)
+        datos["evictions"] = self.backend.evictions
+        consultas = datos["hits"] + datos["misses"]
+        datos["hit_ratio"] = datos["hits"] / consultas if consultas else 0.0
+        return datos
+
+
+class UserMemo:
+    """
+    Memoización corta por usuario (por ejemplo del contexto financiero durante
+    una ráfaga de chat). Cada entrada guarda la versión con la que se calculó
+    (data_version del usuario, más lo que haga falta) y solo se devuelve si
+    coincide con la actual: una escritura atendida por otro worker cambia la
+    versión en la base, así que ningún proceso sirve datos viejos. invalidate()
+    además libera la entrada en el proceso que hizo la escritura.
+    """
+
+    def __init__(self, ttl, max_entries=4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._datos = OrderedDict()  # id_user -> (expira, version, valor)
+        self._lock = threading.Lock()
+        self._metrics = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, id_user, version=None):
+        with self._lock:
+            entrada = self._datos.get(id_user)
+            if entrada is not None and entrada[0] >= time.monotonic() and entrada[1] == version:
+                self._datos.move_to_end(id_user)
+                self._metrics["hits"] += 1
+                return entrada[2]
+            self._datos.pop(id_user, None)
+            self._metrics["misses"] += 1
+            return None
+
+    def set(self, id_user, valor, version=None):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._datos[id_user] = (time.monotonic() + self.ttl, version, valor)
+            self._datos.move_to_end(id_user)
+            while len(self._datos) > self.max_entries:
+                self._datos.popitem(last=False)
+
+    def invalidate(self, id_user):
+        with self._lock:
+            self._datos.pop(id_user, None)
+            self._metrics["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._metrics, entries=len(self._datos))
+
+
+class NullCache:
+    """Caché deshabilitada (IA_CACHE_BACKEND=none)."""
+
+    def key(self, id_user, version, financial_context, user_prompt):
+        return None
+
+    def get(self, llave):
+        return None
+
+    def set(self, llave, valor):
+        pass
+
+    def stats(self):
+        return {"enabled": False}
+
+
+def cache_from_env():
+    tipo = os.getenv('IA_CACHE_BACKEND', 'memory')
+    if tipo == 'none':
+        return NullCache()
+    ttl = float(os.getenv('IA_CACHE_TTL', 600))
+    if tipo == 'redis':
+        backend = RedisBackend(os.getenv('IA_CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    else:
+        backend = MemoryBackend(int(os.getenv('IA_CACHE_MAX_ENTRIES', 1024)))
+    return AdviceCache(backend, ttl)
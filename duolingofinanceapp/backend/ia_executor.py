@@ -0,0 +1,182 @@
+"""
+Ejecutor acotado para las llamadas a Gemini.
+
+Las llamadas a la IA tardan segundos; si corrieran libremente en los hilos
+de Flask, unos cuantos chats simultáneos dejarían sin hilos a los endpoints
+de movimientos y metas. Aquí las llamadas corren en un pool propio con:
+
+    IA_MAX_CONCURRENCY   llamadas simultáneas a Gemini (default 4)
+    IA_MAX_QUEUE         llamadas esperando turno antes de rechazar (default 8)
+    IA_TIMEOUT           segundos máximos por llamada (default 30)
+    IA_REQUEST_THREADS   hilos que atienden peticiones en el proceso (gunicorn.conf.py
+                         lo define; sin él no se acota por hilos)
+    IA_RESERVED_THREADS  hilos que la IA nunca ocupa (default max(2, hilos // 4))
+
+Cuando la cola está llena se lanza IAQueueFull de inmediato (el endpoint
+responde 429 + Retry-After) en lugar de bloquear otro hilo del servidor.
+El endpoint espera la respuesta en su propio hilo, así que cada llamada
+admitida (en ejecución o en cola) ocupa un hilo de petición: con
+IA_REQUEST_THREADS, concurrencia + cola se recortan a hilos - reservados
+para que movimientos y metas siempre tengan hilos libres.
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import math
+import os
+import queue
+import threading
+import time
+
+_FIN = object()
+
+
+class IAQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Cola de IA llena, reintenta en {retry_after}s")
+        self.retry_after = retry_after
+
+
+class IATimeout(Exception):
+    """La llamada a la IA excedió IA_TIMEOUT."""
+
+
+class BoundedExecutor:
+    def __init__(self, max_concurrency, max_queue, timeout):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='ia')
+        # Un permiso por llamada en ejecución o en cola
+        self._slots = threading.BoundedSemaphore(max_concurrency + max_queue)
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._latencia_promedio = 1.0
+        self._metrics = {"submitted": 0, "rejected": 0, "timeouts": 0, "errors": 0}
+
+    def _retry_after(self):
+        # Estimación: lo que tarda en vaciarse la cola al ritmo actual
+        with self._lock:
+            rondas = max(self._pendientes, 1) / self.max_concurrency
+            return max(1, math.ceil(rondas * self._latencia_promedio))
+
+    def _done(self, inicio, future):
+        duracion = time.monotonic() - inicio
+        with self._lock:
+            self._pendientes -= 1
+            # Media móvil exponencial de la latencia para estimar Retry-After
+            self._latencia_promedio = 0.8 * self._latencia_promedio + 0.2 * duracion
+            if future.exception() is not None:
+                self._metrics["errors"] += 1
+        self._slots.release()
+
+    def submit(self, fn, *args, **kwargs):
+        """Encola la llamada y devuelve su Future (IAQueueFull si no hay lugar)."""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._metrics["rejected"] += 1
+            raise IAQueueFull(self._retry_after())
+        inicio = time.monotonic()
+        with self._lock:
+            self._pendientes += 1
+            self._metrics["submitted"] += 1
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._pendientes -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._done(inicio, f))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # El permiso se libera cuando la llamada termine de verdad
+            future.cancel()
+            with self._lock:
+                self._metrics["timeouts"] += 1
+            raise IATimeout(f"La IA no respondió en {self.timeout}s")
+
+    def stream(self, fn, *args, **kwargs):
+        """
+        Igual que run() pero para funciones que devuelven un iterador (por
+        ejemplo generate_content_stream). La admisión ocurre al llamar, así que
+        IAQueueFull se lanza antes de empezar a responder; después devuelve un
+        generador con los fragmentos según van llegando. IA_TIMEOUT aplica al
+        tiempo máximo de espera entre fragmentos.
+        """
+        fragmentos = queue.Queue()
+        cancelado = threading.Event()
+
+        def producir():
+            try:
+                for fragmento in fn(*args, **kwargs):
+                    if cancelado.is_set():
+                        break
+                    fragmentos.put(fragmento)
+            except Exception as e:
+                fragmentos.put(e)
+                raise
+            finally:
+                fragmentos.put(_FIN)
+
+        self.submit(producir)
+
+        def consumir():
+            try:
+                while True:
+                    try:
+                        fragmento = fragmentos.get(timeout=self.timeout)
+                    except queue.Empty:
+                        with self._lock:
+                            self._metrics["timeouts"] += 1
+                        raise IATimeout(f"La IA no envió datos en {self.timeout}s")
+                    if fragmento is _FIN:
+                        return
+                    if isinstance(fragmento, Exception):
+                        raise fragmento
+                    yield fragmento
+            finally:
+                # Si el cliente se desconecta, el productor deja de iterar
+                cancelado.set()
+
+        return consumir()
+
+    def stats(self):
+        with self._lock:
+            datos = dict(self._metrics)
+            datos.update({
+                "pending": self._pendientes,
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "avg_latency_seconds": self._latencia_promedio,
+            })
+        return datos
+
+
+def admission_limits(concurrencia, cola, hilos, reservados=None):
+    """(concurrencia, cola) que caben en hilos - reservados; hilos=0 no acota."""
+    if not hilos:
+        return concurrencia, cola
+    if reservados is None:
+        reservados = max(2, hilos // 4)
+    admitidas = max(1, hilos - reservados)
+    concurrencia = max(1, min(concurrencia, admitidas))
+    return concurrencia, max(0, min(cola, admitidas - concurrencia))
+
+
+def executor_from_env():
+    reservados = os.getenv('IA_RESERVED_THREADS')
+    concurrencia, cola = admission_limits(
+        int(os.getenv('IA_MAX_CONCURRENCY', 4)),
+        int(os.getenv('IA_MAX_QUEUE', 8)),
+        int(os.getenv('IA_REQUEST_THREADS', 0)),
+        int(reservados) if reservados else None,
+    )
+    return BoundedExecutor(
+        max_concurrency=concurrencia,
+        max_queue=cola,
+        timeout=float(os.getenv('IA_TIMEOUT', 30)),
+    )
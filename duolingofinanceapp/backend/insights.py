@@ -0,0 +1,375 @@
+"""
+Insights de Finny precalculados fuera del camino de las peticiones.
+
+Un proceso aparte revisa periódicamente a los usuarios, encola trabajos en
+la tabla ia_jobs (migrations/0007_ia_insights.sql) y los resuelve con
+Gemini en lotes; la app solo lee los resultados de ia_insights con
+GET /ia/insights/<id_user>. Hay dos tipos de trabajo:
+
+  - digest: resumen semanal para cada usuario con movimientos en los
+    últimos 7 días.
+  - alerta: una categoría cuyo gasto de los últimos 7 días supera
+    INSIGHTS_ALERT_RATIO veces su promedio semanal de las 4 semanas previas.
+
+Cada trabajo tiene una llave única por (tipo, usuario, semana ISO[, categoría]),
+así que volver a escanear no duplica nada. Un trabajo que falla se
+reintenta con espera exponencial hasta INSIGHTS_MAX_ATTEMPTS intentos y
+luego queda 'fallido'; uno que se queda 'en_proceso' más de LEASE_SECONDS
+(worker caído) vuelve a la cola. Se pueden correr varios workers sobre la
+misma tabla (SELECT ... FOR UPDATE SKIP LOCKED, MySQL 8), pero la cuota por
+minuto es por proceso: repártela entre ellos.
+
+    INSIGHTS_PER_MINUTE      llamadas a Gemini por minuto (default 10)
+    INSIGHTS_BATCH           trabajos reclamados por ciclo (default 8)
+    INSIGHTS_CONCURRENCY     llamadas simultáneas dentro de un lote (default 2)
+    INSIGHTS_MAX_ATTEMPTS    intentos antes de marcar un trabajo fallido (default 5)
+    INSIGHTS_POLL_SECONDS    espera cuando no hay trabajos (default 15)
+    INSIGHTS_SCAN_SECONDS    cada cuánto se escanean los usuarios (default 3600)
+    INSIGHTS_ALERT_RATIO     gasto semanal / promedio para alertar (default 1.5)
+    INSIGHTS_ALERT_MIN       gasto semanal mínimo para alertar (default 500)
+    INSIGHTS_RETENTION_DAYS  días que se conservan insights y trabajos terminados (default 90)
+
+Uso por línea de comandos:
+    python insights.py worker     # escanea y procesa en ciclo continuo
+    python insights.py scan       # solo encola (por ejemplo desde cron)
+    python insights.py run-once   # procesa lo pendiente y termina
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+from ratelimit import limiter
+
+LEASE_SECONDS = 300
+BACKOFF_SECONDS = 60  # espera antes del 2º intento; se duplica en cada fallo
+
+ALERTA_RATIO = float(os.getenv('INSIGHTS_ALERT_RATIO', 1.5))
+ALERTA_MINIMO = float(os.getenv('INSIGHTS_ALERT_MIN', 500))
+RETENCION_DIAS = int(os.getenv('INSIGHTS_RETENTION_DAYS', 90))
+
+DIGEST_TITULO = "Tu resumen semanal"
+DIGEST_PREGUNTA = (
+    "Escribe mi resumen semanal: cómo me fue estos días, qué categoría debo "
+    "vigilar y un reto pequeño para la próxima semana. Máximo 120 palabras."
+)
+ALERTA_TITULO = "Gasto alto en {categoria}"
+ALERTA_PREGUNTA = (
+    "Mi gasto en {categoria} de los últimos 7 días es {veces:.1f} veces mi "
+    "promedio semanal. Avísame de forma amable y dame un consejo concreto "
+    "para corregirlo. Máximo 80 palabras."
+)
+
+_ALERTAS_SQL = """
+SELECT user_id, categoria, gasto, promedio FROM (
+    SELECT user_id, categoria,
+           SUM(CASE WHEN fecha >= %s THEN monto ELSE 0 END) AS gasto,
+           SUM(CASE WHEN fecha < %s THEN monto ELSE 0 END) / 4 AS promedio
+    FROM movimientos
+    WHERE tipo='Egreso' AND fecha >= %s
+    GROUP BY user_id, categoria
+) t
+WHERE gasto >= %s AND promedio > 0 AND gasto > promedio * %s
+"""
+
+
+def iso_week(fecha):
+    anio, semana, _ = fecha.isocalendar()
+    return f"{anio}-W{semana:02d}"
+
+
+def dedup_key(*partes):
+    return hashlib.sha1(':'.join(map(str, partes)).encode('utf-8')).hexdigest()
+
+
+# ===========================
+# ENCOLAR
+# ===========================
+def scan(conn, ahora=None):
+    """
+    Encola los digest de la semana y las alertas de gasto. Los trabajos que
+    ya existen se ignoran por su llave única. Devuelve cuántos se crearon.
+    """
+    ahora = ahora or datetime.now()
+    semana = iso_week(ahora)
+    inicio = ahora - timedelta(days=7)
+    cur = conn.cursor()
+
+    cur.execute("SELECT DISTINCT user_id FROM movimientos WHERE fecha >= %s", (inicio,))
+    trabajos = [(uid, 'digest', dedup_key('digest', uid, semana), None) for (uid,) in cur.fetchall()]
+
+    cur.execute(_ALERTAS_SQL, (inicio, inicio, inicio - timedelta(weeks=4), ALERTA_MINIMO, ALERTA_RATIO))
+    for uid, categoria, gasto, promedio in cur.fetchall():
+        payload = {"categoria": categoria, "gasto": float(gasto), "promedio": float(promedio)}
+        trabajos.append((uid, 'alerta', dedup_key('alerta', uid, semana, categoria), json.dumps(payload)))
+
+    nuevos = 0
+    if trabajos:
+        cur.executemany(
+            "INSERT IGNORE INTO ia_jobs (user_id, tipo, llave_dedup, payload) VALUES (%s, %s, %s, %s)",
+            trabajos
+        )
+        nuevos = cur.rowcount
+
+    # Limpieza: las llaves de dedup son por semana, borrar lo viejo no re-encola nada
+    limite = ahora - timedelta(days=RETENCION_DIAS)
+    cur.execute("DELETE FROM ia_insights WHERE creado < %s", (limite,))
+    cur.execute(
+        "DELETE FROM ia_jobs WHERE estado IN ('listo', 'fallido') AND actualizado < %s",
+        (limite,)
+    )
+    conn.commit()
+    cur.close()
+    return nuevos
+
+
+# ===========================
+# PROCESAR
+# ===========================
+def claim(conn, n):
+    """Reclama hasta n trabajos disponibles y los marca en_proceso."""
+    cur = conn.cursor()
+    try:
+        # Trabajos de un worker que murió sin terminarlos
+        cur.execute(
+            "UPDATE ia_jobs SET estado='pendiente' WHERE estado='en_proceso' AND bloqueado_hasta < NOW()"
+        )
+        cur.execute(
+            """
+            SELECT j.id_job, j.user_id, j.tipo, j.payload, j.intentos,
+                   u.username, u.meta_actual, u.perfil_riesgo
+            FROM ia_jobs j JOIN users u ON u.id_user = j.user_id
+            WHERE j.estado='pendiente' AND j.disponible_en <= NOW()
+            ORDER BY j.disponible_en
+            LIMIT %s
+            FOR UPDATE OF j SKIP LOCKED
+            """,
+            (n,)
+        )
+        filas = cur.fetchall()
+        if filas:
+            ids = [f[0] for f in filas]
+            cur.execute(
+                f"UPDATE ia_jobs SET estado='en_proceso', intentos=intentos+1, "
+                f"bloqueado_hasta=NOW() + INTERVAL %s SECOND "
+                f"WHERE id_job IN ({', '.join(['%s'] * len(ids))})",
+                [LEASE_SECONDS] + ids
+            )
+        conn.commit()
+    finally:
+        cur.close()
+
+    return [{
+        "id_job": f[0],
+        "tipo": f[2],
+        "payload": json.loads(f[3]) if f[3] else {},
+        "intentos": f[4] + 1,
+        "usuario": {"id_user": f[1], "username": f[5], "meta_actual": f[6], "perfil_riesgo": f[7]},
+    } for f in filas]
+
+
+class InsightsWorker:
+    """
+    contexto(usuario, cur) -> texto del contexto financiero
+    prompt(username, contexto, pregunta) -> prompt completo
+    generar(prompt) -> texto de la respuesta de la IA
+    """
+
+    def __init__(self, contexto, prompt, generar, per_minute, batch, concurrency, max_attempts):
+        self.contexto = contexto
+        self.prompt = prompt
+        self.generar = generar
+        self.batch = batch
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        # Ráfaga del tamaño de un lote concurrente; después, per_minute llamadas por minuto
+        self.cuota = limiter(max(1, concurrency), per_minute)
+        self._lock = threading.Lock()
+        self.metrics = {"listos": 0, "reintentos": 0, "fallidos": 0, "espera_cuota_seconds": 0.0}
+
+    def _question(self, trabajo):
+        if trabajo["tipo"] == 'alerta':
+            p = trabajo["payload"]
+            return (
+                ALERTA_TITULO.format(categoria=p["categoria"]),
+                ALERTA_PREGUNTA.format(categoria=p["categoria"], veces=p["gasto"] / p["promedio"]),
+            )
+        return DIGEST_TITULO, DIGEST_PREGUNTA
+
+    def _generate(self, prompt):
+        # Bloquea hasta que la cuota por minuto permita otra llamada
+        while True:
+            espera = self.cuota.acquire('gemini')
+            if not espera:
+                break
+            with self._lock:
+                self.metrics["espera_cuota_seconds"] += espera
+            time.sleep(espera)
+        texto = self.generar(prompt)
+        if not texto:
+            raise ValueError("Respuesta vacía de la IA")
+        return texto
+
+    def process_batch(self, conn):
+        """Reclama un lote, genera los textos y guarda resultados. Devuelve cuántos trabajos tomó."""
+        trabajos = claim(conn, self.batch)
+        if not trabajos:
+            return 0
+
+        # El contexto se arma en este hilo (la conexión no es thread-safe);
+        # solo las llamadas a la IA van en paralelo
+        cur = conn.cursor()
+        pendientes = []
+        resultados = {}
+        for trabajo in trabajos:
+            try:
+                titulo, pregunta = self._question(trabajo)
+                usuario = trabajo["usuario"]
+                contexto = self.contexto(usuario, cur)
+                pendientes.append((trabajo, titulo, self.prompt(usuario["username"], contexto, pregunta)))
+            except Exception as e:
+                resultados[trabajo["id_job"]] = e
+        cur.close()
+        # Armar el contexto puede recalcular reglas recurrentes: se confirman
+        # antes de esperar a la IA para no retener sus bloqueos
+        conn.commit()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='insights') as pool:
+            futuros = [(t, titulo, pool.submit(self._generate, prompt)) for t, titulo, prompt in pendientes]
+            for trabajo, titulo, futuro in futuros:
+                try:
+                    resultados[trabajo["id_job"]] = (titulo, futuro.result())
+                except Exception as e:
+                    resultados[trabajo["id_job"]] = e
+
+        cur = conn.cursor()
+        try:
+            for trabajo in trabajos:
+                resultado = resultados[trabajo["id_job"]]
+                if isinstance(resultado, Exception):
+                    self._fail(cur, trabajo, resultado)
+                    conn.commit()
+                    continue
+                try:
+                    self._save(cur, trabajo, *resultado)
+                    conn.commit()
+                except Exception as e:
+                    # Un texto que la base rechaza no debe tumbar el resto del lote
+                    conn.rollback()
+                    self._fail(cur, trabajo, e)
+                    conn.commit()
+                    continue
+                with self._lock:
+                    self.metrics["listos"] += 1
+        finally:
+            cur.close()
+        return len(trabajos)
+
+    def _save(self, cur, trabajo, titulo, texto):
+        cur.execute(
+            "INSERT INTO ia_insights (user_id, id_job, tipo, titulo, contenido, datos) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            (trabajo["usuario"]["id_user"], trabajo["id_job"], trabajo["tipo"], titulo, texto,
+             json.dumps(trabajo["payload"]) if trabajo["payload"] else None)
+        )
+        cur.execute(
+            "UPDATE ia_jobs SET estado='listo', error=NULL, bloqueado_hasta=NULL WHERE id_job=%s",
+            (trabajo["id_job"],)
+        )
+
+    def _fail(self, cur, trabajo, error):
+        print(f"Error en trabajo de IA {trabajo['id_job']} ({trabajo['tipo']}): {error}")
+        if trabajo["intentos"] >= self.max_attempts:
+            cur.execute(
+                "UPDATE ia_jobs SET estado='fallido', error=%s, bloqueado_hasta=NULL WHERE id_job=%s",
+                (str(error)[:1000], trabajo["id_job"])
+            )
+            metrica = "fallidos"
+        else:
+            espera = BACKOFF_SECONDS * 2 ** (trabajo["intentos"] - 1)
+            cur.execute(
+                "UPDATE ia_jobs SET estado='pendiente', error=%s, bloqueado_hasta=NULL, "
+                "disponible_en=NOW() + INTERVAL %s SECOND WHERE id_job=%s",
+                (str(error)[:1000], espera, trabajo["id_job"])
+            )
+            metrica = "reintentos"
+        with self._lock:
+            self.metrics[metrica] += 1
+
+
+def worker_from_env(contexto, prompt, generar):
+    return InsightsWorker(
+        contexto, prompt, generar,
+        per_minute=float(os.getenv('INSIGHTS_PER_MINUTE', 10)),
+        batch=int(os.getenv('INSIGHTS_BATCH', 8)),
+        concurrency=int(os.getenv('INSIGHTS_CONCURRENCY', 2)),
+        max_attempts=int(os.getenv('INSIGHTS_MAX_ATTEMPTS', 5)),
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Worker de insights de Finny")
+    parser.add_argument('comando', choices=['worker', 'scan', 'run-once'])
+    args = parser.parse_args()
+
+    import app as servidor
+
+    app = servidor.create_app()
+
+    if args.comando == 'scan':
+        with app.app_context():
+            print(f"Trabajos encolados: {scan(servidor.mysql.connection)} ✅")
+        sys.exit(0)
+
+    # Con el stub solo si se pidió explícitamente (CI); si no, se guardarían textos genéricos
+    if app.extensions['finanzas']['llm'].offline and os.getenv('LLM_PROVIDER') != 'stub':
+        print("ERROR: GEMINI_API_KEY no está configurada; el worker no puede generar insights.")
+        sys.exit(1)
+
+    def generar(prompt):
+        # Corre en los hilos del worker, fuera del app context del ciclo
+        with app.app_context():
+            return servidor.generate_text(prompt)
+
+    worker = worker_from_env(
+        servidor.get_user_financial_context,
+        servidor.build_mascot_prompt,
+        generar,
+    )
+    poll = float(os.getenv('INSIGHTS_POLL_SECONDS', 15))
+    intervalo_scan = float(os.getenv('INSIGHTS_SCAN_SECONDS', 3600))
+    ultimo_scan = None
+
+    while True:
+        # Un app context por ciclo: la conexión vuelve al pool entre ciclos
+        with app.app_context():
+            conn = servidor.mysql.connection
+            try:
+                if args.comando == 'worker' and (ultimo_scan is None or time.monotonic() - ultimo_scan >= intervalo_scan):
+                    print(f"Trabajos encolados: {scan(conn)}")
+                    ultimo_scan = time.monotonic()
+                tomados = worker.process_batch(conn)
+            except Exception as e:
+                # Base caída o error inesperado: el worker sigue vivo. Los
+                # trabajos ya reclamados vuelven a la cola al vencer su lease
+                print(f"Error en el ciclo de insights: {e}")
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+                if args.comando == 'run-once':
+                    sys.exit(1)
+                time.sleep(poll)
+                continue
+        if tomados:
+            print(f"Lote procesado: {tomados} trabajos | {worker.metrics}")
+        elif args.comando == 'run-once':
+            print("No hay trabajos pendientes ✅")
+            break
+        else:
+            time.sleep(poll)
@@ -0,0 +1,314 @@
+"""
+Instrumentación del camino caliente: SQL, Gemini y métricas por petición.
+
+Por cada petición se acumulan en flask.g: número de consultas, tiempo en
+SQL, filas leídas, llamadas a la IA, su latencia y los tokens usados. Al
+terminar se publican como cabecera Server-Timing y se suman a las métricas
+que expone /metrics en formato de texto de Prometheus. Las respuestas en
+streaming (GET /movements, SSE) no llevan Server-Timing: sus cabeceras se
+envían antes de ejecutar el cuerpo, así que sus métricas se registran al
+cerrar la respuesta.
+
+    SLOW_QUERY_MS   umbral del log de consultas lentas (default 200)
+
+Las métricas son por proceso; con varios workers cada uno reporta las suyas.
+"""
+from collections import defaultdict
+import logging
+import os
+import threading
+import time
+
+from flask import g, has_app_context, request
+
+slow_log = logging.getLogger('duolingofinance.slow_sql')
+
+SLOW_QUERY_SECONDS = float(os.getenv('SLOW_QUERY_MS', 200)) / 1000
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class RequestStats:
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.rows = 0
+        self.llm_calls = 0
+        self.llm_seconds = 0.0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.tokens_cached = 0
+
+    def record_llm(self, duracion, usage):
+        self.llm_calls += 1
+        self.llm_seconds += duracion
+        if usage is not None:
+            self.tokens_in += getattr(usage, 'prompt_token_count', None) or 0
+            self.tokens_out += getattr(usage, 'candidates_token_count', None) or 0
+            self.tokens_cached += getattr(usage, 'cached_content_token_count', None) or 0
+
+
+def current_stats():
+    if not has_app_context():
+        return None
+    stats = g.get('_instr')
+    if stats is None:
+        stats = g._instr = RequestStats()
+    return stats
+
+
+# ---------------------------
+# Registro de métricas (formato Prometheus)
+# ---------------------------
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ayuda = {}
+        self._contadores = defaultdict(float)
+        self._histogramas = {}
+
+    def describe(self, nombre, tipo, ayuda):
+        self._ayuda[nombre] = (tipo, ayuda)
+
+    def inc(self, nombre, etiquetas=(), valor=1):
+        with self._lock:
+            self._contadores[(nombre, etiquetas)] += valor
+
+    def observe(self, nombre, etiquetas, valor):
+        with self._lock:
+            h = self._histogramas.get((nombre, etiquetas))
+            if h is None:
+                h = self._histogramas[(nombre, etiquetas)] = [[0] * len(BUCKETS), 0.0, 0]
+            for i, limite in enumerate(BUCKETS):
+                if valor <= limite:
+                    h[0][i] += 1
+            h[1] += valor
+            h[2] += 1
+
+    def render(self, gauges=()):
+        lineas = []
+        with self._lock:
+            contadores = dict(self._contadores)
+            histogramas = {k: (list(v[0]), v[1], v[2]) for k, v in self._histogramas.items()}
+        por_nombre = defaultdict(list)
+        for (nombre, etiquetas), valor in contadores.items():
+            por_nombre[nombre].append((etiquetas, valor))
+        for (nombre, etiquetas), datos in histogramas.items():
+            por_nombre[nombre].append((etiquetas, datos))
+        for nombre, etiquetas, valor in gauges:
+            por_nombre[nombre].append((etiquetas, valor))
+
+        for nombre in sorted(por_nombre):
+            tipo, ayuda = self._ayuda.get(nombre, ('gauge', nombre))
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+            for etiquetas, valor in sorted(por_nombre[nombre], key=lambda e: e[0]):
+                if tipo == 'histogram':
+                    cubetas, suma, cuenta = valor
+                    for limite, n in zip(BUCKETS, cubetas):
+                        lineas.append(f"{nombre}_bucket{_labels(etiquetas + (('le', str(limite)),))} {n}")
+                    lineas.append(f"{nombre}_bucket{_labels(etiquetas + (('le', '+Inf'),))} {cuenta}")
+                    lineas.append(f"{nombre}_sum{_labels(etiquetas)} {suma}")
+                    lineas.append(f"{nombre}_count{_labels(etiquetas)} {cuenta}")
+                else:
+                    lineas.append(f"{nombre}{_labels(etiquetas)} {valor}")
+        return '\n'.join(lineas) + '\n'
+
+
+def _labels(etiquetas):
+    if not etiquetas:
+        return ''
+    partes = []
+    for clave, valor in etiquetas:
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{clave}="{valor}"')
+    return '{' + ','.join(partes) + '}'
+
+
+registry = Registry()
+registry.describe('http_requests_total', 'counter', 'Peticiones HTTP atendidas')
+registry.describe('http_request_duration_seconds', 'histogram', 'Duración de las peticiones HTTP')
+registry.describe('sql_queries_total', 'counter', 'Consultas SQL ejecutadas')
+registry.describe('sql_rows_fetched_total', 'counter', 'Filas leídas de MySQL')
+registry.describe('sql_request_seconds', 'histogram', 'Tiempo total en SQL por petición')
+registry.describe('sql_slow_queries_total', 'counter', 'Consultas por encima de SLOW_QUERY_MS')
+registry.describe('llm_calls_total', 'counter', 'Llamadas a Gemini')
+registry.describe('llm_call_seconds', 'histogram', 'Latencia de las llamadas a Gemini')
+registry.describe('llm_tokens_total', 'counter', 'Tokens de Gemini por dirección')
+
+
+# ---------------------------
+# SQL
+# ---------------------------
+class InstrumentedCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _timed(self, fn, query, params):
+        inicio = time.perf_counter()
+        try:
+            return fn(query, params)
+        finally:
+            duracion = time.perf_counter() - inicio
+            stats = current_stats()
+            if stats is not None:
+                stats.queries += 1
+                stats.sql_seconds += duracion
+            if duracion >= SLOW_QUERY_SECONDS:
+                registry.inc('sql_slow_queries_total')
+                slow_log.warning(
+                    "Consulta lenta (%.1f ms) en %s: %s",
+                    duracion * 1000, _endpoint(), ' '.join(str(query).split())
+                )
+
+    def execute(self, query, params=None):
+        return self._timed(self._cursor.execute, query, params)
+
+    def executemany(self, query, params):
+        return self._timed(self._cursor.executemany, query, params)
+
+    def _count_rows(self, n):
+        stats = current_stats()
+        if stats is not None:
+            stats.rows += n
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is not None:
+            self._count_rows(1)
+        return fila
+
+    def fetchmany(self, size=None):
+        filas = self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+        self._count_rows(len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        self._count_rows(len(filas))
+        return filas
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class InstrumentedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args):
+        return InstrumentedCursor(self._conn.cursor(*args))
+
+    def __getattr__(self, nombre):
+        return getattr(self._conn, nombre)
+
+
+# ---------------------------
+# Gemini
+# ---------------------------
+def traced_llm(fn):
+    """
+    Envuelve client.models.generate_content para medirlo. Se llama en el hilo
+    de la petición (captura sus estadísticas) y el resultado puede ejecutarse
+    en el pool de IA.
+    """
+    stats = current_stats()
+
+    def llamar(*args, **kwargs):
+        inicio = time.perf_counter()
+        respuesta = fn(*args, **kwargs)
+        _record_llm(stats, time.perf_counter() - inicio, getattr(respuesta, 'usage_metadata', None))
+        return respuesta
+
+    return llamar
+
+
+def traced_llm_stream(fn):
+    """Igual que traced_llm para generate_content_stream (el uso llega en el último fragmento)."""
+    stats = current_stats()
+
+    def llamar(*args, **kwargs):
+        inicio = time.perf_counter()
+        usage = None
+        try:
+            for fragmento in fn(*args, **kwargs):
+                usage = getattr(fragmento, 'usage_metadata', None) or usage
+                yield fragmento
+        finally:
+            _record_llm(stats, time.perf_counter() - inicio, usage)
+
+    return llamar
+
+
+def _record_llm(stats, duracion, usage):
+    registry.inc('llm_calls_total')
+    registry.observe('llm_call_seconds', (), duracion)
+    if usage is not None:
+        registry.inc('llm_tokens_total', (('direction', 'input'),),
+                     getattr(usage, 'prompt_token_count', None) or 0)
+        registry.inc('llm_tokens_total', (('direction', 'output'),),
+                     getattr(usage, 'candidates_token_count', None) or 0)
+        # Parte de los de entrada que Gemini sirvió de su caché de contexto
+        registry.inc('llm_tokens_total', (('direction', 'cached'),),
+                     getattr(usage, 'cached_content_token_count', None) or 0)
+    if stats is not None:
+        stats.record_llm(duracion, usage)
+
+
+# ---------------------------
+# Flask
+# ---------------------------
+def _endpoint():
+    try:
+        # Sin el prefijo del blueprint ('api.login' -> 'login'): las series
+        # de /metrics conservan sus etiquetas
+        return (request.endpoint or 'desconocido').rpartition('.')[2]
+    except RuntimeError:
+        return 'fuera-de-peticion'
+
+
+def init_app(app, mysql):
+    mysql.wrap_connection = InstrumentedConnection
+
+    @app.before_request
+    def _start():
+        g._instr = RequestStats()
+
+    @app.after_request
+    def _finish(response):
+        stats = g.get('_instr')
+        if stats is None:
+            return response
+        etiquetas = (('endpoint', _endpoint()),)
+        metodo, status = request.method, str(response.status_code)
+        if response.is_streamed:
+            # Las cabeceras salen antes de que corra el generador: el SQL y la
+            # IA del cuerpo todavía no ocurrieron. Sin Server-Timing; las
+            # métricas se publican al cerrar la respuesta, ya con el cuerpo enviado
+            response.call_on_close(lambda: _publish(stats, etiquetas, metodo, status))
+            return response
+        total = _publish(stats, etiquetas, metodo, status)
+
+        partes = [f'db;dur={stats.sql_seconds * 1000:.2f};desc="{stats.queries} queries, {stats.rows} rows"']
+        espera = g.get('db_checkout_wait')
+        if espera is not None:
+            partes.append(f"db-checkout;dur={espera * 1000:.2f}")
+        if stats.llm_calls:
+            partes.append(
+                f'llm;dur={stats.llm_seconds * 1000:.2f};desc="{stats.tokens_in} in ({stats.tokens_cached} cached), {stats.tokens_out} out tokens"'
+            )
+        partes.append(f"total;dur={total * 1000:.2f}")
+        response.headers['Server-Timing'] = ', '.join(partes)
+        return response
+
+
+def _publish(stats, etiquetas, metodo, status):
+    """Suma la petición a las métricas de /metrics y devuelve su duración total."""
+    total = time.perf_counter() - stats.inicio
+    registry.inc('http_requests_total', etiquetas + (('method', metodo), ('status', status)))
+    registry.observe('http_request_duration_seconds', etiquetas, total)
+    registry.inc('sql_queries_total', etiquetas, stats.queries)
+    registry.inc('sql_rows_fetched_total', etiquetas, stats.rows)
+    registry.observe('sql_request_seconds', etiquetas, stats.sql_seconds)
+    return total
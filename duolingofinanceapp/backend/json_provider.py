@@ -0,0 +1,79 @@
+"""
+Serialización JSON rápida para Flask.
+
+Con orjson instalado, jsonify, request.get_json y app.json.dumps pasan por
+él: serializa Decimal, datetime y date sin conversiones previas en Python y
+es varias veces más rápido que el módulo json de la librería estándar
+(ver bench/serialization.py). Sin orjson se queda el proveedor de Flask.
+
+    JSON_PROVIDER   orjson (default si está instalado) | std
+
+Diferencias con el proveedor de Flask: las llaves salen en el orden del
+dict (no ordenadas) y un datetime que llegue sin convertir sale en ISO 8601
+en vez del formato HTTP. Los endpoints ya convierten sus fechas con str()
+(o en el SELECT, como GET /movements), así que las respuestas de la API no
+cambian.
+"""
+from decimal import Decimal
+import os
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Tipo no serializable a JSON: {type(obj).__name__}")
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    def _option(self):
+        opcion = orjson.OPT_NON_STR_KEYS
+        # Igual que Flask: indentado en modo debug salvo que se pida compacto
+        if self.compact is False or (self.compact is None and self._app.debug):
+            opcion |= orjson.OPT_INDENT_2
+        return opcion
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            # Opciones del módulo json (indent, sort_keys...): camino estándar
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+    def dumpb(self, obj):
+        """Como dumps pero devuelve bytes (evita decodificar para escribir la respuesta)."""
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=_default, option=self._option()),
+            mimetype=self.mimetype,
+        )
+
+
+class StdProvider(DefaultJSONProvider):
+    """El proveedor de Flask con dumpb() para que los endpoints no distingan."""
+
+    def dumpb(self, obj):
+        return self.dumps(obj).encode('utf-8')
+
+
+def init_app(app):
+    nombre = os.getenv('JSON_PROVIDER', 'orjson' if orjson is not None else 'std')
+    if nombre == 'orjson' and orjson is None:
+        print("ADVERTENCIA: JSON_PROVIDER=orjson pero orjson no está instalado; se usa json estándar.")
+        nombre = 'std'
+    app.json = OrjsonProvider(app) if nombre == 'orjson' else StdProvider(app)
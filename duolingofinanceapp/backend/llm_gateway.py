@@ -0,0 +1,506 @@
+"""
+Puerta de enlace a los modelos de lenguaje.
+
+Los endpoints de la mascota y el worker de insights piden texto aquí en vez
+de llamar directo al SDK de Gemini. Sobre una lista ordenada de proveedores
+la puerta aplica:
+
+  - Unión de peticiones idénticas en vuelo: si dos hilos piden exactamente
+    lo mismo, solo uno llama al modelo y ambos reciben la respuesta.
+  - Un circuit breaker por proveedor: tras LLM_BREAKER_FAILURES fallos
+    seguidos (o un 429 de cuota) el proveedor se salta durante
+    LLM_BREAKER_COOLDOWN segundos; después pasa una sola llamada de prueba.
+  - Una cubeta de tokens por proveedor (ratelimit.py): sin cuota disponible
+    se pasa al siguiente proveedor en lugar de esperar.
+  - Cobertura (hedging): si el primario no responde en LLM_HEDGE_AFTER_MS
+    se lanza la misma petición al modelo secundario (LLM_HEDGE_MODEL) y
+    gana el primero. Nunca se cubre con el stub: una respuesta genérica
+    ganaría siempre la carrera a Gemini.
+  - Respaldo: si un proveedor falla se prueba el siguiente; con
+    LLM_FALLBACK_STUB=1 el último es el stub local.
+
+El stub es determinista y no usa la red: sirve para CI, pruebas de carga y
+para degradar con una respuesta genérica cuando se acaba la cuota.
+
+    LLM_PROVIDER           gemini (default si hay GEMINI_API_KEY) | stub
+    LLM_MODEL              modelo primario (default gemini-2.5-flash)
+    LLM_HEDGE_MODEL        modelo secundario, vacío para no usarlo
+    LLM_HEDGE_AFTER_MS     espera antes de lanzar el secundario; 0 = solo respaldo (default 0)
+    LLM_FALLBACK_STUB      1 para responder con el stub si todo falla (default 0)
+    LLM_PER_MINUTE         llamadas por minuto al primario, 0 = sin límite (default 0)
+    LLM_HEDGE_PER_MINUTE   igual para el secundario (default 0)
+    LLM_BREAKER_FAILURES   fallos seguidos que abren el circuito (default 5)
+    LLM_BREAKER_COOLDOWN   segundos con el circuito abierto (default 30)
+    LLM_STUB_LATENCY_MS    latencia simulada del stub (default 0)
+    IA_EXPLICIT_CACHE      1 para subir la instrucción de sistema a la caché de contexto de Gemini
+    IA_PERSONA_CACHE_TTL   segundos de vida de esa caché (default 3600)
+
+Los contenidos son listas de (rol, texto) con rol 'user' o 'model'; cada
+proveedor los traduce a su formato. Las llamadas corren en el ejecutor
+acotado de ia_executor.py, así que IAQueueFull e IATimeout siguen igual.
+"""
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+import instrumentation
+from ia_executor import IAQueueFull, IATimeout
+from ratelimit import limiter
+
+
+class LLMUnavailable(Exception):
+    """Ningún proveedor puede atender ahora (circuitos abiertos o sin cuota)."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"IA no disponible, reintenta en {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Usage:
+    """Mismos nombres que usage_metadata de Gemini (los usa instrumentation.py)."""
+
+    def __init__(self, prompt_token_count=0, candidates_token_count=0, cached_content_token_count=0):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.cached_content_token_count = cached_content_token_count
+
+
+class LLMResponse:
+    def __init__(self, text, usage_metadata=None, provider=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+        self.provider = provider
+
+
+# ===========================
+# PROVEEDORES
+# ===========================
+class GeminiProvider:
+    def __init__(self, client, model, explicit_cache=False, cache_ttl=3600):
+        from google.genai import types  # solo si se usa Gemini
+
+        self._types = types
+        self.client = client
+        self.model = model
+        self.name = model
+        self.explicit_cache = explicit_cache
+        self.cache_ttl = cache_ttl
+        self._caches = {}  # hash de la instrucción -> (nombre, expira)
+        self._lock = threading.Lock()
+
+    def warm(self):
+        """Consulta los metadatos del modelo: abre la conexión HTTPS y valida la API key."""
+        self.client.models.get(model=self.model)
+
+    def _cache_name(self, system_instruction):
+        """Caché de contexto con la instrucción de sistema (la recrea al expirar), o None."""
+        llave = hashlib.sha256(system_instruction.encode('utf-8')).hexdigest()
+        with self._lock:
+            nombre, expira = self._caches.get(llave, (None, 0.0))
+            if nombre and time.monotonic() < expira:
+                return nombre
+        # Fuera del lock: una creación lenta no frena a las demás llamadas. Si
+        # dos hilos la crean a la vez queda la última; la otra expira sola
+        try:
+            cache = self.client.caches.create(
+                model=self.model,
+                config=self._types.CreateCachedContentConfig(
+                    system_instruction=system_instruction,
+                    ttl=f"{self.cache_ttl}s",
+                )
+            )
+        except Exception as e:
+            # Por ejemplo, menos tokens que el mínimo del modelo: no se reintenta
+            print(f"No se pudo crear la caché de contexto, se usa system_instruction: {e}")
+            self.explicit_cache = False
+            return None
+        with self._lock:
+            # Se renueva un minuto antes de que Gemini la borre
+            self._caches[llave] = (cache.name, time.monotonic() + self.cache_ttl - 60)
+        return cache.name
+
+    def _request(self, system_instruction, contents):
+        config = None
+        if system_instruction:
+            nombre = self._cache_name(system_instruction) if self.explicit_cache else None
+            if nombre:
+                config = self._types.GenerateContentConfig(cached_content=nombre)
+            else:
+                config = self._types.GenerateContentConfig(system_instruction=system_instruction)
+        return {
+            "model": self.model,
+            "contents": [
+                self._types.Content(role=rol, parts=[self._types.Part(text=texto)])
+                for rol, texto in contents
+            ],
+            "config": config,
+        }
+
+    def generate(self, system_instruction, contents):
+        respuesta = self.client.models.generate_content(**self._request(system_instruction, contents))
+        return LLMResponse(respuesta.text, respuesta.usage_metadata, self.name)
+
+    def stream(self, system_instruction, contents):
+        return self.client.models.generate_content_stream(**self._request(system_instruction, contents))
+
+
+STUB_CONSEJOS = (
+    "Separa un poquito de cada ingreso antes de gastar: ¡págate a ti primero! 💰",
+    "Revisa tus gastos hormiga de la semana; sumados pueden sorprenderte. 🐜",
+    "Ponle fecha y monto a tu meta: así es más fácil avanzar cada mes. 📈",
+    "Antes de una compra grande, espera 24 horas y decide con calma. ✨",
+)
+
+
+class StubProvider:
+    """Respuestas fijas elegidas por hash de la pregunta; sin red."""
+
+    name = 'stub'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def _answer(self, system_instruction, contents):
+        pregunta = contents[-1][1] if contents else ''
+        indice = int(hashlib.sha256(pregunta.encode('utf-8')).hexdigest(), 16) % len(STUB_CONSEJOS)
+        texto = f"(Modo sin conexión) {STUB_CONSEJOS[indice]}"
+        entrada = len(system_instruction or '') + sum(len(t) for _, t in contents)
+        return texto, Usage(max(1, entrada // 4), max(1, len(texto) // 4))
+
+    def generate(self, system_instruction, contents):
+        if self.latency:
+            time.sleep(self.latency)
+        texto, usage = self._answer(system_instruction, contents)
+        return LLMResponse(texto, usage, self.name)
+
+    def stream(self, system_instruction, contents):
+        if self.latency:
+            time.sleep(self.latency)
+        texto, usage = self._answer(system_instruction, contents)
+        palabras = texto.split(' ')
+        for i, palabra in enumerate(palabras):
+            ultimo = i == len(palabras) - 1
+            yield LLMResponse(palabra + ('' if ultimo else ' '), usage if ultimo else None, self.name)
+
+
+# ===========================
+# CIRCUIT BREAKER
+# ===========================
+class CircuitBreaker:
+    def __init__(self, failures, cooldown):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.estado = 'cerrado'
+        self._fallos = 0
+        self._abierto_hasta = 0.0
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.estado == 'cerrado':
+                return True
+            if self.estado == 'abierto' and time.monotonic() >= self._abierto_hasta:
+                self.estado = 'medio_abierto'
+            if self.estado == 'medio_abierto' and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+            return False
+
+    def cancel_trial(self):
+        """Devuelve el permiso de prueba si al final no se hizo la llamada."""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def success(self):
+        with self._lock:
+            self.estado = 'cerrado'
+            self._fallos = 0
+            self._prueba_en_curso = False
+
+    def failure(self, abrir=False):
+        with self._lock:
+            self._fallos += 1
+            self._prueba_en_curso = False
+            if abrir or self.estado == 'medio_abierto' or self._fallos >= self.failures:
+                self.estado = 'abierto'
+                self._abierto_hasta = time.monotonic() + self.cooldown
+
+    def retry_after(self):
+        with self._lock:
+            return max(1, math.ceil(self._abierto_hasta - time.monotonic()))
+
+    def is_open(self):
+        """Abierto y sin permiso de prueba todavía (no cambia el estado)."""
+        with self._lock:
+            return self.estado == 'abierto' and time.monotonic() < self._abierto_hasta
+
+
+def _is_quota_error(error):
+    return getattr(error, 'code', None) == 429
+
+
+# ===========================
+# PUERTA DE ENLACE
+# ===========================
+class _Ruta:
+    def __init__(self, provider, cuota, breaker):
+        self.provider = provider
+        self.cuota = cuota
+        self.breaker = breaker
+        self.metrics = {"calls": 0, "errors": 0, "rate_limited": 0, "circuit_open": 0}
+
+
+class LLMGateway:
+    def __init__(self, rutas, executor, hedge_after=0.0, cobertura=None):
+        """cobertura: ruta del modelo secundario a la que se lanza la cobertura (o None)."""
+        self.rutas = rutas
+        self.executor = executor
+        self.hedge_after = hedge_after
+        if cobertura is not None and isinstance(cobertura.provider, StubProvider):
+            cobertura = None
+        self.cobertura = cobertura if hedge_after else None
+        self.offline = all(isinstance(r.provider, StubProvider) for r in rutas)
+        self._en_vuelo = {}
+        self._lock = threading.Lock()
+        self._metrics = {"coalesced": 0, "hedges": 0, "hedge_wins": 0, "fallbacks": 0, "unavailable": 0}
+
+    def _inc(self, metricas, nombre):
+        with self._lock:
+            metricas[nombre] += 1
+
+    def _admit(self, ruta):
+        """¿Se le puede mandar una llamada ahora? (circuito y cuota)"""
+        if not ruta.breaker.allow():
+            self._inc(ruta.metrics, "circuit_open")
+            return False
+        if ruta.cuota.acquire('llm'):
+            ruta.breaker.cancel_trial()
+            self._inc(ruta.metrics, "rate_limited")
+            return False
+        self._inc(ruta.metrics, "calls")
+        return True
+
+    def _record(self, ruta, futuro):
+        error = futuro.exception()
+        if error is None:
+            ruta.breaker.success()
+        else:
+            self._inc(ruta.metrics, "errors")
+            ruta.breaker.failure(abrir=_is_quota_error(error))
+
+    def _submit(self, ruta, system_instruction, contents):
+        try:
+            futuro = self.executor.submit(
+                instrumentation.traced_llm(ruta.provider.generate), system_instruction, contents
+            )
+        except IAQueueFull:
+            # Saturación local: no llegó al proveedor, no cuenta como fallo suyo
+            ruta.breaker.cancel_trial()
+            raise
+        futuro.add_done_callback(lambda f: self._record(ruta, f))
+        return futuro
+
+    def _retry_after(self):
+        return min((r.breaker.retry_after() for r in self.rutas if r.breaker.estado != 'cerrado'), default=1)
+
+    def generate(self, system_instruction, contents):
+        """Devuelve un LLMResponse. Las peticiones idénticas en vuelo comparten la llamada."""
+        llave = hashlib.sha256(
+            json.dumps([system_instruction, contents], ensure_ascii=False).encode('utf-8')
+        ).hexdigest()
+        with self._lock:
+            compartido = self._en_vuelo.get(llave)
+            if compartido is None:
+                compartido = self._en_vuelo[llave] = Future()
+                lider = True
+            else:
+                self._metrics["coalesced"] += 1
+                lider = False
+        if not lider:
+            try:
+                return compartido.result(timeout=self.executor.timeout)
+            except TimeoutError:
+                raise IATimeout(f"La IA no respondió en {self.executor.timeout}s")
+        try:
+            resultado = self._generate(system_instruction, contents)
+        except BaseException as e:
+            compartido.set_exception(e)
+            raise
+        else:
+            compartido.set_result(resultado)
+            return resultado
+        finally:
+            with self._lock:
+                self._en_vuelo.pop(llave, None)
+
+    def _generate(self, system_instruction, contents):
+        limite = time.monotonic() + self.executor.timeout
+        ultimo_error = None
+        probadas = set()
+        for i, ruta in enumerate(self.rutas):
+            if id(ruta) in probadas or not self._admit(ruta):
+                continue
+            if ultimo_error is not None:
+                self._inc(self._metrics, "fallbacks")
+            futuros = {self._submit(ruta, system_instruction, contents): ruta}
+            # Solo el primario se cubre, y solo con el modelo secundario configurado
+            cobertura = self.cobertura if i == 0 and ruta is not self.cobertura else None
+            try:
+                return self._wait(futuros, cobertura, system_instruction, contents, limite, probadas)
+            except IATimeout:
+                raise
+            except Exception as e:
+                ultimo_error = e
+                print(f"Falló el proveedor de IA {ruta.provider.name}: {e}")
+        if ultimo_error is not None:
+            raise ultimo_error
+        self._inc(self._metrics, "unavailable")
+        raise LLMUnavailable(self._retry_after())
+
+    def _wait(self, futuros, cobertura, system_instruction, contents, limite, probadas):
+        """Espera al primer éxito entre el primario y (si se lanza) la cobertura."""
+        probadas.update(id(r) for r in futuros.values())
+        espera = self.hedge_after if cobertura is not None else None
+        ultimo_error = None
+        while futuros:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                raise IATimeout(f"La IA no respondió en {self.executor.timeout}s")
+            listos, _ = wait(list(futuros), timeout=min(espera, restante) if espera else restante,
+                             return_when=FIRST_COMPLETED)
+            if not listos:
+                if espera and cobertura is not None and self._admit(cobertura):
+                    self._inc(self._metrics, "hedges")
+                    futuros[self._submit(cobertura, system_instruction, contents)] = cobertura
+                    probadas.add(id(cobertura))
+                espera = None
+                continue
+            for futuro in listos:
+                ruta = futuros.pop(futuro)
+                if futuro.exception() is None:
+                    if ruta is cobertura:
+                        self._inc(self._metrics, "hedge_wins")
+                    return futuro.result()
+                ultimo_error = futuro.exception()
+        raise ultimo_error
+
+    def stream(self, system_instruction, contents):
+        """
+        Iterador de fragmentos (con .text y .usage_metadata) del primer
+        proveedor disponible. Los streams no se unen ni se cubren: una vez
+        empezado no se puede cambiar de proveedor.
+        """
+        for ruta in self.rutas:
+            if not self._admit(ruta):
+                continue
+            try:
+                fragmentos = self.executor.stream(
+                    instrumentation.traced_llm_stream(ruta.provider.stream), system_instruction, contents
+                )
+            except IAQueueFull:
+                # Igual que _submit: no llegó al proveedor, se devuelve el permiso de prueba
+                ruta.breaker.cancel_trial()
+                raise
+            vigilado = self._watch(ruta, fragmentos)
+            # Arranca el generador para que su finally corra aunque nadie lo lea
+            next(vigilado)
+            return vigilado
+        self._inc(self._metrics, "unavailable")
+        raise LLMUnavailable(self._retry_after())
+
+    def _watch(self, ruta, fragmentos):
+        """
+        Registra en el breaker cómo terminó el stream. Si el cliente se
+        desconecta (GeneratorExit) o el stream se descarta sin leerlo, se
+        devuelve el permiso de prueba; si no, un medio_abierto quedaría
+        rechazando al proveedor hasta reiniciar el proceso.
+        """
+        registrado = False
+        try:
+            yield
+            yield from fragmentos
+        except Exception as e:
+            registrado = True
+            self._inc(ruta.metrics, "errors")
+            ruta.breaker.failure(abrir=_is_quota_error(e))
+            raise
+        else:
+            registrado = True
+            ruta.breaker.success()
+        finally:
+            if not registrado:
+                ruta.breaker.cancel_trial()
+                fragmentos.close()
+
+    def warm(self):
+        """Prepara los proveedores que lo admiten (al arrancar un worker); un error no es fatal."""
+        for ruta in self.rutas:
+            warm = getattr(ruta.provider, 'warm', None)
+            if warm is None:
+                continue
+            try:
+                warm()
+            except Exception as e:
+                print(f"No se pudo preparar el proveedor {ruta.provider.name}: {e}")
+                ruta.breaker.failure()
+
+    def ready(self):
+        """True si algún proveedor tiene el circuito cerrado o listo para probar."""
+        return any(not ruta.breaker.is_open() for ruta in self.rutas)
+
+    def stats(self):
+        with self._lock:
+            datos = dict(self._metrics)
+            datos["providers"] = {
+                r.provider.name: dict(r.metrics, circuit=r.breaker.estado) for r in self.rutas
+            }
+        return datos
+
+
+def gateway_from_env(executor):
+    proveedor = os.getenv('LLM_PROVIDER') or ('gemini' if os.getenv('GEMINI_API_KEY') else 'stub')
+    fallos = int(os.getenv('LLM_BREAKER_FAILURES', 5))
+    enfriamiento = float(os.getenv('LLM_BREAKER_COOLDOWN', 30))
+    stub = StubProvider(latency=float(os.getenv('LLM_STUB_LATENCY_MS', 0)) / 1000)
+
+    def ruta(provider, per_minute=0.0):
+        return _Ruta(provider, limiter(max(1, int(per_minute // 6)), per_minute),
+                     CircuitBreaker(fallos, enfriamiento))
+
+    rutas = []
+    cobertura = None
+    if proveedor == 'gemini' and not os.getenv('GEMINI_API_KEY'):
+        print("ADVERTENCIA: GEMINI_API_KEY no está configurada; la mascota responde con el stub local.")
+        proveedor = 'stub'
+    if proveedor == 'gemini':
+        from google import genai
+        from google.genai import types
+
+        client = genai.Client(
+            api_key=os.getenv('GEMINI_API_KEY'),
+            # Timeout HTTP del SDK (en ms) alineado con IA_TIMEOUT
+            http_options=types.HttpOptions(timeout=int(executor.timeout * 1000))
+        )
+        explicit_cache = os.getenv('IA_EXPLICIT_CACHE', '0') == '1'
+        cache_ttl = int(os.getenv('IA_PERSONA_CACHE_TTL', 3600))
+        rutas.append(ruta(
+            GeminiProvider(client, os.getenv('LLM_MODEL', 'gemini-2.5-flash'), explicit_cache, cache_ttl),
+            float(os.getenv('LLM_PER_MINUTE', 0)),
+        ))
+        if os.getenv('LLM_HEDGE_MODEL'):
+            cobertura = ruta(
+                GeminiProvider(client, os.getenv('LLM_HEDGE_MODEL'), explicit_cache, cache_ttl),
+                float(os.getenv('LLM_HEDGE_PER_MINUTE', 0)),
+            )
+            rutas.append(cobertura)
+        if os.getenv('LLM_FALLBACK_STUB', '0') == '1':
+            rutas.append(ruta(stub))
+    else:
+        rutas.append(ruta(stub))
+    return LLMGateway(rutas, executor, hedge_after=float(os.getenv('LLM_HEDGE_AFTER_MS', 0)) / 1000,
+                      cobertura=cobertura)
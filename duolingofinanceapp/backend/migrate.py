@@ -0,0 +1,88 @@
+"""
+Aplica las migraciones SQL de migrations/ en orden de versión.
+
+Cada archivo NNNN_descripcion.sql se ejecuta una sola vez y queda
+registrado en la tabla schema_migrations. Las sentencias se separan por
+';' al final de línea (no uses ';' dentro de literales).
+
+    python migrate.py          # aplica las pendientes
+    python migrate.py status   # lista aplicadas y pendientes
+"""
+from pathlib import Path
+import re
+import sys
+
+from dotenv import load_dotenv
+
+from db_pool import connect_from_env
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / 'migrations'
+
+
+def available_migrations():
+    migraciones = []
+    for ruta in sorted(MIGRATIONS_DIR.glob('*.sql')):
+        version = int(ruta.name.split('_', 1)[0])
+        migraciones.append((version, ruta))
+    return migraciones
+
+
+def split_statements(sql):
+    sin_comentarios = re.sub(r'^\s*--.*$', '', sql, flags=re.MULTILINE)
+    return [s.strip() for s in re.split(r';\s*$', sin_comentarios, flags=re.MULTILINE) if s.strip()]
+
+
+def applied_versions(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT NOT NULL PRIMARY KEY,
+            nombre VARCHAR(255) NOT NULL,
+            aplicada_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    cur.execute("SELECT version FROM schema_migrations")
+    return {r[0] for r in cur.fetchall()}
+
+
+def migrate(conn):
+    """Aplica las migraciones pendientes. Devuelve la lista de archivos aplicados."""
+    cur = conn.cursor()
+    aplicadas = applied_versions(cur)
+    nuevas = []
+    for version, ruta in available_migrations():
+        if version in aplicadas:
+            continue
+        # MySQL hace commit implícito con cada DDL: se registra al terminar el archivo
+        for sentencia in split_statements(ruta.read_text(encoding='utf-8')):
+            cur.execute(sentencia)
+        cur.execute(
+            "INSERT INTO schema_migrations (version, nombre) VALUES (%s, %s)",
+            (version, ruta.name)
+        )
+        conn.commit()
+        nuevas.append(ruta.name)
+    cur.close()
+    return nuevas
+
+
+if __name__ == '__main__':
+    load_dotenv()
+    conn = connect_from_env()
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == 'status':
+            cur = conn.cursor()
+            aplicadas = applied_versions(cur)
+            cur.close()
+            for version, ruta in available_migrations():
+                estado = 'aplicada ✅' if version in aplicadas else 'pendiente ⏳'
+                print(f"{ruta.name}: {estado}")
+        else:
+            nuevas = migrate(conn)
+            for nombre in nuevas:
+                print(f"Migración aplicada: {nombre} ✅")
+            if not nuevas:
+                print("La base ya está al día ✅")
+    finally:
+        conn.close()
@@ -0,0 +1,46 @@
+-- Esquema base que asumía app.py desde el inicio.
+-- El orden de columnas de movimientos es el que usaba el SELECT * original.
+-- Usa IF NOT EXISTS para poder correr sobre bases creadas a mano; los
+-- índices van en 0002 para que también se agreguen a esas bases.
+
+CREATE TABLE IF NOT EXISTS users (
+    id_user INT NOT NULL AUTO_INCREMENT,
+    username VARCHAR(100) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    meta_actual VARCHAR(255) NULL,
+    perfil_riesgo VARCHAR(50) NULL,
+    PRIMARY KEY (id_user)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS movimientos (
+    id_movimiento INT NOT NULL AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    fecha DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    monto DECIMAL(12, 2) NOT NULL,
+    categoria VARCHAR(100) NOT NULL,
+    nota VARCHAR(255) NULL,
+    tipo VARCHAR(20) NOT NULL DEFAULT 'Egreso',
+    PRIMARY KEY (id_movimiento),
+    CONSTRAINT fk_mov_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS metas_ahorro (
+    id_meta INT NOT NULL AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    descripcion VARCHAR(255) NOT NULL,
+    monto_objetivo DECIMAL(12, 2) NOT NULL,
+    monto_actual DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_meta),
+    CONSTRAINT fk_ahorro_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS metas_inversion (
+    id_meta INT NOT NULL AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    descripcion VARCHAR(255) NOT NULL,
+    monto_objetivo DECIMAL(12, 2) NOT NULL,
+    monto_actual DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (id_meta),
+    CONSTRAINT fk_inversion_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
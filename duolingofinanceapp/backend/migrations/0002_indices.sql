@@ -0,0 +1,24 @@
+-- Índices compuestos / de cobertura para cada consulta caliente de app.py.
+-- MySQL descarta solo el índice implícito de cada FOREIGN KEY al existir
+-- uno que empiece por user_id.
+
+-- /login busca por email
+ALTER TABLE users ADD UNIQUE KEY uq_users_email (email);
+
+-- GET /movements: user_id + rango de fecha ordenado por fecha DESC (InnoDB
+-- agrega id_movimiento al final de todo índice secundario, así que el cursor
+-- (fecha, id_movimiento) también sale del índice). Las columnas extra cubren
+-- /movements/stats y el contexto de la IA: filtran por rango de fecha y
+-- agrupan tipo/categoría sumando monto sin leer la fila.
+ALTER TABLE movimientos ADD KEY idx_mov_user_fecha (user_id, fecha, tipo, categoria, monto);
+
+-- user_id + tipo (+ rango de fecha), agrupando por categoría y sumando monto:
+-- GET /movements?tipo=... y los agregados de egresos por categoría.
+ALTER TABLE movimientos ADD KEY idx_mov_user_tipo_fecha (user_id, tipo, fecha, categoria, monto);
+
+-- GET /movements?categoria=... ordenado por fecha.
+ALTER TABLE movimientos ADD KEY idx_mov_user_categoria_fecha (user_id, categoria, fecha);
+
+-- GET /goals/ahorro|inversion/<id_user>
+ALTER TABLE metas_ahorro ADD KEY idx_ahorro_user (user_id);
+ALTER TABLE metas_inversion ADD KEY idx_inversion_user (user_id);
@@ -0,0 +1,21 @@
+-- Resumen materializado mantenido por rollups.py (ver 'python rollups.py rebuild').
+-- Se llena aquí con el historial existente, así que /balance y
+-- /movements/summary responden bien desde el primer despliegue.
+-- La llave primaria cubre todas las lecturas: /balance, /movements/summary y
+-- la parte de meses completos del contexto de la IA filtran por user_id (+ mes).
+
+CREATE TABLE IF NOT EXISTS resumen_movimientos (
+    user_id INT NOT NULL,
+    mes DATE NOT NULL,
+    tipo VARCHAR(20) NOT NULL,
+    categoria VARCHAR(100) NOT NULL,
+    total DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    num_movimientos INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, mes, tipo, categoria)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+INSERT INTO resumen_movimientos (user_id, mes, tipo, categoria, total, num_movimientos)
+SELECT user_id, DATE_FORMAT(fecha, '%Y-%m-01') AS mes, tipo, categoria, SUM(monto), COUNT(*)
+FROM movimientos
+GROUP BY user_id, mes, tipo, categoria
+ON DUPLICATE KEY UPDATE total = VALUES(total), num_movimientos = VALUES(num_movimientos);
@@ -0,0 +1,18 @@
+-- Refresh tokens de sesión (ver auth_tokens.py). Solo se guarda el SHA-256
+-- del token. Cada login abre una 'familia'; al rotar se revoca el token usado
+-- y se emite otro en la misma familia. Reusar uno revocado revoca la familia.
+
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    id_token INT NOT NULL AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    token_hash CHAR(64) NOT NULL,
+    familia CHAR(32) NOT NULL,
+    expira DATETIME NOT NULL,
+    revocado DATETIME NULL,
+    creado DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_token),
+    UNIQUE KEY uq_refresh_hash (token_hash),
+    KEY idx_refresh_familia (familia),
+    KEY idx_refresh_user_expira (user_id, expira),
+    CONSTRAINT fk_refresh_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,6 @@
+-- Versión de los datos de cada usuario. Toda escritura de movimientos o
+-- metas la incrementa en su misma transacción; los GET la usan como ETag
+-- (ver conditional_get en app.py).
+
+ALTER TABLE users
+    ADD COLUMN data_version BIGINT UNSIGNED NOT NULL DEFAULT 0;
@@ -0,0 +1,27 @@
+-- Seguimiento de cambios para GET /sync: cada fila guarda la data_version
+-- del usuario con la que se escribió por última vez, y los borrados dejan
+-- una lápida en sync_eliminados con la versión del borrado.
+
+ALTER TABLE movimientos
+    ADD COLUMN version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    ADD KEY idx_mov_user_version (user_id, version);
+
+-- (user_id, version) también sirve para GET /goals/<tipo>/<id_user> y la FK
+ALTER TABLE metas_ahorro
+    ADD COLUMN version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    ADD KEY idx_ahorro_user_version (user_id, version),
+    DROP KEY idx_ahorro_user;
+
+ALTER TABLE metas_inversion
+    ADD COLUMN version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    ADD KEY idx_inversion_user_version (user_id, version),
+    DROP KEY idx_inversion_user;
+
+CREATE TABLE IF NOT EXISTS sync_eliminados (
+    user_id INT NOT NULL,
+    version BIGINT UNSIGNED NOT NULL,
+    entidad VARCHAR(20) NOT NULL,
+    id_entidad INT NOT NULL,
+    PRIMARY KEY (user_id, version, entidad, id_entidad),
+    CONSTRAINT fk_eliminados_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
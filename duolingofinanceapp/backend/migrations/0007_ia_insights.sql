@@ -0,0 +1,38 @@
+-- Cola persistente de trabajos de IA y resultados precalculados (ver insights.py).
+-- llave_dedup es el SHA-1 de (tipo, usuario, semana[, categoría]): encolar
+-- dos veces lo mismo no crea un segundo trabajo.
+
+CREATE TABLE IF NOT EXISTS ia_jobs (
+    id_job INT NOT NULL AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    tipo VARCHAR(20) NOT NULL,
+    llave_dedup CHAR(40) NOT NULL,
+    payload JSON NULL,
+    estado ENUM('pendiente', 'en_proceso', 'listo', 'fallido') NOT NULL DEFAULT 'pendiente',
+    intentos INT NOT NULL DEFAULT 0,
+    disponible_en DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    bloqueado_hasta DATETIME NULL,
+    error VARCHAR(1000) NULL,
+    creado DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    actualizado DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_job),
+    UNIQUE KEY uq_jobs_dedup (llave_dedup),
+    KEY idx_jobs_estado_disponible (estado, disponible_en),
+    KEY idx_jobs_user (user_id),
+    CONSTRAINT fk_jobs_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS ia_insights (
+    id_insight INT NOT NULL AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    id_job INT NULL,
+    tipo VARCHAR(20) NOT NULL,
+    titulo VARCHAR(200) NOT NULL,
+    contenido TEXT NOT NULL,
+    datos JSON NULL,
+    creado DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_insight),
+    KEY idx_insights_user_creado (user_id, creado),
+    KEY idx_insights_creado (creado),
+    CONSTRAINT fk_insights_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,16 @@
+-- Turnos de las conversaciones con la mascota (ver conversations.py).
+-- rol 'resumen' es un turno que reemplaza a los más viejos al compactar.
+
+CREATE TABLE IF NOT EXISTS ia_turnos (
+    id_turno INT NOT NULL AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    conversacion CHAR(32) NOT NULL,
+    rol ENUM('user', 'model', 'resumen') NOT NULL,
+    texto TEXT NOT NULL,
+    tokens INT NOT NULL,
+    creado DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_turno),
+    KEY idx_turnos_conversacion (user_id, conversacion, id_turno),
+    KEY idx_turnos_user_creado (user_id, creado),
+    CONSTRAINT fk_turnos_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
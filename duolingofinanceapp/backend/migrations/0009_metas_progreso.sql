@@ -0,0 +1,18 @@
+-- Progreso de metas (ver goal_progress.py): fecha objetivo opcional y el
+-- historial de cambios de monto_actual, del que sale el ritmo de aportes.
+
+ALTER TABLE metas_ahorro ADD COLUMN fecha_objetivo DATE NULL;
+
+ALTER TABLE metas_inversion ADD COLUMN fecha_objetivo DATE NULL;
+
+CREATE TABLE IF NOT EXISTS metas_aportes (
+    id_aporte INT NOT NULL AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    tipo_meta VARCHAR(20) NOT NULL,
+    id_meta INT NOT NULL,
+    delta DECIMAL(12, 2) NOT NULL,
+    fecha DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_aporte),
+    KEY idx_aportes_user_fecha (user_id, fecha, tipo_meta, id_meta, delta),
+    CONSTRAINT fk_aportes_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
@@ -0,0 +1,29 @@
+-- Movimientos recurrentes detectados (ver recurring.py) y la data_version
+-- con la que se calcularon por última vez.
+
+CREATE TABLE IF NOT EXISTS movimientos_recurrentes (
+    id_regla INT NOT NULL AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    tipo VARCHAR(20) NOT NULL,
+    categoria VARCHAR(100) NOT NULL,
+    nota VARCHAR(255) NULL,
+    monto DECIMAL(12, 2) NOT NULL,
+    periodo VARCHAR(20) NOT NULL,
+    dia TINYINT NOT NULL,
+    ultima DATE NOT NULL,
+    proxima DATE NOT NULL,
+    ocurrencias INT NOT NULL,
+    confianza DECIMAL(4, 3) NOT NULL,
+    PRIMARY KEY (id_regla),
+    KEY idx_recurrentes_user (user_id, proxima),
+    CONSTRAINT fk_recurrentes_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS recurrentes_estado (
+    user_id INT NOT NULL,
+    data_version BIGINT UNSIGNED NOT NULL,
+    detectado DATETIME NOT NULL,
+    completo TINYINT(1) NOT NULL DEFAULT 1,
+    PRIMARY KEY (user_id),
+    CONSTRAINT fk_recurrentes_estado_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
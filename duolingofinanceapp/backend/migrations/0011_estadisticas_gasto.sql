@@ -0,0 +1,70 @@
+-- Estadísticas de gasto por categoría mantenidas al escribir y anomalías
+-- detectadas sobre ellas (ver spending_stats.py). Las estadísticas y los
+-- totales semanales se llenan al final con el historial existente (lo mismo
+-- que python spending_stats.py rebuild); las anomalías empiezan vacías.
+
+CREATE TABLE IF NOT EXISTS estadisticas_categoria (
+    user_id INT NOT NULL,
+    categoria VARCHAR(100) NOT NULL,
+    -- Welford sobre el monto de cada movimiento
+    n INT NOT NULL DEFAULT 0,
+    media DOUBLE NOT NULL DEFAULT 0,
+    m2 DOUBLE NOT NULL DEFAULT 0,
+    -- Welford sobre el total de cada semana con gasto
+    semanas INT NOT NULL DEFAULT 0,
+    media_semanal DOUBLE NOT NULL DEFAULT 0,
+    m2_semanal DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, categoria),
+    CONSTRAINT fk_estadisticas_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+CREATE TABLE IF NOT EXISTS gasto_semanal (
+    user_id INT NOT NULL,
+    categoria VARCHAR(100) NOT NULL,
+    semana DATE NOT NULL,
+    total DECIMAL(14, 2) NOT NULL,
+    PRIMARY KEY (user_id, categoria, semana),
+    CONSTRAINT fk_gasto_semanal_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- id_movimiento = 0 en las anomalías de tipo 'semana'
+CREATE TABLE IF NOT EXISTS anomalias (
+    id_anomalia INT NOT NULL AUTO_INCREMENT,
+    user_id INT NOT NULL,
+    tipo_anomalia ENUM('movimiento', 'semana') NOT NULL,
+    categoria VARCHAR(100) NOT NULL,
+    semana DATE NOT NULL,
+    id_movimiento INT NOT NULL DEFAULT 0,
+    valor DECIMAL(14, 2) NOT NULL,
+    esperado DECIMAL(14, 2) NOT NULL,
+    veces DOUBLE NULL,
+    z DOUBLE NULL,
+    creado DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id_anomalia),
+    UNIQUE KEY uq_anomalias (user_id, tipo_anomalia, categoria, semana, id_movimiento),
+    KEY idx_anomalias_user_semana (user_id, semana),
+    CONSTRAINT fk_anomalias_user FOREIGN KEY (user_id) REFERENCES users (id_user) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- Historial existente: totales por semana (lunes) de cada categoría de Egreso
+INSERT INTO gasto_semanal (user_id, categoria, semana, total)
+SELECT user_id, categoria, DATE_SUB(DATE(fecha), INTERVAL WEEKDAY(fecha) DAY) AS semana, SUM(monto)
+FROM movimientos WHERE tipo = 'Egreso'
+GROUP BY user_id, categoria, semana
+ON DUPLICATE KEY UPDATE total = VALUES(total);
+
+-- m2 de Welford es VAR_POP * n
+INSERT INTO estadisticas_categoria (user_id, categoria, n, media, m2, semanas, media_semanal, m2_semanal)
+SELECT m.user_id, m.categoria, m.n, m.media, m.m2, s.semanas, s.media, s.m2
+FROM (
+    SELECT user_id, categoria, COUNT(*) AS n, AVG(monto) AS media, VAR_POP(monto) * COUNT(*) AS m2
+    FROM movimientos WHERE tipo = 'Egreso'
+    GROUP BY user_id, categoria
+) m
+JOIN (
+    SELECT user_id, categoria, COUNT(*) AS semanas, AVG(total) AS media, VAR_POP(total) * COUNT(*) AS m2
+    FROM gasto_semanal
+    GROUP BY user_id, categoria
+) s ON s.user_id = m.user_id AND s.categoria = m.categoria
+ON DUPLICATE KEY UPDATE n = VALUES(n), media = VALUES(media), m2 = VALUES(m2),
+    semanas = VALUES(semanas), media_semanal = VALUES(media_semanal), m2_semanal = VALUES(m2_semanal);
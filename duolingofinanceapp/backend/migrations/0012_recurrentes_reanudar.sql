@@ -0,0 +1,4 @@
+-- Categoría donde se quedó una detección de recurrentes que agotó su
+-- presupuesto (ver recurring.py); la siguiente empieza ahí. NULL si terminó.
+
+ALTER TABLE recurrentes_estado ADD COLUMN reanudar VARCHAR(100) NULL;
@@ -0,0 +1,155 @@
+"""
+Hash de contraseñas fuera de los hilos de Flask.
+
+bcrypt es puro CPU: un /login tarda lo mismo que el factor de costo que se
+le pida y, ejecutado en el hilo de la petición, un ataque de relleno de
+credenciales acapara todos los núcleos y deja sin servicio al resto de los
+endpoints. Aquí el hash y la verificación corren en un pool de procesos
+propio y acotado:
+
+    BCRYPT_ROUNDS          factor de costo para hashes nuevos (default 12)
+    PASSWORD_WORKERS       procesos del pool (default: núcleos disponibles)
+    PASSWORD_MAX_QUEUE     operaciones esperando turno antes de rechazar (default 32)
+
+Cuando la cola está llena se lanza PasswordQueueFull de inmediato en lugar
+de bloquear otro hilo del servidor. Si BCRYPT_ROUNDS cambia, los hashes
+existentes siguen validando y needs_rehash() indica cuáles conviene
+regenerar en el siguiente login exitoso.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import math
+import multiprocessing
+import os
+import threading
+import time
+
+import bcrypt
+
+# bcrypt solo usa los primeros 72 bytes; las versiones anteriores de la
+# librería truncaban en silencio y la 5.x lanza ValueError, así que se trunca
+# aquí para que los hashes ya guardados sigan validando igual.
+_MAX_BYTES = 72
+
+
+class PasswordQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Cola de contraseñas llena, reintenta en {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _encode(password):
+    return password.encode('utf-8')[:_MAX_BYTES]
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(_encode(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(hashed, password):
+    try:
+        return bcrypt.checkpw(_encode(password), hashed.encode('utf-8'))
+    except ValueError:
+        # Hash guardado con formato inválido
+        return False
+
+
+def _noop():
+    return None
+
+
+def hash_rounds(hashed):
+    """Factor de costo de un hash bcrypt ('$2b$12$...' -> 12), None si no se reconoce."""
+    partes = (hashed or '').split('$')
+    if len(partes) < 4 or not partes[2].isdigit():
+        return None
+    return int(partes[2])
+
+
+class PasswordHasher:
+    def __init__(self, rounds, workers, max_queue):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        # fork: los workers no reimportan app.py; se arrancan en warm() antes
+        # de que Flask cree sus hilos
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('fork')
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self._pendientes = 0
+        self._latencia_promedio = 0.25
+        self._metrics = {"hashes": 0, "checks": 0, "rehashes": 0, "rejected": 0}
+        # Hash de referencia para que un email inexistente cueste lo mismo
+        # que una contraseña incorrecta (no revela qué cuentas existen)
+        self._dummy = _hash('duolingofinance', rounds)
+
+    def _retry_after(self):
+        with self._lock:
+            rondas = max(self._pendientes, 1) / self.workers
+            return max(1, math.ceil(rondas * self._latencia_promedio))
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._metrics["rejected"] += 1
+            raise PasswordQueueFull(self._retry_after())
+        inicio = time.monotonic()
+        with self._lock:
+            self._pendientes += 1
+        try:
+            return self._pool.submit(fn, *args).result()
+        finally:
+            duracion = time.monotonic() - inicio
+            with self._lock:
+                self._pendientes -= 1
+                self._latencia_promedio = 0.8 * self._latencia_promedio + 0.2 * duracion
+            self._slots.release()
+
+    def warm(self):
+        """Arranca todos los procesos del pool (con fork se crean en el primer envío)."""
+        self._pool.submit(_noop).result()
+
+    def hash(self, password):
+        resultado = self._run(_hash, password, self.rounds)
+        with self._lock:
+            self._metrics["hashes"] += 1
+        return resultado
+
+    def check(self, hashed, password):
+        """Verifica la contraseña; con hashed=None gasta el mismo tiempo y devuelve False."""
+        resultado = self._run(_check, hashed or self._dummy, password)
+        with self._lock:
+            self._metrics["checks"] += 1
+        return resultado and hashed is not None
+
+    def needs_rehash(self, hashed):
+        return hash_rounds(hashed) != self.rounds
+
+    def rehash(self, password):
+        resultado = self.hash(password)
+        with self._lock:
+            self._metrics["rehashes"] += 1
+        return resultado
+
+    def stats(self):
+        with self._lock:
+            datos = dict(self._metrics)
+            datos.update({
+                "pending": self._pendientes,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "rounds": self.rounds,
+                "avg_latency_seconds": self._latencia_promedio,
+            })
+        return datos
+
+
+def hasher_from_env():
+    hasher = PasswordHasher(
+        rounds=int(os.getenv('BCRYPT_ROUNDS', 12)),
+        workers=int(os.getenv('PASSWORD_WORKERS', 0)) or os.cpu_count() or 1,
+        max_queue=int(os.getenv('PASSWORD_MAX_QUEUE', 32)),
+    )
+    hasher.warm()
+    return hasher
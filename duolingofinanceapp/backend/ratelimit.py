@@ -0,0 +1,62 @@
+"""
+Limitación de tasa con cubetas de tokens en memoria.
+
+Cada llave (una IP, un email...) tiene una cubeta de `capacity` tokens que
+se rellena a `rate` tokens por segundo; cada petición consume uno. Sirve
+para cortar el tráfico abusivo antes de hacer trabajo caro (bcrypt, Gemini).
+
+Es por proceso: con varios workers el límite efectivo es N veces mayor.
+"""
+from collections import OrderedDict
+import math
+import threading
+import time
+
+
+class TokenBucketLimiter:
+    def __init__(self, capacity, rate, max_keys=100000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._cubetas = OrderedDict()  # llave -> (tokens, ultima_actualizacion)
+        self._lock = threading.Lock()
+        self._metrics = {"allowed": 0, "limited": 0}
+
+    def acquire(self, llave, costo=1):
+        """Devuelve 0 si se permite la petición, o los segundos a esperar si no."""
+        ahora = time.monotonic()
+        with self._lock:
+            tokens, ultima = self._cubetas.pop(llave, (self.capacity, ahora))
+            tokens = min(self.capacity, tokens + (ahora - ultima) * self.rate)
+            if tokens >= costo:
+                tokens -= costo
+                espera = 0
+                self._metrics["allowed"] += 1
+            else:
+                espera = max(1, math.ceil((costo - tokens) / self.rate))
+                self._metrics["limited"] += 1
+            # Las llaves más viejas se descartan (equivale a una cubeta llena)
+            self._cubetas[llave] = (tokens, ahora)
+            while len(self._cubetas) > self.max_keys:
+                self._cubetas.popitem(last=False)
+        return espera
+
+    def stats(self):
+        with self._lock:
+            return dict(self._metrics, keys=len(self._cubetas))
+
+
+class NullLimiter:
+    """Limitador deshabilitado."""
+
+    def acquire(self, llave, costo=1):
+        return 0
+
+    def stats(self):
+        return {"enabled": False}
+
+
+def limiter(capacity, per_minute, enabled=True):
+    if not enabled or capacity <= 0 or per_minute <= 0:
+        return NullLimiter()
+    return TokenBucketLimiter(capacity, per_minute / 60.0)
@@ -0,0 +1,399 @@
+"""
+Movimientos recurrentes (renta, sueldo, suscripciones) y pronóstico del
+flujo de los próximos días.
+
+Detección sobre los movimientos de los últimos RECURRING_LOOKBACK_DAYS días,
+leídos en orden (categoria, fecha) para aprovechar idx_mov_user_categoria_fecha
+y procesar una categoría a la vez sin cargar todo el historial:
+
+  1. Dentro de la categoría se agrupa por (tipo, nota normalizada): minúsculas
+     y sin números ni signos, así "Netflix 10/2026" y "netflix" son la misma.
+  2. Cada grupo se ordena por monto y se parte en ventanas de montos
+     parecidos (hasta RECURRING_AMOUNT_TOLERANCE sobre el primero de la
+     ventana): una sola pasada, sin comparar cada par de movimientos.
+  3. Cada ventana se ordena por fecha y se miden las separaciones de sus
+     últimas ocurrencias contra los periodos conocidos (semanal, quincenal,
+     mensual, trimestral). Es recurrente si al menos el 75 % de las
+     separaciones caen dentro de la tolerancia del periodo y la serie sigue
+     viva (la siguiente fecha esperada no pasó hace más de una tolerancia).
+
+Las reglas se materializan en movimientos_recurrentes (migrations/
+0010_recurrentes.sql) junto con la data_version con la que se calcularon; se
+recalculan cuando pasaron al menos RECURRING_REFRESH_SECONDS desde la última
+detección y cambió la versión o la detección quedó incompleta, una sola
+petición a la vez por usuario (lock de su fila en recurrentes_estado). Si una
+detección excede RECURRING_BUDGET_MS se guardan las categorías que alcanzó a
+procesar con completo = 0 y la siguiente empieza donde esa se quedó
+(recurrentes_estado.reanudar, migrations/0012_recurrentes_reanudar.sql) y da
+la vuelta, así ninguna categoría queda siempre fuera del presupuesto.
+
+    RECURRING_LOOKBACK_DAYS      historial analizado (default 400)
+    RECURRING_MIN_OCCURRENCES    ocurrencias mínimas de una serie (default 3)
+    RECURRING_AMOUNT_TOLERANCE   variación de monto dentro de una serie (default 0.2)
+    RECURRING_BUDGET_MS          tiempo máximo de una detección (default 1000)
+    RECURRING_REFRESH_SECONDS    espera mínima entre detecciones (default 600)
+    RECURRING_HORIZON_DAYS       días del pronóstico (default 90)
+"""
+from datetime import date, datetime, timedelta
+import calendar
+import os
+import re
+import statistics
+import time
+
+LOOKBACK_DIAS = int(os.getenv('RECURRING_LOOKBACK_DAYS', 400))
+MIN_OCURRENCIAS = int(os.getenv('RECURRING_MIN_OCCURRENCES', 3))
+TOLERANCIA_MONTO = float(os.getenv('RECURRING_AMOUNT_TOLERANCE', 0.2))
+PRESUPUESTO_MS = float(os.getenv('RECURRING_BUDGET_MS', 1000))
+REFRESCO_SEGUNDOS = float(os.getenv('RECURRING_REFRESH_SECONDS', 600))
+HORIZONTE_DIAS = int(os.getenv('RECURRING_HORIZON_DAYS', 90))
+
+# nombre -> (días, tolerancia en días, meses si el periodo es mensual o None)
+PERIODOS = {
+    'semanal': (7, 1.5, None),
+    'quincenal': (15, 2.5, None),
+    'mensual': (30.4375, 4, 1),
+    'trimestral': (91.3125, 8, 3),
+}
+VENTANA_SERIE = 12      # últimas ocurrencias que se miden de cada serie
+REGULARIDAD_MIN = 0.75  # separaciones que deben coincidir con el periodo
+LOTE = 1000             # filas por fetchmany
+
+_NO_LETRAS = re.compile(r'[\W\d_]+')
+
+
+def normalize_note(nota):
+    return ' '.join(_NO_LETRAS.sub(' ', (nota or '').lower()).split())[:60]
+
+
+def add_months(fecha, meses, dia):
+    """fecha + meses con el día 'dia' (recortado al último día del mes)."""
+    total = fecha.year * 12 + fecha.month - 1 + meses
+    anio, mes = divmod(total, 12)
+    mes += 1
+    return date(anio, mes, min(dia, calendar.monthrange(anio, mes)[1]))
+
+
+def next_date(fecha, periodo, dia):
+    dias, _, meses = PERIODOS[periodo]
+    if meses:
+        return add_months(fecha, meses, dia)
+    return fecha + timedelta(days=dias)
+
+
+def _as_date(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def _match_period(separaciones):
+    """Periodo cuya tolerancia cubre la mediana y al menos REGULARIDAD_MIN de las separaciones."""
+    mediana = statistics.median(separaciones)
+    for periodo, (dias, tolerancia, _) in PERIODOS.items():
+        if abs(mediana - dias) <= tolerancia:
+            coinciden = sum(1 for s in separaciones if abs(s - dias) <= tolerancia)
+            regularidad = coinciden / len(separaciones)
+            if regularidad >= REGULARIDAD_MIN:
+                return periodo, regularidad
+            return None, 0.0
+    return None, 0.0
+
+
+def _series(tipo, categoria, ocurrencias, hoy):
+    """
+    ocurrencias: [(monto, fecha, nota)] de un mismo (tipo, nota normalizada).
+    Devuelve las reglas de las ventanas de monto que resulten periódicas.
+    """
+    reglas = []
+    ocurrencias.sort(key=lambda o: o[0])
+    inicio = 0
+    while inicio < len(ocurrencias):
+        limite = ocurrencias[inicio][0] * (1 + TOLERANCIA_MONTO)
+        fin = inicio + 1
+        while fin < len(ocurrencias) and ocurrencias[fin][0] <= limite:
+            fin += 1
+        if fin - inicio >= MIN_OCURRENCIAS:
+            regla = _periodic_rule(tipo, categoria, ocurrencias[inicio:fin], hoy)
+            if regla is not None:
+                reglas.append(regla)
+        inicio = fin
+    return reglas
+
+
+def _periodic_rule(tipo, categoria, ventana, hoy):
+    # Una ocurrencia por día: capturas duplicadas no cuentan como periodo
+    por_dia = {}
+    for monto, fecha, nota in ventana:
+        por_dia[fecha] = (monto, nota)
+    fechas = sorted(por_dia)[-VENTANA_SERIE:]
+    if len(fechas) < MIN_OCURRENCIAS:
+        return None
+    separaciones = [(b - a).days for a, b in zip(fechas, fechas[1:])]
+    periodo, regularidad = _match_period(separaciones)
+    if periodo is None:
+        return None
+
+    ultima = fechas[-1]
+    dia = ultima.day
+    proxima = next_date(ultima, periodo, dia)
+    if (hoy - proxima).days > PERIODOS[periodo][1]:
+        return None  # la serie se cortó
+    montos = [por_dia[f][0] for f in fechas]
+    return {
+        "tipo": tipo,
+        "categoria": categoria,
+        "nota": por_dia[ultima][1],
+        "monto": round(statistics.median(montos), 2),
+        "periodo": periodo,
+        "dia": dia,
+        "ultima": ultima,
+        "proxima": proxima,
+        "ocurrencias": len(fechas),
+        "confianza": round(regularidad * min(1.0, len(fechas) / 6), 3),
+    }
+
+
+def detect(filas, hoy=None, deadline=None):
+    """
+    filas: iterable de (tipo, categoria, nota, monto, fecha) agrupado por
+    categoria. Devuelve (reglas, pendiente): pendiente es la primera
+    categoría que no se procesó por alcanzar 'deadline' (time.monotonic()),
+    o None si se terminó.
+    """
+    hoy = hoy or date.today()
+    reglas = []
+    categoria_actual = None
+    grupos = {}
+
+    def cerrar():
+        for (tipo, _), ocurrencias in grupos.items():
+            if len(ocurrencias) >= MIN_OCURRENCIAS:
+                reglas.extend(_series(tipo, categoria_actual, ocurrencias, hoy))
+
+    for tipo, categoria, nota, monto, fecha in filas:
+        if categoria != categoria_actual:
+            cerrar()
+            if deadline is not None and time.monotonic() > deadline:
+                return reglas, categoria
+            categoria_actual = categoria
+            grupos = {}
+        monto = float(monto)
+        if monto > 0:
+            grupos.setdefault((tipo, normalize_note(nota)), []).append((monto, _as_date(fecha), nota))
+    cerrar()
+    return reglas, None
+
+
+def forecast(reglas, hoy=None, dias=HORIZONTE_DIAS):
+    """Ocurrencias esperadas de las reglas en [hoy, hoy + dias], ordenadas por fecha."""
+    hoy = hoy or date.today()
+    fin = hoy + timedelta(days=dias)
+    eventos = []
+    for regla in reglas:
+        fecha = regla["proxima"]
+        # Reglas calculadas hace días: lo ya vencido hace más de una
+        # tolerancia se da por registrado
+        tolerancia = PERIODOS[regla["periodo"]][1]
+        while (hoy - fecha).days > tolerancia:
+            fecha = next_date(fecha, regla["periodo"], regla["dia"])
+        while fecha <= fin:
+            eventos.append({
+                "fecha": max(fecha, hoy).isoformat(),
+                "tipo": regla["tipo"],
+                "categoria": regla["categoria"],
+                "nota": regla["nota"],
+                "monto": regla["monto"],
+            })
+            fecha = next_date(fecha, regla["periodo"], regla["dia"])
+    eventos.sort(key=lambda e: e["fecha"])
+    ingresos = sum(e["monto"] for e in eventos if e["tipo"] == 'Ingreso')
+    egresos = sum(e["monto"] for e in eventos if e["tipo"] == 'Egreso')
+    return {
+        "dias": dias,
+        "ingresos": round(ingresos, 2),
+        "egresos": round(egresos, 2),
+        "neto": round(ingresos - egresos, 2),
+        "eventos": eventos,
+    }
+
+
+# ===========================
+# MATERIALIZACIÓN
+# ===========================
+_REGLA_COLUMNAS = "tipo, categoria, nota, monto, periodo, dia, ultima, proxima, ocurrencias, confianza"
+
+
+def _rows(conn, id_user, desde, reanudar):
+    """
+    Movimientos de la ventana por (categoria, fecha), empezando en la
+    categoría 'reanudar' y dando la vuelta: primero categoria >= reanudar y
+    luego categoria < reanudar. Se leen en páginas de LOTE filas con keyset
+    sobre idx_mov_user_categoria_fecha (que incluye id_movimiento): si
+    detect() para al agotar el presupuesto no queda un resultado pendiente
+    que haya que vaciar, así que lo leído nunca pasa de una página de más.
+    """
+    tramos = [(reanudar, None)]
+    if reanudar:
+        tramos.append(('', reanudar))
+    cur = conn.cursor()
+    try:
+        for inicio, fin in tramos:
+            ultimo = None
+            while True:
+                if ultimo is None:
+                    condiciones, params = ["categoria >= %s"], [inicio]
+                else:
+                    categoria, fecha, id_movimiento = ultimo
+                    condiciones = ["(categoria > %s OR (categoria = %s AND "
+                                   "(fecha > %s OR (fecha = %s AND id_movimiento > %s))))"]
+                    params = [categoria, categoria, fecha, fecha, id_movimiento]
+                if fin is not None:
+                    condiciones.append("categoria < %s")
+                    params.append(fin)
+                cur.execute(
+                    "SELECT tipo, categoria, nota, monto, fecha, id_movimiento FROM movimientos "
+                    f"WHERE user_id=%s AND fecha >= %s AND {' AND '.join(condiciones)} "
+                    "ORDER BY categoria, fecha, id_movimiento LIMIT %s",
+                    [id_user, desde] + params + [LOTE]
+                )
+                lote = cur.fetchall()
+                for fila in lote:
+                    yield fila[:5]
+                if len(lote) < LOTE:
+                    break
+                ultimo = (lote[-1][1], lote[-1][4], lote[-1][5])
+    finally:
+        cur.close()
+
+
+def refresh(conn, id_user, version, hoy=None, reanudar=None):
+    """
+    Recalcula y guarda las reglas del usuario desde la categoría 'reanudar'
+    (None = desde el principio). Si se acaba el presupuesto solo se
+    reemplazan las reglas de las categorías procesadas. No hace commit: la
+    conexión puede ser la de la petición y la transacción es del llamador.
+    """
+    hoy = hoy or date.today()
+    inicio = reanudar or ''
+    deadline = time.monotonic() + PRESUPUESTO_MS / 1000
+    filas = _rows(conn, id_user, (hoy - timedelta(days=LOOKBACK_DIAS)).strftime('%Y-%m-%d'), inicio)
+    try:
+        reglas, pendiente = detect(filas, hoy, deadline)
+    finally:
+        # Cierra el cursor sin pedir la siguiente página
+        filas.close()
+
+    cur = conn.cursor()
+    try:
+        if pendiente is None:
+            cur.execute("DELETE FROM movimientos_recurrentes WHERE user_id=%s", (id_user,))
+        elif pendiente >= inicio:
+            cur.execute(
+                "DELETE FROM movimientos_recurrentes WHERE user_id=%s AND categoria >= %s AND categoria < %s",
+                (id_user, inicio, pendiente)
+            )
+        else:
+            # Se dio la vuelta: procesado [inicio, fin] y [principio, pendiente)
+            cur.execute(
+                "DELETE FROM movimientos_recurrentes WHERE user_id=%s AND (categoria >= %s OR categoria < %s)",
+                (id_user, inicio, pendiente)
+            )
+        if reglas:
+            cur.executemany(
+                f"INSERT INTO movimientos_recurrentes (user_id, {_REGLA_COLUMNAS}) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                [(id_user, r["tipo"], r["categoria"], r["nota"], r["monto"], r["periodo"], r["dia"],
+                  r["ultima"], r["proxima"], r["ocurrencias"], r["confianza"]) for r in reglas]
+            )
+        cur.execute(
+            """
+            INSERT INTO recurrentes_estado (user_id, data_version, detectado, completo, reanudar)
+            VALUES (%s, %s, NOW(), %s, %s)
+            ON DUPLICATE KEY UPDATE data_version=VALUES(data_version),
+                detectado=VALUES(detectado), completo=VALUES(completo), reanudar=VALUES(reanudar)
+            """,
+            (id_user, version, int(pendiente is None), pendiente)
+        )
+    finally:
+        cur.close()
+    return pendiente is None
+
+
+_ESTADO_SQL = (
+    "SELECT data_version, TIMESTAMPDIFF(SECOND, detectado, NOW()), completo, reanudar "
+    "FROM recurrentes_estado WHERE user_id=%s"
+)
+
+
+def _stale(estado, version):
+    """True si hay que detectar: nunca se hizo, o es vieja y cambió la versión o quedó incompleta."""
+    return estado is None or (estado[1] >= REFRESCO_SEGUNDOS and (estado[0] != version or not estado[2]))
+
+
+def _lock_state(cur, id_user):
+    """
+    Toma el lock exclusivo de la fila de recurrentes_estado del usuario y
+    devuelve su estado confirmado más reciente. Si no existe se crea como
+    detección nunca hecha (detectado en 1970, incompleta). Con el upsert el
+    lock es exclusivo desde el principio: dos detecciones simultáneas del
+    mismo usuario se esperan en lugar de chocar en los gap locks de
+    movimientos_recurrentes (deadlock).
+    """
+    cur.execute(
+        "INSERT INTO recurrentes_estado (user_id, data_version, detectado, completo) "
+        "VALUES (%s, 0, '1970-01-01', 0) ON DUPLICATE KEY UPDATE user_id=user_id",
+        (id_user,)
+    )
+    cur.execute(_ESTADO_SQL + " FOR UPDATE", (id_user,))
+    return cur.fetchone()
+
+
+def load(conn, id_user, version):
+    """
+    Reglas vigentes del usuario. Se recalculan si la última detección tiene
+    más de RECURRING_REFRESH_SECONDS y además cambió su data_version o quedó
+    incompleta (en ese caso se retoma donde se quedó). Antes de recalcular se
+    bloquea la fila de recurrentes_estado y se vuelve a revisar, por si otra
+    petición ya lo hizo; el lock dura hasta que el llamador haga commit.
+    Devuelve (reglas, completo). Igual que refresh(), no hace commit.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute(_ESTADO_SQL, (id_user,))
+        estado = cur.fetchone()
+        if _stale(estado, version):
+            estado = _lock_state(cur, id_user)
+    finally:
+        cur.close()
+    if _stale(estado, version):
+        completo = refresh(conn, id_user, version, reanudar=estado[3])
+    else:
+        completo = bool(estado[2])
+
+    # Se leen siempre de la tabla: tras una detección parcial incluyen las
+    # reglas de las categorías que esa no alcanzó
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            f"SELECT {_REGLA_COLUMNAS} FROM movimientos_recurrentes WHERE user_id=%s ORDER BY proxima",
+            (id_user,)
+        )
+        filas = cur.fetchall()
+    finally:
+        cur.close()
+    reglas = [{
+        "tipo": f[0],
+        "categoria": f[1],
+        "nota": f[2],
+        "monto": float(f[3]),
+        "periodo": f[4],
+        "dia": f[5],
+        "ultima": f[6],
+        "proxima": f[7],
+        "ocurrencias": f[8],
+        "confianza": float(f[9]),
+    } for f in filas]
+    return reglas, completo
+
+
+def rule_to_dict(regla):
+    return dict(regla, ultima=regla["ultima"].isoformat(), proxima=regla["proxima"].isoformat())
@@ -0,0 +1,176 @@
+"""
+Resumen materializado de movimientos por (usuario, mes, tipo, categoría).
+
+Los endpoints de escritura de movimientos aplican aquí el delta de cada fila
+dentro de la misma transacción, así que /balance, /movements/summary y el
+contexto de la mascota leen O(categorías) filas en lugar de O(movimientos).
+
+La tabla se crea y se llena con el historial existente en
+migrations/0003_resumen_movimientos.sql.
+
+Uso por línea de comandos:
+    python rollups.py rebuild [--user ID]   # recalcula desde movimientos
+    python rollups.py verify  [--user ID]   # reporta diferencias (drift)
+"""
+from datetime import datetime
+import argparse
+import sys
+
+# La fila se lee de movimientos para respetar la fecha que haya puesto MySQL
+# (por ejemplo el DEFAULT CURRENT_TIMESTAMP de un INSERT sin fecha).
+_APLICAR_SQL = """
+INSERT INTO resumen_movimientos (user_id, mes, tipo, categoria, total, num_movimientos)
+SELECT user_id, DATE_FORMAT(fecha, '%%Y-%%m-01'), tipo, categoria, %s * monto, %s
+FROM movimientos WHERE id_movimiento=%s
+ON DUPLICATE KEY UPDATE
+    total = total + VALUES(total),
+    num_movimientos = num_movimientos + VALUES(num_movimientos)
+"""
+
+
+def apply_movement(cur, id_movimiento, signo):
+    """
+    Suma (signo=1) o resta (signo=-1) un movimiento del resumen.
+
+    Debe llamarse con la fila presente: después del INSERT, antes del DELETE,
+    y antes/después del UPDATE. No hace commit; lo decide el endpoint.
+    """
+    cur.execute(_APLICAR_SQL, (signo, signo, id_movimiento))
+    if signo < 0:
+        cur.execute(
+            """
+            DELETE r FROM resumen_movimientos r
+            JOIN movimientos m ON m.user_id = r.user_id AND m.tipo = r.tipo
+                AND m.categoria = r.categoria AND r.mes = DATE_FORMAT(m.fecha, '%%Y-%%m-01')
+            WHERE m.id_movimiento=%s AND r.num_movimientos <= 0
+            """,
+            (id_movimiento,)
+        )
+
+
+_DELTA_SQL = """
+INSERT INTO resumen_movimientos (user_id, mes, tipo, categoria, total, num_movimientos)
+VALUES (%s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    total = total + VALUES(total),
+    num_movimientos = num_movimientos + VALUES(num_movimientos)
+"""
+
+
+def apply_deltas(cur, filas):
+    """
+    Suma al resumen un lote de movimientos ya validados, agregándolos antes
+    en memoria para hacer un solo upsert por (usuario, mes, tipo, categoría).
+    Cada fila es (user_id, fecha: datetime, monto, tipo, categoria).
+    """
+    deltas = {}
+    for user_id, fecha, monto, tipo, categoria in filas:
+        llave = (user_id, fecha.strftime('%Y-%m-01'), tipo, categoria)
+        total, num = deltas.get(llave, (0, 0))
+        deltas[llave] = (total + monto, num + 1)
+    if deltas:
+        cur.executemany(_DELTA_SQL, [llave + valor for llave, valor in deltas.items()])
+
+
+def month_cutoff(fecha):
+    """
+    Primer día de mes a partir del cual el resumen cubre meses completos.
+    Los días anteriores (mes parcial) deben leerse de movimientos.
+    """
+    if fecha.day == 1:
+        return datetime(fecha.year, fecha.month, 1)
+    if fecha.month == 12:
+        return datetime(fecha.year + 1, 1, 1)
+    return datetime(fecha.year, fecha.month + 1, 1)
+
+
+def _filtro_usuario(user_id):
+    return ("WHERE user_id=%s", (user_id,)) if user_id is not None else ("", ())
+
+
+def rebuild(conn, user_id=None):
+    """Recalcula el resumen desde movimientos en una sola transacción."""
+    where, params = _filtro_usuario(user_id)
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DELETE FROM resumen_movimientos {where}", params)
+        cur.execute(
+            f"""
+            INSERT INTO resumen_movimientos (user_id, mes, tipo, categoria, total, num_movimientos)
+            SELECT user_id, DATE_FORMAT(fecha, '%%Y-%%m-01') AS mes, tipo, categoria,
+                   SUM(monto), COUNT(*)
+            FROM movimientos {where}
+            GROUP BY user_id, mes, tipo, categoria
+            """,
+            params
+        )
+        filas = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return filas
+
+
+def verify(conn, user_id=None):
+    """
+    Compara el resumen contra un GROUP BY fresco de movimientos.
+    Devuelve una lista de (llave, esperado, actual) con las diferencias.
+    """
+    where, params = _filtro_usuario(user_id)
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT user_id, DATE_FORMAT(fecha, '%%Y-%%m-01') AS mes, tipo, categoria,
+               SUM(monto), COUNT(*)
+        FROM movimientos {where}
+        GROUP BY user_id, mes, tipo, categoria
+        """,
+        params
+    )
+    esperado = {tuple(r[:4]): (r[4], r[5]) for r in cur.fetchall()}
+    cur.execute(
+        f"""
+        SELECT user_id, DATE_FORMAT(mes, '%%Y-%%m-01'), tipo, categoria, total, num_movimientos
+        FROM resumen_movimientos {where}
+        """,
+        params
+    )
+    actual = {tuple(r[:4]): (r[4], r[5]) for r in cur.fetchall()}
+    cur.close()
+
+    diferencias = []
+    for llave in sorted(set(esperado) | set(actual), key=str):
+        if esperado.get(llave) != actual.get(llave):
+            diferencias.append((llave, esperado.get(llave), actual.get(llave)))
+    return diferencias
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mantenimiento de resumen_movimientos")
+    parser.add_argument('comando', choices=['rebuild', 'verify'])
+    parser.add_argument('--user', type=int, default=None)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    from db_pool import connect_from_env
+
+    load_dotenv()
+    conn = connect_from_env()
+    try:
+        if args.comando == 'rebuild':
+            filas = rebuild(conn, args.user)
+            print(f"Resumen reconstruido: {filas} filas ✅")
+        else:
+            diferencias = verify(conn, args.user)
+            for llave, esperado, actual in diferencias:
+                print(f"Drift en {llave}: esperado={esperado} actual={actual}")
+            if diferencias:
+                print(f"{len(diferencias)} diferencias encontradas ❌")
+                sys.exit(1)
+            print("Resumen consistente ✅")
+    finally:
+        conn.close()
@@ -0,0 +1,317 @@
+"""
+Estadísticas de gasto por (usuario, categoría) mantenidas al escribir y
+detección de anomalías sobre ellas.
+
+Igual que rollups.py, los endpoints de escritura de movimientos aplican aquí
+cada fila dentro de la misma transacción. Por categoría de Egreso se guardan
+dos agregados de Welford (n, media, m2), que admiten quitar un valor igual
+que agregarlo, así que un alta, cambio o baja cuesta O(1):
+
+  - sobre el monto de cada movimiento;
+  - sobre el total de cada semana (lunes a domingo) con gasto; gasto_semanal
+    guarda el total de cada semana para poder quitar el valor anterior.
+
+Después de aplicar un movimiento se evalúan dos señales contra la
+estadística sin el propio valor, y se guardan en anomalias (o se borran si
+dejaron de cumplirse):
+
+  - movimiento: monto a ANOMALY_Z desviaciones o más del promedio de la
+    categoría (con al menos ANOMALY_MIN_MOVEMENTS movimientos previos).
+  - semana: el total de la semana es ANOMALY_WEEK_RATIO veces o más el
+    promedio de las otras semanas con gasto (al menos ANOMALY_MIN_WEEKS).
+
+Las semanas sin gasto no entran al promedio semanal, así que en categorías
+esporádicas la alerta es conservadora. La importación masiva actualiza las
+estadísticas pero no marca anomalías (es historial, no gasto nuevo).
+
+Las tablas se crean (y se llenan con el historial existente) con
+migrations/0011_estadisticas_gasto.sql.
+
+    ANOMALY_Z               desviaciones para marcar un movimiento (default 3)
+    ANOMALY_MIN_MOVEMENTS   movimientos previos mínimos (default 5)
+    ANOMALY_MIN_AMOUNT      monto mínimo de un movimiento anómalo (default 200)
+    ANOMALY_WEEK_RATIO      total semanal / promedio para marcar la semana (default 2)
+    ANOMALY_MIN_WEEKS       semanas previas con gasto mínimas (default 3)
+    ANOMALY_WEEK_MIN        total semanal mínimo para marcar la semana (default 500)
+
+Uso por línea de comandos:
+    python spending_stats.py rebuild [--user ID]   # recalcula desde movimientos
+"""
+from datetime import datetime, timedelta
+import argparse
+import math
+import os
+
+Z_MINIMO = float(os.getenv('ANOMALY_Z', 3))
+MIN_MOVIMIENTOS = int(os.getenv('ANOMALY_MIN_MOVEMENTS', 5))
+MONTO_MINIMO = float(os.getenv('ANOMALY_MIN_AMOUNT', 200))
+RATIO_SEMANA = float(os.getenv('ANOMALY_WEEK_RATIO', 2))
+MIN_SEMANAS = int(os.getenv('ANOMALY_MIN_WEEKS', 3))
+SEMANA_MINIMO = float(os.getenv('ANOMALY_WEEK_MIN', 500))
+
+TIPO_GASTO = 'Egreso'
+ANOMALIA_MOVIMIENTO = 'movimiento'
+ANOMALIA_SEMANA = 'semana'
+
+VACIO = (0, 0.0, 0.0)
+
+
+# ===========================
+# WELFORD
+# ===========================
+def welford_add(estado, x):
+    n, media, m2 = estado
+    n += 1
+    delta = x - media
+    media += delta / n
+    return n, media, m2 + delta * (x - media)
+
+
+def welford_remove(estado, x):
+    n, media, m2 = estado
+    if n <= 1:
+        return VACIO
+    anterior = (n * media - x) / (n - 1)
+    return n - 1, anterior, max(m2 - (x - anterior) * (x - media), 0.0)
+
+
+def std(estado):
+    n, _, m2 = estado
+    return math.sqrt(m2 / (n - 1)) if n > 1 else 0.0
+
+
+def week_start(fecha):
+    dia = fecha.date() if isinstance(fecha, datetime) else fecha
+    return dia - timedelta(days=dia.weekday())
+
+
+# ===========================
+# ESCRITURA POR MOVIMIENTO
+# ===========================
+def _lock_stats(cur, id_user, categoria):
+    cur.execute(
+        "SELECT n, media, m2, semanas, media_semanal, m2_semanal FROM estadisticas_categoria "
+        "WHERE user_id=%s AND categoria=%s FOR UPDATE",
+        (id_user, categoria)
+    )
+    fila = cur.fetchone()
+    if fila is None:
+        return VACIO, VACIO
+    return (fila[0], fila[1], fila[2]), (fila[3], fila[4], fila[5])
+
+
+def _save_stats(cur, id_user, categoria, montos, semanal):
+    cur.execute(
+        """
+        INSERT INTO estadisticas_categoria (user_id, categoria, n, media, m2, semanas, media_semanal, m2_semanal)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE n=VALUES(n), media=VALUES(media), m2=VALUES(m2),
+            semanas=VALUES(semanas), media_semanal=VALUES(media_semanal), m2_semanal=VALUES(m2_semanal)
+        """,
+        (id_user, categoria) + montos + semanal
+    )
+
+
+def _week_totals(cur, id_user, categoria, semanas):
+    marcas = ', '.join(['%s'] * len(semanas))
+    cur.execute(
+        f"SELECT semana, total FROM gasto_semanal WHERE user_id=%s AND categoria=%s AND semana IN ({marcas})",
+        (id_user, categoria, *semanas)
+    )
+    return {semana: float(total) for semana, total in cur.fetchall()}
+
+
+def _save_week(cur, id_user, categoria, semana, total):
+    if total > 0.005:
+        cur.execute(
+            "INSERT INTO gasto_semanal (user_id, categoria, semana, total) VALUES (%s, %s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE total=VALUES(total)",
+            (id_user, categoria, semana, round(total, 2))
+        )
+    else:
+        cur.execute(
+            "DELETE FROM gasto_semanal WHERE user_id=%s AND categoria=%s AND semana=%s",
+            (id_user, categoria, semana)
+        )
+
+
+def _replace_week(semanal, anterior, nuevo):
+    """Cambia el total de una semana en el agregado semanal (0 = semana sin gasto)."""
+    if anterior > 0.005:
+        semanal = welford_remove(semanal, anterior)
+    if nuevo > 0.005:
+        semanal = welford_add(semanal, nuevo)
+    return semanal
+
+
+def _record(cur, id_user, tipo, categoria, semana, id_movimiento, senal):
+    """Guarda la anomalía si 'senal' es (valor, esperado, veces, z); si es None la borra."""
+    if senal is None:
+        cur.execute(
+            "DELETE FROM anomalias WHERE user_id=%s AND tipo_anomalia=%s AND categoria=%s "
+            "AND semana=%s AND id_movimiento=%s",
+            (id_user, tipo, categoria, semana, id_movimiento)
+        )
+        return
+    cur.execute(
+        """
+        INSERT INTO anomalias (user_id, tipo_anomalia, categoria, semana, id_movimiento, valor, esperado, veces, z)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE valor=VALUES(valor), esperado=VALUES(esperado),
+            veces=VALUES(veces), z=VALUES(z)
+        """,
+        (id_user, tipo, categoria, semana, id_movimiento) + senal
+    )
+
+
+def movement_signal(montos, monto):
+    """(valor, esperado, veces, z) si 'monto' es atípico frente a 'montos' (que no lo incluye)."""
+    n, media, _ = montos
+    desviacion = std(montos)
+    if n < MIN_MOVIMIENTOS or desviacion <= 0 or monto < MONTO_MINIMO:
+        return None
+    z = (monto - media) / desviacion
+    if z < Z_MINIMO:
+        return None
+    return round(monto, 2), round(media, 2), round(monto / media, 2) if media > 0 else None, round(z, 2)
+
+
+def week_signal(semanal, total):
+    """(valor, esperado, veces, z) si el total semanal es un pico frente a 'semanal' (sin esa semana)."""
+    semanas, media, _ = semanal
+    if semanas < MIN_SEMANAS or media <= 0 or total < SEMANA_MINIMO:
+        return None
+    veces = total / media
+    if veces < RATIO_SEMANA:
+        return None
+    desviacion = std(semanal)
+    z = (total - media) / desviacion if desviacion > 0 else None
+    return round(total, 2), round(media, 2), round(veces, 2), round(z, 2) if z is not None else None
+
+
+def apply_movement(cur, id_user, id_movimiento, signo):
+    """
+    Suma (signo=1) o resta (signo=-1) un movimiento de las estadísticas y
+    reevalúa sus anomalías. Igual que rollups.apply_movement: con la fila
+    presente (después del INSERT, antes del DELETE, antes/después del
+    UPDATE) y sin commit.
+    """
+    cur.execute(
+        "SELECT fecha, monto, tipo, categoria FROM movimientos WHERE id_movimiento=%s",
+        (id_movimiento,)
+    )
+    fila = cur.fetchone()
+    if fila is None or fila[2] != TIPO_GASTO:
+        return
+    fecha, monto, _, categoria = fila
+    monto = float(monto)
+    semana = week_start(fecha)
+
+    montos, semanal = _lock_stats(cur, id_user, categoria)
+    anterior = _week_totals(cur, id_user, categoria, [semana]).get(semana, 0.0)
+    total = max(anterior + signo * monto, 0.0)
+    semanal = _replace_week(semanal, anterior, total)
+    montos = welford_add(montos, monto) if signo > 0 else welford_remove(montos, monto)
+    _save_stats(cur, id_user, categoria, montos, semanal)
+    _save_week(cur, id_user, categoria, semana, total)
+
+    # Cada señal se mide contra la estadística sin el propio valor
+    senal = movement_signal(welford_remove(montos, monto), monto) if signo > 0 else None
+    _record(cur, id_user, ANOMALIA_MOVIMIENTO, categoria, semana, id_movimiento, senal)
+    senal = week_signal(_replace_week(semanal, total, 0.0), total)
+    _record(cur, id_user, ANOMALIA_SEMANA, categoria, semana, 0, senal)
+
+
+def apply_rows(cur, filas):
+    """
+    Suma a las estadísticas un lote de movimientos ya validados (importación
+    masiva), con una lectura y una escritura por categoría y semana.
+    Cada fila es (user_id, fecha: datetime, monto, tipo, categoria).
+    """
+    por_categoria = {}
+    for user_id, fecha, monto, tipo, categoria in filas:
+        if tipo == TIPO_GASTO:
+            por_categoria.setdefault((user_id, categoria), []).append((week_start(fecha), float(monto)))
+
+    for (id_user, categoria), movimientos in por_categoria.items():
+        montos, semanal = _lock_stats(cur, id_user, categoria)
+        deltas = {}
+        for semana, monto in movimientos:
+            montos = welford_add(montos, monto)
+            deltas[semana] = deltas.get(semana, 0.0) + monto
+        anteriores = _week_totals(cur, id_user, categoria, list(deltas))
+        for semana, delta in deltas.items():
+            anterior = anteriores.get(semana, 0.0)
+            semanal = _replace_week(semanal, anterior, anterior + delta)
+            _save_week(cur, id_user, categoria, semana, anterior + delta)
+        _save_stats(cur, id_user, categoria, montos, semanal)
+
+
+# ===========================
+# MANTENIMIENTO
+# ===========================
+def rebuild(conn, user_id=None):
+    """
+    Recalcula estadísticas y totales semanales desde movimientos en una sola
+    transacción (corrige el error de punto flotante acumulado). m2 de Welford
+    es VAR_POP * n. Las anomalías guardadas se conservan.
+    """
+    filtro = "AND user_id=%s" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DELETE FROM estadisticas_categoria WHERE 1=1 {filtro}", params)
+        cur.execute(f"DELETE FROM gasto_semanal WHERE 1=1 {filtro}", params)
+        cur.execute(
+            f"""
+            INSERT INTO gasto_semanal (user_id, categoria, semana, total)
+            SELECT user_id, categoria, DATE_SUB(DATE(fecha), INTERVAL WEEKDAY(fecha) DAY) AS semana, SUM(monto)
+            FROM movimientos WHERE tipo=%s {filtro}
+            GROUP BY user_id, categoria, semana
+            """,
+            (TIPO_GASTO,) + params
+        )
+        cur.execute(
+            f"""
+            INSERT INTO estadisticas_categoria (user_id, categoria, n, media, m2, semanas, media_semanal, m2_semanal)
+            SELECT m.user_id, m.categoria, m.n, m.media, m.m2, s.semanas, s.media, s.m2
+            FROM (
+                SELECT user_id, categoria, COUNT(*) AS n, AVG(monto) AS media, VAR_POP(monto) * COUNT(*) AS m2
+                FROM movimientos WHERE tipo=%s {filtro}
+                GROUP BY user_id, categoria
+            ) m
+            JOIN (
+                SELECT user_id, categoria, COUNT(*) AS semanas, AVG(total) AS media, VAR_POP(total) * COUNT(*) AS m2
+                FROM gasto_semanal WHERE 1=1 {filtro}
+                GROUP BY user_id, categoria
+            ) s ON s.user_id = m.user_id AND s.categoria = m.categoria
+            """,
+            (TIPO_GASTO,) + params + params
+        )
+        categorias = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return categorias
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mantenimiento de estadisticas_categoria")
+    parser.add_argument('comando', choices=['rebuild'])
+    parser.add_argument('--user', type=int, default=None)
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+
+    from db_pool import connect_from_env
+
+    load_dotenv()
+    conn = connect_from_env()
+    try:
+        categorias = rebuild(conn, args.user)
+        print(f"Estadísticas reconstruidas: {categorias} categorías ✅")
+    finally:
+        conn.close()
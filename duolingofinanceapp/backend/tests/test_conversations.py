@@ -0,0 +1,140 @@
+"""
+Historial de la mascota: cuenta de tokens y compactación de los turnos
+viejos (summarize_old / replace_old). No necesita base ni IA: el resumen lo
+da una función de prueba y la base un cursor que solo registra.
+
+    python -m pytest tests/test_conversations.py
+"""
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import conversations
+
+
+class CursorRegistro:
+    def __init__(self, rowcount=None):
+        self.consultas = []
+        self._rowcount = rowcount
+        self.rowcount = 0
+        self.lastrowid = 99
+
+    def execute(self, query, params=None):
+        self.consultas.append((' '.join(query.split()), params))
+        if query.startswith('DELETE'):
+            # Cuántos turnos viejos seguían ahí (None: todos)
+            self.rowcount = self._rowcount if self._rowcount is not None else len(params) - 1
+
+    def executemany(self, query, params):
+        self.consultas.append((' '.join(query.split()), list(params)))
+
+
+def turnos(n, tokens=100):
+    roles = [conversations.ROL_USUARIO, conversations.ROL_MODELO]
+    return [
+        {"id_turno": i + 1, "rol": roles[i % 2], "texto": f"turno {i + 1}", "tokens": tokens}
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def presupuesto(monkeypatch):
+    monkeypatch.setattr(conversations, 'PRESUPUESTO', 500)
+    monkeypatch.setattr(conversations, 'CONSERVAR', 4)
+    monkeypatch.setattr(conversations, 'MODO', 'summarize')
+
+
+def test_estimate_tokens_cuatro_caracteres_por_token():
+    assert conversations.estimate_tokens('a' * 40) == 10
+    assert conversations.estimate_tokens('') == 1
+
+
+def test_history_tokens_suma_los_turnos():
+    assert conversations.history_tokens(turnos(3, tokens=7)) == 21
+    assert conversations.history_tokens([]) == 0
+
+
+def test_save_turns_usa_los_tokens_reportados_de_la_respuesta():
+    cur = CursorRegistro()
+    conversations.save_turns(cur, 1, 'c' * 32, 'p' * 40, 'respuesta', tokens_respuesta=321)
+    _, filas = cur.consultas[0]
+    assert [(f[2], f[4]) for f in filas] == [(conversations.ROL_USUARIO, 10), (conversations.ROL_MODELO, 321)]
+
+
+def test_save_turns_estima_la_respuesta_sin_cuenta_de_gemini():
+    cur = CursorRegistro()
+    conversations.save_turns(cur, 1, 'c' * 32, 'hola', 'r' * 80)
+    _, filas = cur.consultas[0]
+    assert filas[1][4] == 20
+
+
+def test_bajo_el_presupuesto_no_compacta(presupuesto):
+    historial = turnos(5)
+
+    def resumir(prompt):
+        raise AssertionError("no debía resumir")
+
+    assert conversations.summarize_old(historial, 'Ana', resumir) == ([], historial, None)
+
+
+def test_pocos_turnos_no_compacta_aunque_pasen_del_presupuesto(presupuesto):
+    historial = turnos(4, tokens=1000)
+    assert conversations.summarize_old(historial, 'Ana', lambda p: 'x') == ([], historial, None)
+
+
+def test_sobre_el_presupuesto_resume_los_viejos_y_conserva_los_recientes(presupuesto):
+    historial = turnos(8)
+    prompts = []
+
+    def resumir(prompt):
+        prompts.append(prompt)
+        return 'Resumen corto'
+
+    viejos, recientes, resumen = conversations.summarize_old(historial, 'Ana', resumir)
+    assert [t["id_turno"] for t in viejos] == [1, 2, 3, 4]
+    assert [t["id_turno"] for t in recientes] == [5, 6, 7, 8]
+    assert resumen == 'Resumen corto'
+    assert 'Ana: turno 1' in prompts[0] and 'Asesor: turno 4' in prompts[0]
+    assert 'turno 5' not in prompts[0]
+
+
+def test_modo_trim_descarta_sin_resumir(presupuesto, monkeypatch):
+    monkeypatch.setattr(conversations, 'MODO', 'trim')
+
+    def resumir(prompt):
+        raise AssertionError("no debía resumir")
+
+    viejos, recientes, resumen = conversations.summarize_old(turnos(8), 'Ana', resumir)
+    assert len(viejos) == 4 and len(recientes) == 4 and resumen is None
+
+
+def test_si_el_resumen_falla_se_recortan_los_viejos(presupuesto):
+    def resumir(prompt):
+        raise RuntimeError("sin cuota")
+
+    viejos, recientes, resumen = conversations.summarize_old(turnos(8), 'Ana', resumir)
+    assert len(viejos) == 4 and len(recientes) == 4 and resumen is None
+
+
+def test_replace_old_guarda_el_resumen_antes_de_los_recientes(presupuesto):
+    historial = turnos(8)
+    cur = CursorRegistro()
+    quedan = conversations.replace_old(cur, 1, 'c' * 32, historial[:4], historial[4:], 'Resumen corto')
+    borrado, insercion = cur.consultas
+    assert borrado[1] == [1, 1, 2, 3, 4]
+    assert insercion[1][2:] == (conversations.ROL_RESUMEN, 'Resumen corto', conversations.estimate_tokens('Resumen corto'))
+    assert quedan[0] == {"id_turno": 99, "rol": conversations.ROL_RESUMEN, "texto": 'Resumen corto',
+                         "tokens": conversations.estimate_tokens('Resumen corto')}
+    assert quedan[1:] == historial[4:]
+    assert conversations.history_tokens(quedan) < conversations.history_tokens(historial)
+
+
+def test_replace_old_no_duplica_si_otra_peticion_ya_compacto(presupuesto):
+    historial = turnos(8)
+    cur = CursorRegistro(rowcount=0)
+    quedan = conversations.replace_old(cur, 1, 'c' * 32, historial[:4], historial[4:], 'Resumen corto')
+    assert len(cur.consultas) == 1
+    assert quedan == historial[4:]
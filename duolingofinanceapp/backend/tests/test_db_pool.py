@@ -0,0 +1,61 @@
+"""
+Turnos de la mascota con emojis (PERSONA_MASCOTA los pide y las respuestas
+del stub también los traen): la conexión debe ir en utf8mb4 o MySQL rechaza
+el INSERT en ia_turnos.
+
+La prueba de ida y vuelta usa la base configurada en .env (ya migrada) y
+deshace todo al terminar; sin DB_NAME se omite.
+
+    python -m pytest tests
+"""
+from pathlib import Path
+import os
+import sys
+
+import pytest
+
+MySQLdb = pytest.importorskip('MySQLdb')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+from flask import Flask
+
+import conversations
+import db_pool
+
+load_dotenv()
+
+RESPUESTA = "¡Vas muy bien, Ana! 💰📈 Sigue así ✨"
+
+
+def test_pool_usa_utf8mb4_por_defecto():
+    pool = db_pool.MySQLPool(Flask(__name__))
+    assert pool.connect_args["charset"] == 'utf8mb4'
+
+
+def test_connect_from_env_usa_utf8mb4(monkeypatch):
+    argumentos = {}
+    monkeypatch.setattr(db_pool.MySQLdb, 'connect', lambda **kwargs: argumentos.update(kwargs))
+    db_pool.connect_from_env()
+    assert argumentos["charset"] == 'utf8mb4'
+
+
+@pytest.mark.skipif(not os.getenv('DB_NAME'), reason="sin base configurada (DB_NAME)")
+def test_guarda_turno_con_emojis():
+    conn = db_pool.connect_from_env()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "INSERT INTO users (username, email, password) VALUES (%s, %s, %s)",
+            ('emoji', 'emoji-turno@local.test', 'x')
+        )
+        id_user = cur.lastrowid
+        conversacion = conversations.new_conversation_id()
+        conversations.save_turns(cur, id_user, conversacion, "¿Cómo voy? 🤔", RESPUESTA)
+        turnos = conversations.load_turns(cur, id_user, conversacion)
+        assert [t["texto"] for t in turnos] == ["¿Cómo voy? 🤔", RESPUESTA]
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
@@ -0,0 +1,31 @@
+"""
+Regresiones de índices: corre explain_check contra la base configurada en
+.env (ya migrada) y falla si alguna consulta de los endpoints hace un full
+table scan. Sin MySQLdb o sin DB_NAME se omite.
+
+    python -m pytest tests/test_explain.py
+"""
+from pathlib import Path
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('MySQLdb')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+pytestmark = pytest.mark.skipif(not os.getenv('DB_NAME'), reason="sin base configurada (DB_NAME)")
+
+
+def test_consultas_de_los_endpoints_usan_indice():
+    import explain_check
+    from app import create_app
+
+    fallas, total = explain_check.check_indexes(create_app(), 2000)
+    assert total > 0
+    assert fallas == [], "\n".join(f"Full scan en {tabla}: {query}" for tabla, query in fallas)
@@ -0,0 +1,80 @@
+"""
+Progreso de metas (goal_progress.compute). Corre con el motor en Python y,
+si numpy está instalado, también con el vectorial: ambos deben dar lo mismo.
+No necesita base.
+
+    python -m pytest tests/test_goal_progress.py
+"""
+from datetime import date
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import goal_progress
+
+HOY = date(2026, 10, 18)
+
+
+@pytest.fixture(params=['python', 'numpy'])
+def motor(request, monkeypatch):
+    if request.param == 'numpy' and goal_progress.np is None:
+        pytest.skip("numpy no está instalado")
+    if request.param == 'python':
+        monkeypatch.setattr(goal_progress, 'np', None)
+    return request.param
+
+
+def meta(objetivo, actual, aportado=0.0, fecha_objetivo=None):
+    return {"monto_objetivo": objetivo, "monto_actual": actual, "aportado": aportado,
+            "fecha_objetivo": fecha_objetivo}
+
+
+def test_sin_metas(motor):
+    assert goal_progress.compute([], 1000.0, hoy=HOY) == []
+
+
+def test_ritmo_propio_y_fecha_estimada(motor):
+    # 900 aportados en 90 días: ~304 al mes; faltan 3000 -> ~10 meses
+    resultado, = goal_progress.compute([meta(5000, 2000, aportado=900)], 0.0, hoy=HOY)
+    assert resultado["fuente_ritmo"] == 'aportes'
+    assert resultado["ritmo_mensual"] == pytest.approx(304.38, abs=0.01)
+    assert resultado["restante"] == 3000
+    assert resultado["progreso"] == 0.4
+    assert resultado["estado"] == 'en_progreso'
+    assert resultado["fecha_estimada"] == '2027-08-14'
+
+
+def test_ahorro_neto_se_reparte_en_proporcion_a_lo_que_falta(motor):
+    metas = [meta(1000, 0), meta(3000, 0), meta(2000, 1000, aportado=300)]
+    uno, tres, propia = goal_progress.compute(metas, 1101.44, hoy=HOY)
+    # El ahorro libre descuenta el ritmo propio de la tercera (~101.44)
+    assert (uno["fuente_ritmo"], tres["fuente_ritmo"], propia["fuente_ritmo"]) == ('ahorro_neto', 'ahorro_neto', 'aportes')
+    assert uno["ritmo_mensual"] == pytest.approx(250, abs=0.01)
+    assert tres["ritmo_mensual"] == pytest.approx(750, abs=0.01)
+
+
+def test_estados(motor):
+    completada, estancada, a_tiempo, atrasada = goal_progress.compute([
+        meta(1000, 1200),
+        meta(1000, 100),
+        meta(1200, 0, aportado=900, fecha_objetivo=date(2027, 6, 1)),
+        meta(1200, 0, aportado=90, fecha_objetivo=date(2027, 1, 1)),
+    ], 0.0, hoy=HOY)
+    assert completada["estado"] == 'completada' and completada["progreso"] == 1.0
+    assert estancada["estado"] == 'estancada' and estancada["fecha_estimada"] is None
+    assert a_tiempo["estado"] == 'a_tiempo'
+    assert atrasada["estado"] == 'atrasada'
+    assert atrasada["ritmo_requerido"] == pytest.approx(1200 / ((date(2027, 1, 1) - HOY).days / goal_progress.DIAS_MES), abs=0.01)
+
+
+def test_objetivo_en_cero_cuenta_como_completo(motor):
+    resultado, = goal_progress.compute([meta(0, 0)], 0.0, hoy=HOY)
+    assert resultado["progreso"] == 1.0 and resultado["estado"] == 'completada'
+
+
+def test_ventana_de_ahorro_son_meses_completos(monkeypatch):
+    monkeypatch.setattr(goal_progress, 'MESES_AHORRO', 12)
+    assert goal_progress.savings_window(HOY) == (date(2025, 10, 1), date(2026, 10, 1))
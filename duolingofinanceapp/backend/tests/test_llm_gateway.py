@@ -0,0 +1,148 @@
+"""
+Circuit breaker de la puerta de enlace y caché de contexto de Gemini
+(GeminiProvider con un cliente de prueba: no usa la red). El reloj se
+controla con monkeypatch sobre time.monotonic.
+
+    python -m pytest tests/test_llm_gateway.py
+"""
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import llm_gateway
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    ahora = [1000.0]
+    monkeypatch.setattr(llm_gateway.time, 'monotonic', lambda: ahora[0])
+    return ahora
+
+
+def test_breaker_abre_tras_los_fallos_seguidos(reloj):
+    breaker = llm_gateway.CircuitBreaker(failures=3, cooldown=30)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.failure()
+    assert breaker.estado == 'cerrado'
+    breaker.failure()
+    assert breaker.estado == 'abierto' and breaker.is_open()
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
+
+
+def test_breaker_un_exito_reinicia_la_cuenta(reloj):
+    breaker = llm_gateway.CircuitBreaker(failures=2, cooldown=30)
+    breaker.failure()
+    breaker.success()
+    breaker.failure()
+    assert breaker.estado == 'cerrado'
+
+
+def test_breaker_cuota_abre_de_inmediato(reloj):
+    breaker = llm_gateway.CircuitBreaker(failures=5, cooldown=30)
+    breaker.failure(abrir=True)
+    assert breaker.is_open()
+
+
+def test_breaker_medio_abierto_deja_pasar_una_sola_prueba(reloj):
+    breaker = llm_gateway.CircuitBreaker(failures=1, cooldown=30)
+    breaker.failure()
+    reloj[0] += 31
+    assert not breaker.is_open()
+    assert breaker.allow()
+    assert breaker.estado == 'medio_abierto'
+    assert not breaker.allow()
+    # La prueba no llegó a hacerse: otro hilo puede tomarla
+    breaker.cancel_trial()
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.estado == 'cerrado' and breaker.allow()
+
+
+def test_breaker_falla_la_prueba_y_vuelve_a_abrir(reloj):
+    breaker = llm_gateway.CircuitBreaker(failures=3, cooldown=30)
+    breaker.failure(abrir=True)
+    reloj[0] += 31
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.is_open() and breaker.retry_after() == 30
+
+
+# ===========================
+# CACHÉ DE CONTEXTO
+# ===========================
+class CacheCreada:
+    def __init__(self, name):
+        self.name = name
+
+
+class CachesPrueba:
+    def __init__(self, error=None):
+        self.creadas = []
+        self.error = error
+
+    def create(self, model, config):
+        if self.error is not None:
+            raise self.error
+        self.creadas.append(config)
+        return CacheCreada(f"cachedContents/{len(self.creadas)}")
+
+
+class ClientePrueba:
+    def __init__(self, caches):
+        self.caches = caches
+
+
+@pytest.fixture
+def gemini():
+    pytest.importorskip('google.genai')
+
+    def crear(caches, explicit_cache=True):
+        return llm_gateway.GeminiProvider(ClientePrueba(caches), 'gemini-2.5-flash',
+                                          explicit_cache=explicit_cache, cache_ttl=600)
+    return crear
+
+
+def test_cache_de_contexto_se_crea_una_vez_y_se_reutiliza(gemini, reloj):
+    caches = CachesPrueba()
+    provider = gemini(caches)
+    primera = provider._request("Eres Duo, asesor financiero", [('user', 'hola')])
+    segunda = provider._request("Eres Duo, asesor financiero", [('user', '¿y en comida?')])
+    assert len(caches.creadas) == 1
+    assert primera["config"].cached_content == segunda["config"].cached_content == 'cachedContents/1'
+    assert primera["config"].system_instruction is None
+
+
+def test_cache_de_contexto_se_renueva_antes_de_expirar(gemini, reloj):
+    caches = CachesPrueba()
+    provider = gemini(caches)
+    provider._request("Persona", [('user', 'hola')])
+    reloj[0] += 600 - 60
+    assert provider._request("Persona", [('user', 'hola')])["config"].cached_content == 'cachedContents/2'
+
+
+def test_cache_de_contexto_por_instruccion(gemini, reloj):
+    caches = CachesPrueba()
+    provider = gemini(caches)
+    provider._request("Persona A", [('user', 'hola')])
+    provider._request("Persona B", [('user', 'hola')])
+    assert len(caches.creadas) == 2
+
+
+def test_sin_cache_si_la_creacion_falla(gemini, reloj):
+    provider = gemini(CachesPrueba(error=RuntimeError("muy pocos tokens")))
+    config = provider._request("Persona", [('user', 'hola')])["config"]
+    assert config.system_instruction == "Persona" and config.cached_content is None
+    # No se reintenta en cada llamada
+    assert provider.explicit_cache is False
+
+
+def test_sin_cache_explicita_usa_system_instruction(gemini, reloj):
+    caches = CachesPrueba()
+    config = gemini(caches, explicit_cache=False)._request("Persona", [('user', 'hola')])["config"]
+    assert config.system_instruction == "Persona"
+    assert caches.creadas == []
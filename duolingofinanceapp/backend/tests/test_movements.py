@@ -0,0 +1,68 @@
+"""
+Paginación de GET /movements: cursor opaco (encode_cursor / decode_cursor)
+y validación de limit en build_movements_query. Importar app.py exige
+MySQLdb, pero estas pruebas no abren conexiones.
+
+    python -m pytest tests/test_movements.py
+"""
+from datetime import datetime
+from pathlib import Path
+import sys
+
+import pytest
+
+pytest.importorskip('MySQLdb')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import app
+
+
+def test_cursor_ida_y_vuelta():
+    fecha = datetime(2026, 10, 18, 9, 30, 5)
+    cursor = app.encode_cursor(fecha, 1234)
+    assert app.decode_cursor(cursor) == ('2026-10-18 09:30:05', 1234)
+    # El streaming lo arma con la fecha ya formateada por MySQL: mismo cursor
+    assert app.encode_cursor('2026-10-18 09:30:05', 1234) == cursor
+
+
+def test_cursor_es_seguro_en_url():
+    cursor = app.encode_cursor('2026-10-18 23:59:59', 10 ** 12)
+    assert set(cursor) <= set('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=')
+
+
+@pytest.mark.parametrize('cursor', ['no-es-base64!', 'c2luLWJhcnJh', ''])
+def test_cursor_invalido(cursor):
+    with pytest.raises((ValueError, UnicodeDecodeError)):
+        app.decode_cursor(cursor)
+
+
+def test_query_con_cursor_sigue_despues_de_la_ultima_fila():
+    cursor = app.encode_cursor('2026-10-18 09:30:05', 77)
+    query, params, limit = app.build_movements_query(1, {'cursor': cursor, 'limit': '20'})
+    assert "(fecha < %s OR (fecha = %s AND id_movimiento < %s))" in query
+    assert params == [1, '2026-10-18 09:30:05', '2026-10-18 09:30:05', 77, 21]
+    assert limit == 20
+
+
+def test_cursor_invalido_es_error_de_operacion():
+    with pytest.raises(app.OperationError):
+        app.build_movements_query(1, {'cursor': 'no-es-base64!'})
+
+
+@pytest.mark.parametrize('limit', ['abc', '1.5', '0', '-3'])
+def test_limit_invalido_es_error_de_operacion(limit):
+    with pytest.raises(app.OperationError) as error:
+        app.build_movements_query(1, {'limit': limit})
+    assert error.value.status == 400
+
+
+def test_limit_se_recorta_al_maximo():
+    _, params, limit = app.build_movements_query(1, {'limit': '100000'})
+    assert limit == app.MOVIMIENTOS_LIMITE_MAX
+    assert params[-1] == app.MOVIMIENTOS_LIMITE_MAX + 1
+
+
+def test_sin_limit_no_pagina():
+    query, params, limit = app.build_movements_query(1, {'limit': ''})
+    assert limit is None and 'LIMIT' not in query and params == [1]
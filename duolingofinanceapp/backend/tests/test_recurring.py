@@ -0,0 +1,96 @@
+"""
+Detección de movimientos recurrentes (recurring.detect) y pronóstico sobre
+filas sintéticas. No necesita base.
+
+    python -m pytest tests/test_recurring.py
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import recurring
+
+HOY = date(2026, 10, 18)
+
+
+def mensual(tipo, categoria, nota, monto, dia, meses):
+    return [
+        (tipo, categoria, f"{nota} {i}", Decimal(monto),
+         datetime.combine(recurring.add_months(HOY, -i, dia), datetime.min.time()))
+        for i in range(meses - 1, -1, -1)
+    ]
+
+
+def agrupar(filas):
+    # detect espera las filas agrupadas por categoria, como las lee _rows
+    return sorted(filas, key=lambda f: (f[1], f[4]))
+
+
+def test_detecta_renta_mensual_aunque_la_nota_cambie():
+    filas = mensual('Egreso', 'Renta', 'Renta depto', '8500.00', 5, 6)
+    reglas, pendiente = recurring.detect(agrupar(filas), hoy=HOY)
+    assert pendiente is None
+    assert len(reglas) == 1
+    regla = reglas[0]
+    assert (regla["tipo"], regla["categoria"], regla["periodo"], regla["dia"]) == ('Egreso', 'Renta', 'mensual', 5)
+    assert regla["monto"] == 8500.0
+    assert regla["proxima"] == date(2026, 11, 5)
+
+
+def test_detecta_semanal_y_separa_montos_distintos():
+    filas = [
+        ('Egreso', 'Ocio', 'Gimnasio', Decimal('150'), datetime(2026, 10, 17) - timedelta(weeks=i))
+        for i in range(8)
+    ] + [
+        ('Egreso', 'Ocio', 'Gimnasio', Decimal('2400'), datetime(2026, 10, 10) - timedelta(days=40 * i))
+        for i in range(5)
+    ]
+    reglas, _ = recurring.detect(agrupar(filas), hoy=HOY)
+    assert [(r["periodo"], r["monto"]) for r in reglas] == [('semanal', 150.0)]
+
+
+def test_ignora_gastos_irregulares_y_series_cortadas():
+    irregulares = [
+        ('Egreso', 'Comida', 'super', Decimal('300'), datetime(2026, 10, 17) - timedelta(days=d))
+        for d in (0, 3, 11, 12, 30, 41, 70)
+    ]
+    # Mensual que dejó de llegar hace medio año
+    cortada = [
+        ('Egreso', 'Servicios', 'Streaming', Decimal('199'), datetime(2025, m, 2))
+        for m in range(1, 8)
+    ]
+    reglas, _ = recurring.detect(agrupar(irregulares + cortada), hoy=HOY)
+    assert reglas == []
+
+
+def test_deadline_devuelve_la_categoria_pendiente(monkeypatch):
+    filas = agrupar(
+        mensual('Egreso', 'Renta', 'Renta', '8500', 5, 6)
+        + mensual('Ingreso', 'Sueldo', 'Nomina', '20000', 15, 6)
+    )
+    # El reloj pasa el límite mientras se procesa la primera categoría
+    relojes = iter([0.0, 10.0])
+    monkeypatch.setattr(recurring.time, 'monotonic', lambda: next(relojes))
+    reglas, pendiente = recurring.detect(filas, hoy=HOY, deadline=5.0)
+    assert [r["categoria"] for r in reglas] == ['Renta']
+    assert pendiente == 'Sueldo'
+
+
+def test_forecast_repite_la_regla_en_el_horizonte():
+    reglas, _ = recurring.detect(agrupar(mensual('Egreso', 'Renta', 'Renta', '8500', 5, 6)), hoy=HOY)
+    pronostico = recurring.forecast(reglas, hoy=HOY, dias=90)
+    assert [e["fecha"] for e in pronostico["eventos"]] == ['2026-11-05', '2026-12-05', '2027-01-05']
+    assert (pronostico["egresos"], pronostico["neto"]) == (25500.0, -25500.0)
+
+
+def test_add_months_recorta_al_ultimo_dia():
+    assert recurring.add_months(date(2026, 1, 31), 1, 31) == date(2026, 2, 28)
+    assert recurring.add_months(date(2026, 11, 30), 3, 31) == date(2027, 2, 28)
+
+
+def test_normalize_note_ignora_numeros_y_mayusculas():
+    assert recurring.normalize_note("Netflix 10/2026") == recurring.normalize_note("netflix") == 'netflix'
+    assert recurring.normalize_note(None) == ''
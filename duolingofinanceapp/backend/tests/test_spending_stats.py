@@ -0,0 +1,66 @@
+"""
+Agregados de Welford de spending_stats.py: agregar y quitar valores debe dar
+lo mismo que recalcular desde cero. No necesita base.
+
+    python -m pytest tests/test_spending_stats.py
+"""
+from datetime import date, datetime
+from pathlib import Path
+import statistics
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import spending_stats
+
+MONTOS = [120.5, 80.0, 310.25, 95.0, 150.0, 42.75, 600.0]
+
+
+def acumular(valores):
+    estado = spending_stats.VACIO
+    for x in valores:
+        estado = spending_stats.welford_add(estado, x)
+    return estado
+
+
+def test_welford_add_coincide_con_media_y_desviacion():
+    n, media, _ = estado = acumular(MONTOS)
+    assert n == len(MONTOS)
+    assert media == pytest.approx(statistics.mean(MONTOS))
+    assert spending_stats.std(estado) == pytest.approx(statistics.stdev(MONTOS))
+
+
+@pytest.mark.parametrize('quitado', MONTOS)
+def test_welford_remove_deshace_un_add(quitado):
+    restantes = list(MONTOS)
+    restantes.remove(quitado)
+    n, media, m2 = spending_stats.welford_remove(acumular(MONTOS), quitado)
+    esperado = acumular(restantes)
+    assert n == esperado[0]
+    assert media == pytest.approx(esperado[1])
+    assert m2 == pytest.approx(esperado[2])
+
+
+def test_welford_remove_del_ultimo_valor_vacia():
+    assert spending_stats.welford_remove(acumular([50.0]), 50.0) == spending_stats.VACIO
+    assert spending_stats.welford_remove(spending_stats.VACIO, 50.0) == spending_stats.VACIO
+
+
+def test_std_con_menos_de_dos_valores_es_cero():
+    assert spending_stats.std(spending_stats.VACIO) == 0.0
+    assert spending_stats.std(acumular([10.0])) == 0.0
+
+
+def test_movement_signal_marca_un_monto_atipico():
+    montos = acumular([100.0, 110.0, 90.0, 105.0, 95.0, 100.0])
+    assert spending_stats.movement_signal(montos, 101.0) is None
+    valor, esperado, veces, z = spending_stats.movement_signal(montos, 900.0)
+    assert (valor, esperado, veces) == (900.0, 100.0, 9.0)
+    assert z >= spending_stats.Z_MINIMO
+
+
+def test_week_start_es_el_lunes():
+    assert spending_stats.week_start(date(2026, 10, 18)) == date(2026, 10, 12)
+    assert spending_stats.week_start(datetime(2026, 10, 12, 23, 59)) == date(2026, 10, 12)
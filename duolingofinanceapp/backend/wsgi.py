@@ -0,0 +1,8 @@
+"""
+Punto de entrada WSGI de producción (ver gunicorn.conf.py):
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app import create_app
+
+app = create_app(precalentar=True)
@@ -1,5 +1,6 @@
 import 'package:flutter/material.dart';
 import 'package:http/http.dart' as http;
+import '../session.dart';
 import 'dart:convert';
 
 // 🐠 --- IA Assistant (Finny) ---
@@ -25,7 +26,7 @@ class _IAAssistantState extends State<IAAssistant> {
     try {
       final response = await http.post(
         Uri.parse('http://10.0.2.2:5000/ai/ask_mascot'),
-        headers: {'Content-Type': 'application/json'},
+        headers: Session.headers(json: true),
         body: jsonEncode({
           'username': widget.username,
           'question': 'Give me a personalized financial advice'
@@ -131,16 +132,25 @@ class _GoalsScreenState extends State<GoalsScreen> {
       isLoading = true;
     });
     try {
-      final ahorroResponse = await http.get(
-        Uri.parse('http://10.0.2.2:5000/goals/ahorro/${widget.idUser}'),
-      );
-      final inversionResponse = await http.get(
-        Uri.parse('http://10.0.2.2:5000/goals/inversion/${widget.idUser}'),
+      // Ambas listas en un solo viaje
+      final response = await Session.send(
+        (headers) => http.post(
+          Uri.parse('http://10.0.2.2:5000/batch'),
+          headers: headers,
+          body: json.encode({
+            "operations": [
+              {"op": "goals.list", "tipo": "ahorro"},
+              {"op": "goals.list", "tipo": "inversion"},
+            ],
+          }),
+        ),
+        json: true,
       );
+      final results = json.decode(response.body)['results'];
 
       setState(() {
-        ahorroGoals = json.decode(ahorroResponse.body);
-        inversionGoals = json.decode(inversionResponse.body);
+        ahorroGoals = results[0]['data'];
+        inversionGoals = results[1]['data'];
         isLoading = false;
       });
     } catch (e) {
@@ -184,14 +194,17 @@ class _GoalsScreenState extends State<GoalsScreen> {
             onPressed: () async {
               if (nameController.text.isNotEmpty &&
                   amountController.text.isNotEmpty) {
-                final response = await http.post(
-                  Uri.parse('http://10.0.2.2:5000/goals/$backendType'),
-                  headers: {'Content-Type': 'application/json'},
-                  body: json.encode({
-                    "id_user": widget.idUser,
-                    "nombre_meta": nameController.text,
-                    "monto_objetivo": double.parse(amountController.text),
-                  }),
+                final response = await Session.send(
+                  (headers) => http.post(
+                    Uri.parse('http://10.0.2.2:5000/goals/$backendType'),
+                    headers: headers,
+                    body: json.encode({
+                      "id_user": widget.idUser,
+                      "nombre_meta": nameController.text,
+                      "monto_objetivo": double.parse(amountController.text),
+                    }),
+                  ),
+                  json: true,
                 );
 
                 if (response.statusCode == 201) {
@@ -254,14 +267,17 @@ class _GoalsScreenState extends State<GoalsScreen> {
                     ? goal['id_ahorro']
                     : goal['id_inversion'];
 
-                final response = await http.put(
-                  Uri.parse(
-                      'http://10.0.2.2:5000/goals/$backendType/$idMeta'),
-                  headers: {'Content-Type': 'application/json'},
-                  body: json.encode({
-                    if (current != null) "monto_actual": current,
-                    if (target != null) "monto_objetivo": target,
-                  }),
+                final response = await Session.send(
+                  (headers) => http.put(
+                    Uri.parse(
+                        'http://10.0.2.2:5000/goals/$backendType/$idMeta'),
+                    headers: headers,
+                    body: json.encode({
+                      if (current != null) "monto_actual": current,
+                      if (target != null) "monto_objetivo": target,
+                    }),
+                  ),
+                  json: true,
                 );
 
                 if (response.statusCode == 200) {
@@ -326,7 +342,8 @@ class _GoalsScreenState extends State<GoalsScreen> {
                     ? goal['id_ahorro']
                     : goal['id_inversion'];
                 final url = 'http://10.0.2.2:5000/goals/$backendType/$idMeta';
-                final res = await http.delete(Uri.parse(url));
+                final res = await Session.send(
+                    (headers) => http.delete(Uri.parse(url), headers: headers));
 
                 if (res.statusCode == 200) {
                   fetchGoals();
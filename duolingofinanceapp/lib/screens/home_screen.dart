@@ -1,5 +1,6 @@
 import 'package:flutter/material.dart';
 import 'package:http/http.dart' as http;
+import '../session.dart';
 import 'dart:convert';
 import 'package:intl/intl.dart';
 
@@ -34,8 +35,8 @@ class _HomeScreenState extends State<HomeScreen> {
 
   Future<void> fetchMovements() async {
     setState(() => _loading = true);
-    final response = await http
-        .get(Uri.parse('http://10.0.2.2:5000/movements/${widget.idUser}'));
+    final response = await Session.get(
+        Uri.parse('http://10.0.2.2:5000/movements/${widget.idUser}'));
     if (response.statusCode == 200) {
       setState(() {
         movimientos = jsonDecode(response.body);
@@ -179,16 +180,19 @@ class _HomeScreenState extends State<HomeScreen> {
                 final descripcion = descripcionController.text;
                 final monto = double.tryParse(montoController.text) ?? 0;
 
-                final res = await http.post(
-                  Uri.parse('http://10.0.2.2:5000/movements'),
-                  headers: {'Content-Type': 'application/json'},
-                  body: jsonEncode({
-                    'id_user': widget.idUser,
-                    'categoria': categoria,
-                    'nota': descripcion,
-                    'monto': monto,
-                    'tipo': tipo
-                  }),
+                final res = await Session.send(
+                  (headers) => http.post(
+                    Uri.parse('http://10.0.2.2:5000/movements'),
+                    headers: headers,
+                    body: jsonEncode({
+                      'id_user': widget.idUser,
+                      'categoria': categoria,
+                      'nota': descripcion,
+                      'monto': monto,
+                      'tipo': tipo
+                    }),
+                  ),
+                  json: true,
                 );
 
                 if (res.statusCode == 201) {
@@ -208,8 +212,9 @@ class _HomeScreenState extends State<HomeScreen> {
   }
 
   void _deleteMovement(int idMov) async {
-    final res =
-        await http.delete(Uri.parse('http://10.0.2.2:5000/movements/$idMov'));
+    final res = await Session.send((headers) => http.delete(
+        Uri.parse('http://10.0.2.2:5000/movements/$idMov'),
+        headers: headers));
     if (res.statusCode == 200) {
       fetchMovements();
     } else {
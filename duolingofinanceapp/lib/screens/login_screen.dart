@@ -2,6 +2,7 @@ import 'package:duolingofinanceapp/screens/main_screen.dart';
 import 'package:flutter/material.dart';
 import 'home_screen.dart';
 import 'package:http/http.dart' as http;
+import '../session.dart';
 import 'dart:convert';
 
 class LoginScreen extends StatefulWidget {
@@ -81,6 +82,7 @@ class _LoginScreenState extends State<LoginScreen>
       final data = jsonDecode(response.body);
 
       if (response.statusCode == 200) {
+        Session.start('http://10.22.187.7:5000', data);
         Navigator.pushReplacement(
           context,
           MaterialPageRoute(
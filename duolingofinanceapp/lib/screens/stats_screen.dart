@@ -2,6 +2,7 @@ import 'package:flutter/material.dart';
 import 'package:intl/intl.dart';
 import 'package:fl_chart/fl_chart.dart';
 import 'package:http/http.dart' as http;
+import '../session.dart';
 import 'dart:convert';
 
 class StatsScreen extends StatefulWidget {
@@ -13,7 +14,7 @@ class StatsScreen extends StatefulWidget {
 }
 
 class _StatsScreenState extends State<StatsScreen> {
-  List movimientos = [];
+  List series = []; // [{periodo: 'yyyy-MM', ingresos, egresos, balance}]
   bool _loading = true;
 
   int rachaMeses = 0;
@@ -23,16 +24,19 @@ class _StatsScreenState extends State<StatsScreen> {
   @override
   void initState() {
     super.initState();
-    fetchMovements();
+    fetchStats();
   }
 
-  Future<void> fetchMovements() async {
+  Future<void> fetchStats() async {
     setState(() => _loading = true);
     try {
-      final response = await http.get(Uri.parse(
-          'http://10.0.2.2:5000/movements/${widget.idUser}'));
+      // El backend ya agrupa por mes (últimos 12 meses por defecto)
+      final response = await Session.send((headers) => http.get(
+          Uri.parse(
+              'http://10.0.2.2:5000/movements/stats/${widget.idUser}?group=month'),
+          headers: headers));
       if (response.statusCode == 200) {
-        movimientos = jsonDecode(response.body);
+        series = jsonDecode(response.body)['series'];
         _calcularEstadisticas();
       } else {
         ScaffoldMessenger.of(context).showSnackBar(
@@ -54,14 +58,11 @@ class _StatsScreenState extends State<StatsScreen> {
       balancesPorMes[DateFormat('MMM yyyy').format(month)] = 0;
     }
 
-    for (var mov in movimientos) {
-      final fecha = DateTime.parse(mov['fecha']);
-      final monthKey =
-          DateFormat('MMM yyyy').format(DateTime(fecha.year, fecha.month, 1));
+    for (var punto in series) {
+      final fecha = DateFormat('yyyy-MM').parse(punto['periodo']);
+      final monthKey = DateFormat('MMM yyyy').format(fecha);
       if (balancesPorMes.containsKey(monthKey)) {
-        final value = balancesPorMes[monthKey]!;
-        balancesPorMes[monthKey] =
-            mov['tipo'] == 'Ingreso' ? value + mov['monto'] : value - mov['monto'];
+        balancesPorMes[monthKey] = (punto['balance'] as num).toDouble();
       }
     }
 
@@ -0,0 +1,71 @@
+import 'dart:convert';
+
+import 'package:http/http.dart' as http;
+
+/// Tokens de la sesión actual. /login entrega un access token (corto) y un
+/// refresh token; el backend deduce el usuario del access token.
+class Session {
+  static String? accessToken;
+  static String? refreshToken;
+  static String baseUrl = '';
+
+  // Última respuesta (ETag, cuerpo) por URL para los GET condicionales
+  static final Map<String, (String, String)> _etags = {};
+
+  static void start(String url, Map<String, dynamic> data) {
+    baseUrl = url;
+    accessToken = data['access_token'];
+    refreshToken = data['refresh_token'];
+    _etags.clear();
+  }
+
+  static Map<String, String> headers({bool json = false}) => {
+        if (json) 'Content-Type': 'application/json',
+        if (accessToken != null) 'Authorization': 'Bearer $accessToken',
+      };
+
+  /// Ejecuta la petición con los headers de sesión; si el access token
+  /// venció (401), lo renueva con el refresh token y reintenta una vez.
+  static Future<http.Response> send(
+      Future<http.Response> Function(Map<String, String> headers) request,
+      {bool json = false}) async {
+    var response = await request(headers(json: json));
+    if (response.statusCode == 401 && await _refresh()) {
+      response = await request(headers(json: json));
+    }
+    return response;
+  }
+
+  /// GET con If-None-Match: si el servidor responde 304 (los datos del
+  /// usuario no cambiaron) se devuelve el cuerpo guardado como un 200.
+  static Future<http.Response> get(Uri url) async {
+    final guardado = _etags[url.toString()];
+    final response = await send((headers) => http.get(url, headers: {
+          ...headers,
+          if (guardado != null) 'If-None-Match': guardado.$1,
+        }));
+    if (response.statusCode == 304 && guardado != null) {
+      return http.Response(guardado.$2, 200,
+          headers: {'content-type': 'application/json; charset=utf-8'});
+    }
+    final etag = response.headers['etag'];
+    if (response.statusCode == 200 && etag != null) {
+      _etags[url.toString()] = (etag, response.body);
+    }
+    return response;
+  }
+
+  static Future<bool> _refresh() async {
+    if (refreshToken == null) return false;
+    final response = await http.post(
+      Uri.parse('$baseUrl/auth/refresh'),
+      headers: {'Content-Type': 'application/json'},
+      body: jsonEncode({'refresh_token': refreshToken}),
+    );
+    if (response.statusCode != 200) return false;
+    final data = jsonDecode(response.body);
+    accessToken = data['access_token'];
+    refreshToken = data['refresh_token'];
+    return true;
+  }
+}
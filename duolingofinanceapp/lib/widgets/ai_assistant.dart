@@ -1,5 +1,6 @@
 import 'package:flutter/material.dart';
 import 'package:http/http.dart' as http;
+import '../session.dart';
 import 'dart:convert';
 
 class IAAssistant extends StatefulWidget {
@@ -25,7 +26,7 @@ class _IAAssistantState extends State<IAAssistant> {
       final response = await http.post(
         // ⚠️ Usa tu IP local si pruebas desde emulador o dispositivo físico
         Uri.parse('http://localhost:5000/ai/ask_mascot'),
-        headers: {'Content-Type': 'application/json'},
+        headers: Session.headers(json: true),
         body: jsonEncode({
           'username': widget.username,
           'question': 'Dame un consejo financiero personalizado'